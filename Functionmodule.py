@@ -1,136 +1,752 @@
+import contextlib
+import functools
+import io
+import itertools
 import json
+import multiprocessing
+import os
+import time
+from dataclasses import dataclass
 
-def json_to_jsonl(input_file, output_file):
+import dataset_io
+import dataset_packing
+import dedup
+import jsoncodec
+
+
+FORMAT_TYPES = ("openai", "alpaca", "conversation", "multi_turn")
+
+
+_WHITESPACE = ' \t\n\r'
+_TRUNCATION_SLACK = 8  # 잘린 값의 남은 꼬리로 볼 최대 글자 수
+
+
+def iter_json_array(f, chunk_size=1024 * 1024):
+    """
+    JSON 파일을 통째로 읽지 않고 최상위 배열의 요소를 하나씩 파싱해서 반환 (제너레이터)
+    
+    최상위가 배열이 아니면 그 값 하나만 반환한다. 메모리에는 읽기 버퍼와
+    현재 파싱 중인 요소만 올라간다.
+    
+    Args:
+        f: 텍스트 모드로 열린 JSON 파일
+        chunk_size (int): 한 번에 읽을 글자 수
+    """
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+    
+    def fill(min_size):
+        # 버퍼에 최소 min_size 글자가 남도록 더 읽음. 이미 처리한 앞부분은 버림
+        nonlocal buf, pos, eof
+        buf = buf[pos:]
+        pos = 0
+        while not eof and len(buf) < min_size:
+            chunk = f.read(max(chunk_size, min_size - len(buf)))
+            if not chunk:
+                eof = True
+            buf += chunk
+    
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            fill(1)
+    
+    def near_end(at):
+        # 버퍼 끝 근처에서 멈췄으면 값이 버퍼 끝에서 잘렸을 수 있음
+        # (true/false/null 중간, 숫자 "-1."/"1e+" 등). 그 외 위치의 오류는 진짜 형식 오류
+        return not eof and at >= len(buf) - _TRUNCATION_SLACK
+    
+    def decode_value():
+        # 값이 잘렸을 수 있을 때만 더 읽어서 다시 시도하고, 앞쪽 요소의 형식 오류는
+        # 파일 끝까지 읽지 않고 바로 알림
+        nonlocal pos
+        want = max(len(buf) - pos, 1)
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError as e:
+                # 닫는 따옴표가 없는 문자열은 시작 위치를 알려주므로 따로 확인
+                if not (near_end(e.pos) or (not eof and e.msg.startswith("Unterminated string"))):
+                    raise
+            else:
+                after = end
+                while after < len(buf) and buf[after] in _WHITESPACE:
+                    after += 1
+                if (after < len(buf) and buf[after] in ',]') or not near_end(after):
+                    # 구분자가 아니면 호출한 쪽에서 "Expecting ',' delimiter"로 알림
+                    pos = end
+                    return value
+            want *= 2
+            fill(want)
+    
+    skip_whitespace()
+    if pos >= len(buf):
+        raise json.JSONDecodeError("Expecting value", buf, pos)
+    
+    if buf[pos] != '[':
+        # 단일 객체는 그대로 한 개 반환
+        buf = buf[pos:] + f.read()
+        value, end = decoder.raw_decode(buf, 0)
+        if buf[end:].strip():
+            raise json.JSONDecodeError("Extra data", buf, end)
+        yield value
+        return
+    
+    pos += 1
+    skip_whitespace()
+    if pos >= len(buf) or buf[pos] != ']':
+        while True:
+            skip_whitespace()
+            yield decode_value()
+            skip_whitespace()
+            if pos >= len(buf) or buf[pos] not in ',]':
+                raise json.JSONDecodeError("Expecting ',' delimiter", buf, pos)
+            if buf[pos] == ']':
+                break
+            pos += 1
+    
+    # 배열 뒤에는 공백 외에 아무것도 없어야 함
+    pos += 1
+    skip_whitespace()
+    if pos < len(buf):
+        raise json.JSONDecodeError("Extra data", buf, pos)
+
+
+def json_to_jsonl(input_file, output_file, buffer_size=1000,
+                  shard_samples=None, shard_bytes=None, compression=None, resume=False):
     """
     JSON 파일을 JSONL 형식으로 변환
     
+    최상위 배열을 요소 단위로 읽으면서 바로 기록하므로 메모리보다 큰
+    JSON 파일도 변환할 수 있다. 입력이 .gz/.zst면 압축을 풀면서 읽는다.
+    
     Args:
-        input_file (str): 입력 JSON 파일 경로
-        output_file (str): 출력 JSONL 파일 경로
+        input_file (str): 입력 JSON 파일 경로 (.json, .json.gz, .json.zst)
+        output_file (str): 출력 JSONL 파일 경로 (샤드를 나누면 샤드 경로의 기준)
+        buffer_size (int): 한 번에 모아서 쓸 줄 수
+        shard_samples (int): 샤드 하나의 최대 줄 수 (None이면 나누지 않음)
+        shard_bytes (int): 샤드 하나의 최대 크기 (압축 전 바이트)
+        compression (str): 출력 압축 ("gzip", "zstd", None). zstd(.zst 입력 포함)는 pip install zstandard 필요
+        resume (bool): 매니페스트가 있으면 마지막으로 완성된 샤드 다음부터 이어서 변환
     """
     try:
-        # JSON 파일 읽기
-        with open(input_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        checkpoint = open_checkpoint(output_file, input_file, {
+            "shard_samples": shard_samples, "shard_bytes": shard_bytes, "compression": compression,
+        }, shard_samples or shard_bytes or resume, resume)
+        if checkpoint is not None and checkpoint.done:
+            return
+        start = checkpoint.records if checkpoint else 0
+        with io.TextIOWrapper(dataset_io.open_binary(input_file), encoding='utf-8') as src:
+            # 데이터가 리스트인 경우 각 요소를 한 줄씩, 단일 객체인 경우 그대로 한 줄로
+            # (텍스트 JSON은 바이트 위치로 건너뛸 수 없어서 완성된 요소 수만큼 읽고 버림)
+            items = itertools.islice(iter_json_array(src), start, None)
+            out = dataset_io.ShardedWriter(output_file, lambda f: JsonlWriter(f, buffer_size),
+                                           shard_samples, shard_bytes, compression, checkpoint)
+            count = start
+            try:
+                for item in items:
+                    out.write(item)
+                    count += 1
+                    out.end_record(0, count)
+                out.close(0, count)
+            except BaseException:
+                out.abort()
+                raise
         
-        # JSONL 파일로 쓰기
-        with open(output_file, 'w', encoding='utf-8') as f:
-            # 데이터가 리스트인 경우 각 요소를 한 줄씩
-            if isinstance(data, list):
-                for item in data:
-                    f.write(json.dumps(item, ensure_ascii=False) + '\n')
-            # 데이터가 단일 객체인 경우 그대로 한 줄로
-            else:
-                f.write(json.dumps(data, ensure_ascii=False) + '\n')
-        
-        print(f"변환 완료: {input_file} -> {output_file}")
+        print(f"변환 완료: {input_file} -> {', '.join(out.paths())}")
         
     except FileNotFoundError:
         print(f"파일을 찾을 수 없습니다: {input_file}")
-    except json.JSONDecodeError:
+    except jsoncodec.JSONDecodeError:
         print(f"JSON 형식이 올바르지 않습니다: {input_file}")
     except Exception as e:
         print(f"오류 발생: {e}")
 
 
-def convert_to_finetune_format(input_file, output_file, format_type="openai"):
+@dataclass(slots=True)
+class Turn:
+    """사용자 발화(HSxx)와 상담사 응답(SSxx) 한 쌍"""
+    human: str
+    assistant: str
+
+
+@dataclass(slots=True)
+class DialogueRecord:
+    """
+    감성 대화 말뭉치 레코드 하나에서 변환에 필요한 부분만 뽑은 것
+    
+    Attributes:
+        emotion_type (str): profile.emotion.type
+        situation (tuple): profile.emotion.situation (리스트면 튜플로 바꿔서 캐시 키로 씀)
+        turns (list): 번호 순서대로 정렬된 Turn 목록
+    """
+    emotion_type: str
+    situation: tuple
+    turns: list
+    
+    @classmethod
+    def from_json(cls, data):
+        return cls(*_emotion(data), extract_conversation(data))
+    
+    @property
+    def context(self):
+        """페르소나 문맥 (같은 감정/상황이면 같은 문자열 객체)"""
+        return _persona(self.emotion_type, self.situation)
+
+
+def _emotion(data):
+    # (감정 종류, 상황) - 상황 리스트는 캐시 키로 쓸 수 있게 튜플로
+    emotion = data.get('profile', {}).get('emotion', {})
+    situation = emotion.get('situation', [])
+    return emotion.get('type', ''), tuple(situation) if isinstance(situation, list) else situation
+
+
+# content 키 -> (사용자 발화인지, 턴 번호), 대화 키가 아니면 None. 키 종류가 적어서 한 번만 해석
+_turn_keys = {}
+
+
+def _parse_turn_key(key):
+    # "HS03" -> (True, 3), "SS12" -> (False, 12)
+    parsed = None
+    if key[:2] in ("HS", "SS") and key[2:].isdigit():
+        parsed = (key[0] == "H", int(key[2:]))
+    if len(_turn_keys) < 10000:
+        _turn_keys[key] = parsed
+    return parsed
+
+
+def extract_conversation(data):
+    """
+    대화 데이터 추출
+    
+    content의 키를 한 번만 훑어서 HSxx(사용자)와 SSxx(상담사)를 번호로 짝짓는다.
+    턴 수에 제한이 없고, 한쪽만 있는 번호는 뺀다.
+    
+    Returns:
+        list: 번호 순서대로 정렬된 Turn 목록
+    """
+    content = data.get('talk', {}).get('content', {})
+    
+    human, system = {}, {}
+    for key, text in content.items():
+        parsed = _turn_keys.get(key, False)
+        if parsed is False:
+            parsed = _parse_turn_key(key)
+        if parsed is not None:
+            (human if parsed[0] else system)[parsed[1]] = text
+    
+    return [Turn(human[i], system[i]) for i in sorted(human) if i in system]
+
+
+@functools.lru_cache(maxsize=4096)
+def persona_context(emotion_type, situation):
+    """
+    감정 종류와 상황으로 만든 페르소나 문맥
+    
+    서로 다른 (감정, 상황) 조합이 많지 않아서 캐시하면 레코드마다 문자열을 새로 만들지 않고
+    같은 문자열 객체를 같이 쓴다.
+    """
+    if isinstance(situation, tuple):
+        situation = list(situation)  # 기존 학습 데이터와 같은 표기 ['S06', 'D00']
+    return (
+        "당신은 공감적이고 도움이 되는 상담사입니다. "
+        f"상대방의 감정 상태는 '{emotion_type}'이며, "
+        f"상황은 '{situation}'입니다. "
+        "상대방의 감정을 이해하고 적절한 조언을 제공해주세요."
+    )
+
+
+def _persona(emotion_type, situation):
+    try:
+        return persona_context(emotion_type, situation)
+    except TypeError:  # 상황 값을 캐시 키로 쓸 수 없는 경우 (dict 등)
+        return persona_context.__wrapped__(emotion_type, situation)
+
+
+def get_persona_context(data):
+    """페르소나 정보 추출"""
+    return _persona(*_emotion(data))
+
+
+def convert_record(data, format_type="openai"):
+    """
+    레코드 하나를 파인튜닝 샘플로 변환 (제너레이터)
+    
+    Args:
+        data (dict): 입력 JSONL의 한 줄
+        format_type (str): 변환할 형식 ("openai", "alpaca", "conversation", "multi_turn")
+    """
+    record = DialogueRecord.from_json(data)
+    return build_samples(record.turns, record.context, format_type)
+
+
+def build_samples(conversations, context, format_type="openai"):
+    """
+    추출된 대화와 페르소나 문맥으로 파인튜닝 샘플 생성 (제너레이터)
+    
+    Args:
+        conversations (list): extract_conversation 결과 (Turn 목록)
+        context (str): get_persona_context 결과
+        format_type (str): 변환할 형식 ("openai", "alpaca", "conversation", "multi_turn")
+    """
+    if format_type == "openai":
+        # OpenAI GPT 파인튜닝 형식
+        for conv in conversations:
+            yield {
+                "messages": [
+                    {"role": "system", "content": context},
+                    {"role": "user", "content": conv.human},
+                    {"role": "assistant", "content": conv.assistant}
+                ]
+            }
+    
+    elif format_type == "alpaca":
+        # Alpaca 형식
+        for conv in conversations:
+            yield {
+                "instruction": context,
+                "input": conv.human,
+                "output": conv.assistant
+            }
+    
+    elif format_type == "conversation":
+        # 일반적인 대화 형식
+        for conv in conversations:
+            yield {
+                "context": context,
+                "question": conv.human,
+                "answer": conv.assistant
+            }
+    
+    elif format_type == "multi_turn":
+        # 멀티턴 대화 형식
+        if conversations:
+            messages = [{"role": "system", "content": context}]
+            for conv in conversations:
+                messages.append({"role": "user", "content": conv.human})
+                messages.append({"role": "assistant", "content": conv.assistant})
+            yield {"messages": messages}
+
+
+class ProgressReporter:
+    """처리한 레코드 수, 속도(records/s), 읽은 바이트 수를 주기적으로 출력"""
+    
+    def __init__(self, interval=10000, total_bytes=None):
+        self.interval = interval
+        self.total_bytes = total_bytes
+        self.records = 0
+        self.bytes_read = 0
+        self.started = time.perf_counter()
+        self._next_report = interval
+    
+    def update(self, nbytes, records=1):
+        self.bytes_read += nbytes
+        self.records += records
+        # 청크 단위로 한꺼번에 늘어나는 경우에도 간격마다 한 번씩만 출력
+        if self.interval and self.records >= self._next_report:
+            self.report()
+            self._next_report = (self.records // self.interval + 1) * self.interval
+    
+    def report(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        mb_read = self.bytes_read / (1024 * 1024)
+        message = f"진행: {self.records:,}개 레코드, {mb_read:,.1f}MB 읽음"
+        if self.total_bytes:
+            message += f" ({self.bytes_read / self.total_bytes:.1%})"
+        message += f", {self.records / elapsed:,.0f} records/s"
+        print(message)
+
+
+def iter_jsonl_records(f, progress=None):
+    """
+    바이너리 모드로 열린 JSONL 파일에서 레코드를 한 줄씩 읽어 반환 (제너레이터)
+    
+    Yields:
+        tuple: (줄 번호, 파싱된 데이터)
+    """
+    for line_num, line in enumerate(f, 1):
+        if progress is not None:
+            progress.update(len(line))
+        if not line.strip():
+            continue
+        try:
+            yield line_num, jsoncodec.loads(line)
+        except jsoncodec.JSONDecodeError:
+            print(f"Line {line_num}: JSON 파싱 오류")
+
+
+class JsonlWriter:
+    """샘플을 buffer_size개씩 모아서 한 번에 기록하는 JSONL 출력기"""
+    
+    def __init__(self, f, buffer_size=1000):
+        self.f = f
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.count = 0
+        self.bytes = 0
+    
+    def write(self, item):
+        line = jsoncodec.dumps_bytes(item) + b'\n'
+        self.buffer.append(line)
+        self.bytes += len(line)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+    
+    def flush(self):
+        if self.buffer:
+            self.f.write(b''.join(self.buffer))
+            self.count += len(self.buffer)
+            self.buffer.clear()
+
+
+def write_jsonl(items, f, buffer_size=1000):
+    """
+    샘플들을 JSONL로 기록. buffer_size개씩 모아서 한 번에 쓴다.
+    
+    Returns:
+        int: 기록한 샘플 수
+    """
+    writer = JsonlWriter(f, buffer_size)
+    for item in items:
+        writer.write(item)
+    writer.flush()
+    return writer.count
+
+
+def make_deduplicator(dedup_mode):
+    """dedup_mode("exact", "near", None)에 맞는 중복 제거기 (None이면 중복 제거 안 함)"""
+    if not dedup_mode:
+        return None
+    if dedup_mode not in ("exact", "near"):
+        raise ValueError(f"지원하지 않는 중복 제거 방식입니다: {dedup_mode}")
+    return dedup.Deduplicator(near=dedup_mode == "near")
+
+
+def open_checkpoint(output_file, input_file, params, enabled, resume):
+    """
+    변환 매니페스트 준비 (enabled가 거짓이면 None)
+    
+    resume=True이고 같은 입력/설정의 매니페스트가 있으면 그 상태를 불러온다.
+    이미 끝난 변환이면 done이 True인 체크포인트를 반환한다.
+    """
+    if not enabled:
+        return None
+    checkpoint = dataset_io.Checkpoint(output_file, input_file, params)
+    if resume and checkpoint.load():
+        if checkpoint.done:
+            print(f"이미 변환이 끝났습니다: {checkpoint.path}")
+        else:
+            print(f"이어서 변환: 레코드 {checkpoint.records:,}개, 샤드 {len(checkpoint.shards)}개 이후부터")
+    return checkpoint
+
+
+def convert_to_finetune_format(input_file, output_file, format_type="openai",
+                               buffer_size=1000, progress_interval=10000, dedup_mode=None,
+                               shard_samples=None, shard_bytes=None, compression=None, resume=False):
     """
     JSONL 파일을 파인튜닝 형식으로 변환
     
+    입력을 한 줄씩 읽어 변환하고 바로 기록하므로 입력 크기와 상관없이
+    메모리 사용량이 일정하다. 입력이 .gz/.zst면 압축을 풀면서 읽는다.
+    
+    shard_samples나 shard_bytes를 주면 출력을 out-00000.jsonl, out-00001.jsonl, ...로 나누고,
+    샤드가 완성될 때마다 입력 위치와 샤드 목록을 매니페스트(출력 경로 + ".manifest.json")에
+    저장한다. 중간에 멈춘 변환은 resume=True로 다시 실행하면 이어서 한다.
+    
+    Args:
+        input_file (str): 입력 JSONL 파일 경로 (.jsonl, .jsonl.gz, .jsonl.zst)
+        output_file (str): 출력 JSONL 파일 경로 (샤드를 나누면 샤드 경로의 기준)
+        format_type (str): 변환할 형식 ("openai", "alpaca", "conversation", "multi_turn")
+        buffer_size (int): 한 번에 모아서 쓸 샘플 수
+        progress_interval (int): 진행 상황을 출력할 레코드 간격 (0이면 출력 안 함)
+        dedup_mode (str): 중복 제거 ("exact": 완전 중복만, "near": 거의 같은 샘플까지, None: 안 함)
+        shard_samples (int): 샤드 하나의 최대 샘플 수 (None이면 나누지 않음)
+        shard_bytes (int): 샤드 하나의 최대 크기 (압축 전 바이트)
+        compression (str): 출력 압축 ("gzip", "zstd", None). zstd(.zst 입력 포함)는 pip install zstandard 필요
+        resume (bool): 매니페스트가 있으면 마지막으로 완성된 샤드 다음부터 이어서 변환
+    """
+    try:
+        deduplicator = make_deduplicator(dedup_mode)
+        checkpoint = open_checkpoint(output_file, input_file, {
+            "format_type": format_type, "dedup_mode": dedup_mode,
+            "shard_samples": shard_samples, "shard_bytes": shard_bytes, "compression": compression,
+        }, shard_samples or shard_bytes or resume, resume)
+        if checkpoint is not None and checkpoint.done:
+            return
+        start_offset = checkpoint.offset if checkpoint else 0
+        start_records = checkpoint.records if checkpoint else 0
+        # 입력 파일을 먼저 열어서, 없으면 빈 출력 파일이 생기지 않도록 함
+        with dataset_io.open_binary(input_file) as src:
+            dataset_io.skip_to(src, start_offset)
+            total_bytes = None if dataset_io.detect_compression(input_file) else os.path.getsize(input_file)
+            progress = ProgressReporter(progress_interval, total_bytes)
+            progress.bytes_read = start_offset
+            out = dataset_io.ShardedWriter(output_file, lambda f: JsonlWriter(f, buffer_size),
+                                           shard_samples, shard_bytes, compression, checkpoint)
+            try:
+                for _, data in iter_jsonl_records(src, progress):
+                    for sample in convert_record(data, format_type):
+                        if deduplicator is None or not deduplicator.is_duplicate(sample):
+                            out.write(sample)
+                    out.end_record(progress.bytes_read, start_records + progress.records)
+                out.close(progress.bytes_read, start_records + progress.records)
+            except BaseException:
+                out.abort()
+                raise
+        
+        if progress_interval:
+            progress.report()
+        if deduplicator is not None:
+            deduplicator.print_report()
+        print(f"변환 완료: {out.count}개의 샘플 생성")
+        print(f"출력 파일: {', '.join(out.paths())}")
+        
+    except FileNotFoundError:
+        print(f"파일을 찾을 수 없습니다: {input_file}")
+    except Exception as e:
+        print(f"오류 발생: {e}")
+
+
+
+def convert_to_finetune_formats(input_file, outputs, buffer_size=1000, progress_interval=10000):
+    """
+    JSONL 파일을 한 번만 읽어서 여러 파인튜닝 형식으로 동시에 변환
+    
+    레코드마다 파싱과 대화/페르소나 추출을 한 번만 하고, 요청된 모든 형식의
+    출력 파일에 같은 패스에서 기록한다.
+    
     Args:
         input_file (str): 입력 JSONL 파일 경로
-        output_file (str): 출력 JSONL 파일 경로
-        format_type (str): 변환할 형식 ("openai", "alpaca", "conversation")
+        outputs (dict): {형식: 출력 JSONL 파일 경로}, 예) {"openai": "finetune_openai.jsonl"}
+        buffer_size (int): 출력 파일별로 한 번에 모아서 쓸 샘플 수
+        progress_interval (int): 진행 상황을 출력할 레코드 간격 (0이면 출력 안 함)
+    
+    Returns:
+        dict: {형식: 생성된 샘플 수}
     """
+    for format_type in outputs:
+        if format_type not in FORMAT_TYPES:
+            print(f"지원하지 않는 형식입니다: {format_type}")
+            return {}
     
-    def extract_conversation(data):
-        """대화 데이터 추출"""
-        content = data.get('talk', {}).get('content', {})
-        
-        # HS (Human Speech)와 SS (System Speech) 순서대로 정렬
-        conversations = []
-        for i in range(1, 4):  # HS01~HS03, SS01~SS03
-            human_key = f"HS{i:02d}"
-            system_key = f"SS{i:02d}"
+    try:
+        with contextlib.ExitStack() as stack:
+            src = stack.enter_context(open(input_file, 'rb'))
+            writers = {
+                format_type: JsonlWriter(stack.enter_context(open(path, 'wb')), buffer_size)
+                for format_type, path in outputs.items()
+            }
+            progress = ProgressReporter(progress_interval, os.fstat(src.fileno()).st_size)
             
-            if human_key in content and system_key in content:
-                conversations.append({
-                    "human": content[human_key],
-                    "assistant": content[system_key]
-                })
+            for _, data in iter_jsonl_records(src, progress):
+                record = DialogueRecord.from_json(data)
+                context = record.context
+                for format_type, writer in writers.items():
+                    for sample in build_samples(record.turns, context, format_type):
+                        writer.write(sample)
+            
+            for writer in writers.values():
+                writer.flush()
+        
+        if progress_interval:
+            progress.report()
+        for format_type, path in outputs.items():
+            print(f"{format_type} 변환 완료: {writers[format_type].count}개의 샘플 생성 -> {path}")
+        return {format_type: writer.count for format_type, writer in writers.items()}
         
-        return conversations
+    except FileNotFoundError:
+        print(f"파일을 찾을 수 없습니다: {input_file}")
+    except Exception as e:
+        print(f"오류 발생: {e}")
+    return {}
+
+
+def convert_to_finetune_format_packed(input_file, output_file, format_type="openai", max_tokens=4096,
+                                      pack=True, overflow="drop", buckets=None,
+                                      epochs=dataset_packing.DEFAULT_EPOCHS,
+                                      price_per_million=dataset_packing.DEFAULT_PRICE_PER_MILLION,
+                                      buffer_size=1000, progress_interval=10000, dedup_mode=None):
+    """
+    토큰 길이를 고려해서 JSONL 파일을 파인튜닝 형식으로 변환
+    
+    샘플마다 토큰 수를 재서 max_tokens를 넘으면 버리거나(overflow="drop") 턴 경계에서
+    나누고(overflow="split"), pack=True면 페르소나 문맥이 같은 짧은 대화를 max_tokens까지
+    한 샘플로 묶는다 (openai, multi_turn 형식만). buckets를 주면 토큰 길이 구간별로
+    샤드 파일을 나눠 쓴다. 끝나면 토큰 히스토그램, 총 학습 토큰, 예상 비용을 출력한다.
+    
+    Args:
+        input_file (str): 입력 JSONL 파일 경로
+        output_file (str): 출력 JSONL 파일 경로 (buckets를 주면 샤드 경로의 기준)
+        format_type (str): 변환할 형식 ("openai", "alpaca", "conversation", "multi_turn")
+        max_tokens (int): 샘플 하나의 최대 토큰 수
+        pack (bool): 짧은 대화를 묶을지
+        overflow (str): 최대 길이를 넘는 샘플 처리 ("drop" 또는 "split")
+        buckets (list): 토큰 길이 구간 상한, 예) [512, 1024, 2048]. None이면 파일 하나에 기록
+        epochs (int): 예상 비용 계산에 쓸 에폭 수
+        price_per_million (float): 100만 학습 토큰당 가격(달러)
+        buffer_size (int): 한 번에 모아서 쓸 샘플 수
+        progress_interval (int): 진행 상황을 출력할 레코드 간격 (0이면 출력 안 함)
+        dedup_mode (str): 묶기 전에 할 중복 제거 ("exact", "near", None)
     
-    def get_persona_context(data):
-        """페르소나 정보 추출"""
-        profile = data.get('profile', {})
-        emotion = profile.get('emotion', {})
+    Returns:
+        dict: 토큰 통계 (TokenStats.report), 실패하면 None
+    """
+    if format_type not in FORMAT_TYPES:
+        print(f"지원하지 않는 형식입니다: {format_type}")
+        return None
+    
+    try:
+        packer = dataset_packing.SamplePacker(max_tokens, pack, overflow)
+        deduplicator = make_deduplicator(dedup_mode)
+        with contextlib.ExitStack() as stack:
+            src = stack.enter_context(open(input_file, 'rb'))
+            if buckets:
+                out = stack.enter_context(
+                    dataset_packing.BucketedWriter(output_file, buckets, lambda f: JsonlWriter(f, buffer_size))
+                )
+            else:
+                out = JsonlWriter(stack.enter_context(open(output_file, 'wb')), buffer_size)
+                stack.callback(out.flush)
+            progress = ProgressReporter(progress_interval, os.fstat(src.fileno()).st_size)
+            
+            def write(done):
+                for sample, tokens in done:
+                    if buckets:
+                        out.write(sample, tokens)
+                    else:
+                        out.write(sample)
+            
+            samples = (
+                sample
+                for _, data in iter_jsonl_records(src, progress)
+                for sample in convert_record(data, format_type)
+            )
+            if deduplicator is not None:
+                samples = deduplicator.filter(samples)
+            for sample in samples:
+                write(packer.add(sample))
+            write(packer.flush())
         
-        context = f"당신은 공감적이고 도움이 되는 상담사입니다. "
-        context += f"상대방의 감정 상태는 '{emotion.get('type', '')}'이며, "
-        context += f"상황은 '{emotion.get('situation', [])}'입니다. "
-        context += "상대방의 감정을 이해하고 적절한 조언을 제공해주세요."
+        if progress_interval:
+            progress.report()
+        if buckets:
+            for path, count in out.counts().items():
+                print(f"{path}: {count}개")
+        else:
+            print(f"출력 파일: {output_file}")
+        report = packer.stats.report(epochs, price_per_million)
+        if deduplicator is not None:
+            deduplicator.print_report()
+            report["dedup"] = deduplicator.report()
+        packer.stats.print_report(epochs, price_per_million)
+        return report
         
-        return context
+    except FileNotFoundError:
+        print(f"파일을 찾을 수 없습니다: {input_file}")
+    except Exception as e:
+        print(f"오류 발생: {e}")
+    return None
+
+
+def iter_chunk_ranges(input_file, chunk_size=8 * 1024 * 1024):
+    """
+    파일을 줄 경계에 맞춘 바이트 구간으로 나눔 (제너레이터)
+    
+    Yields:
+        tuple: (시작 오프셋, 끝 오프셋)
+    """
+    size = os.path.getsize(input_file)
+    with open(input_file, 'rb') as f:
+        start = 0
+        while start < size:
+            f.seek(min(start + chunk_size, size))
+            f.readline()  # 줄 중간에서 끊기지 않도록 다음 줄 시작까지 이동
+            end = min(f.tell(), size)
+            yield start, end
+            start = end
+
+
+def _convert_chunk(task):
+    """
+    프로세스 풀 작업자: 바이트 구간 하나를 읽어 변환한 JSONL을 bytes로 반환
+    
+    Returns:
+        tuple: (읽은 바이트 수, 레코드 수, 샘플 수, JSONL bytes, 파싱 실패 오프셋 목록)
+    """
+    input_file, start, end, format_type = task
+    with open(input_file, 'rb') as f:
+        f.seek(start)
+        block = f.read(end - start)
     
-    converted_data = []
+    out = []
+    errors = []
+    records = 0
+    offset = start
+    for line in block.splitlines(keepends=True):
+        line_start = offset
+        offset += len(line)
+        if not line.strip():
+            continue
+        records += 1
+        try:
+            data = jsoncodec.loads(line)
+        except jsoncodec.JSONDecodeError:
+            errors.append(line_start)
+            continue
+        for sample in convert_record(data, format_type):
+            out.append(jsoncodec.dumps_bytes(sample) + b'\n')
+    return len(block), records, len(out), b''.join(out), errors
+
+
+def convert_to_finetune_format_parallel(input_file, output_file, format_type="openai",
+                                        workers=None, chunk_size=8 * 1024 * 1024,
+                                        ordered=True, progress_interval=10000):
+    """
+    JSONL 파일을 여러 프로세스에서 나눠 파인튜닝 형식으로 변환
+    
+    입력을 줄 경계에 맞춘 바이트 구간으로 쪼개 프로세스 풀에서 변환하고,
+    결과를 입력 순서대로 이어 붙인다.
+    
+    Args:
+        input_file (str): 입력 JSONL 파일 경로
+        output_file (str): 출력 JSONL 파일 경로
+        format_type (str): 변환할 형식 ("openai", "alpaca", "conversation", "multi_turn")
+        workers (int): 작업 프로세스 수 (None이면 CPU 코어 수)
+        chunk_size (int): 작업자 하나가 한 번에 처리할 바이트 수
+        ordered (bool): False면 끝나는 순서대로 기록 (출력 순서가 입력과 달라짐)
+        progress_interval (int): 진행 상황을 출력할 레코드 간격 (0이면 출력 안 함)
+    """
+    if format_type not in FORMAT_TYPES:
+        print(f"지원하지 않는 형식입니다: {format_type}")
+        return
     
     try:
-        with open(input_file, 'r', encoding='utf-8') as f:
-            for line_num, line in enumerate(f, 1):
-                try:
-                    data = json.loads(line.strip())
-                    conversations = extract_conversation(data)
-                    context = get_persona_context(data)
-                    
-                    if format_type == "openai":
-                        # OpenAI GPT 파인튜닝 형식
-                        for conv in conversations:
-                            converted_data.append({
-                                "messages": [
-                                    {"role": "system", "content": context},
-                                    {"role": "user", "content": conv["human"]},
-                                    {"role": "assistant", "content": conv["assistant"]}
-                                ]
-                            })
-                    
-                    elif format_type == "alpaca":
-                        # Alpaca 형식
-                        for conv in conversations:
-                            converted_data.append({
-                                "instruction": context,
-                                "input": conv["human"],
-                                "output": conv["assistant"]
-                            })
-                    
-                    elif format_type == "conversation":
-                        # 일반적인 대화 형식
-                        for conv in conversations:
-                            converted_data.append({
-                                "context": context,
-                                "question": conv["human"],
-                                "answer": conv["assistant"]
-                            })
-                    
-                    elif format_type == "multi_turn":
-                        # 멀티턴 대화 형식
-                        if conversations:
-                            messages = [{"role": "system", "content": context}]
-                            for conv in conversations:
-                                messages.append({"role": "user", "content": conv["human"]})
-                                messages.append({"role": "assistant", "content": conv["assistant"]})
-                            converted_data.append({"messages": messages})
-                
-                except json.JSONDecodeError:
-                    print(f"Line {line_num}: JSON 파싱 오류")
-                    continue
+        total_bytes = os.path.getsize(input_file)
+        tasks = (
+            (input_file, start, end, format_type)
+            for start, end in iter_chunk_ranges(input_file, chunk_size)
+        )
+        progress = ProgressReporter(progress_interval, total_bytes)
+        count = 0
         
-        # 변환된 데이터를 JSONL로 저장
-        with open(output_file, 'w', encoding='utf-8') as f:
-            for item in converted_data:
-                f.write(json.dumps(item, ensure_ascii=False) + '\n')
+        with multiprocessing.Pool(workers) as pool, open(output_file, 'wb') as dst:
+            results = pool.imap(_convert_chunk, tasks) if ordered else pool.imap_unordered(_convert_chunk, tasks)
+            for nbytes, records, samples, jsonl, errors in results:
+                for offset in errors:
+                    print(f"Byte {offset}: JSON 파싱 오류")
+                dst.write(jsonl)
+                count += samples
+                progress.update(nbytes, records)
         
-        print(f"변환 완료: {len(converted_data)}개의 샘플 생성")
+        if progress_interval:
+            progress.report()
+        print(f"변환 완료: {count}개의 샘플 생성")
         print(f"출력 파일: {output_file}")
         
     except FileNotFoundError:
@@ -139,17 +755,15 @@ def convert_to_finetune_format(input_file, output_file, format_type="openai"):
         print(f"오류 발생: {e}")
 
 
-
 if __name__ == "__main__":
     input_file = "output.jsonl"
     
     # 다양한 형식으로 변환
     formats = ["openai"] # , "alpaca", "conversation", "multi_turn"
     
-    for fmt in formats:
-        output_file = f"finetune_{fmt}.jsonl"
-        convert_to_finetune_format(input_file, output_file, fmt)
-        print(f"\n{fmt.upper()} 형식 변환 완료\n" + "="*50)
+    # 입력을 한 번만 읽고 모든 형식을 같이 기록
+    convert_to_finetune_formats(input_file, {fmt: f"finetune_{fmt}.jsonl" for fmt in formats})
+    print(f"\n{', '.join(fmt.upper() for fmt in formats)} 형식 변환 완료\n" + "="*50)
     
     # 결과 확인
     print("\n변환 결과 미리보기:")
@@ -158,8 +772,8 @@ if __name__ == "__main__":
             for i, line in enumerate(f):
                 if i >= 2:  # 처음 2개 샘플만 보여주기
                     break
-                data = json.loads(line)
+                data = jsoncodec.loads(line)
                 print(f"\nSample {i+1}:")
-                print(json.dumps(data, ensure_ascii=False, indent=2))
+                print(jsoncodec.dumps(data, indent=2))
     except FileNotFoundError:
         print("변환된 파일을 찾을 수 없습니다.")
\ No newline at end of file
@@ -0,0 +1,152 @@
+"""
+여러 사용자의 카카오톡 대화 파일로 감성일기를 한꺼번에 생성
+
+    python batch_diary.py exports/*.txt -o diaries.jsonl --concurrency 16 --rpm 500 --tpm 200000
+    python batch_diary.py exports/*.txt --batch-api-file batch_input.jsonl
+
+결과는 끝나는 순서대로 한 줄에 하나씩 JSONL로 기록한다. 작업 ID("id", Batch API의
+custom_id)는 명령줄에 준 파일 경로 그대로다 (모바일 내보내기는 파일 이름이 모두 같아서).
+--batch-api-file을 주면 API를 호출하지 않고(API 키 없이) OpenAI Batch API 입력 파일만 만든다.
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import diary_requests
+import jsoncodec
+
+
+async def iter_batch_results(jobs, process, concurrency=8):
+    """
+    jobs를 동시에 최대 concurrency개씩 처리하고 끝나는 순서대로 결과를 반환 (비동기 제너레이터)
+
+    Args:
+        jobs: (작업 ID, 입력) 반복 가능 객체. 필요한 만큼만 꺼내 쓰므로 큰 목록도 괜찮음
+        process: async def process(입력) -> dict
+        concurrency (int): 동시에 처리할 작업 수
+
+    Yields:
+        dict: {"id": 작업 ID, "result": ...} 또는 실패하면 {"id": 작업 ID, "error": ...}
+    """
+    jobs = iter(jobs)
+    results = asyncio.Queue()
+
+    async def worker():
+        # 이벤트 루프는 스레드 하나에서 돌기 때문에 작업자들이 같은 반복자를 나눠 써도 안전
+        for job_id, item in jobs:
+            try:
+                await results.put({"id": job_id, "result": await process(item)})
+            except Exception as e:
+                await results.put({"id": job_id, "error": str(e) or type(e).__name__})
+
+    async def close_when_done():
+        await asyncio.gather(*workers)
+        await results.put(None)
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    closer = asyncio.create_task(close_when_done())
+    try:
+        while (result := await results.get()) is not None:
+            yield result
+    finally:
+        for task in workers:
+            task.cancel()
+        closer.cancel()
+
+
+def batch_api_request(custom_id, request):
+    """chat completion 요청을 OpenAI Batch API 입력 한 줄로 변환"""
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": request,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="카카오톡 대화 파일 여러 개로 감성일기 일괄 생성")
+    parser.add_argument("files", nargs="+", type=Path, help="카카오톡 대화 .txt 파일들")
+    parser.add_argument("-o", "--output", type=Path, default=Path("diaries.jsonl"), help="결과 JSONL 경로")
+    parser.add_argument("--search-log", default="없음")
+    parser.add_argument("--pipeline", choices=["single", "two_step"], default="single",
+                        help="single: 요약+일기 한 번 호출 (기본), two_step: 두 번 호출")
+    parser.add_argument("--concurrency", type=int, default=8, help="동시에 처리할 파일 수")
+    parser.add_argument("--rpm", type=int, default=None, help="분당 최대 요청 수 (기본: OPENAI_RPM)")
+    parser.add_argument("--tpm", type=int, default=None, help="분당 최대 토큰 수 (기본: OPENAI_TPM)")
+    parser.add_argument("--batch-api-file", type=Path, default=None,
+                        help="API를 호출하지 않고 OpenAI Batch API 입력 JSONL만 작성")
+    args = parser.parse_args(argv)
+
+    # 작업 ID가 겹치면 Batch API가 입력 파일을 거부하고 결과 줄도 사용자와 맞출 수 없음
+    seen = {}
+    for path in args.files:
+        if (other := seen.setdefault(path.resolve(), path)) is not path:
+            parser.error(f"같은 파일이 두 번 들어왔습니다: {other}, {path}")
+    return args
+
+
+def write_batch_api_file(args):
+    import Functionmodule
+
+    def requests():
+        for path in args.files:
+            kakao_text = diary_requests.extract_file_chat(path)
+            if not kakao_text.strip():
+                print(f"{path}: 카카오톡 대화가 감지되지 않았습니다.", file=sys.stderr)
+                continue
+            yield batch_api_request(str(path), diary_requests.summary_diary_request(kakao_text, args.search_log))
+
+    with open(args.batch_api_file, 'wb') as f:
+        count = Functionmodule.write_jsonl(requests(), f)
+    print(f"Batch API 입력 {count}개 작성: {args.batch_api_file}")
+
+
+async def run(args, diary_service):
+    async def process(path):
+        # 파일 끝부분만 읽어 추출 (큰 파일도 이벤트 루프를 막지 않도록 스레드에서)
+        kakao_text = await asyncio.to_thread(diary_requests.extract_file_chat, path)
+        if not kakao_text.strip():
+            raise ValueError("카카오톡 대화가 감지되지 않았습니다.")
+        return await diary_service.diary_from_chat(kakao_text, args.search_log, args.pipeline)
+
+    started = time.perf_counter()
+    done = failed = 0
+    with open(args.output, 'wb') as f:
+        jobs = ((str(path), path) for path in args.files)
+        async for result in iter_batch_results(jobs, process, args.concurrency):
+            f.write(jsoncodec.dumps_bytes(result) + b'\n')
+            f.flush()
+            done += 1
+            failed += "error" in result
+            if done % 100 == 0:
+                print(f"진행: {done}/{len(args.files)}개 완료 (실패 {failed}개)")
+    await diary_service.client.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"완료: {done}개 ({failed}개 실패), {elapsed:.1f}초, 429 대기 {diary_service.rate_limiter.throttled}회")
+    print(f"출력 파일: {args.output}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.batch_api_file:
+        write_batch_api_file(args)
+        return
+
+    import main as diary_service  # OpenAI 클라이언트를 만드므로 API를 호출할 때만 불러옴
+    import rate_limit
+
+    if args.rpm is not None or args.tpm is not None:
+        limiter = diary_service.rate_limiter
+        diary_service.rate_limiter = rate_limit.RateLimiter(
+            args.rpm if args.rpm is not None else limiter.requests.capacity,
+            args.tpm if args.tpm is not None else limiter.tokens.capacity,
+        )
+    asyncio.run(run(args, diary_service))
+
+
+if __name__ == "__main__":
+    main()
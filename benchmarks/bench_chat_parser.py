@@ -0,0 +1,62 @@
+"""
+카카오톡 대화 파서 형식별 처리 속도
+
+    python -m benchmarks.bench_chat_parser [날짜 수] [하루 메시지 수]
+
+형식마다 합성 내보내기 파일을 만들어 kakao_parser.parse_messages가 초당 몇 줄을
+처리하는지 출력한다. PC/모바일 형식은 예전 방식(호출마다 정규식 컴파일 + any()
+잡음 검사)과도 비교한다.
+"""
+import re
+import sys
+import time
+
+import kakao_parser
+from benchmarks.synthetic import make_kakao_export
+
+
+FORMATS = ["pc", "mobile", "android", "ios"]
+
+
+def legacy_extract(lines, fmt):
+    """통합 파서 이전의 줄 단위 추출 (비교용)"""
+    if fmt == "pc":
+        patterns = [r"^\[(.*?)\]\s*\[(오전|오후)\s*\d{1,2}:\d{2}\]\s*(.*)"]
+    else:
+        patterns = [r"^\[(.*?)\]\s*(오전|오후)\s*\d{1,2}:\d{2}\s*(.*)", r"^(오전|오후)\s*\d{1,2}:\d{2}\s*\[(.*?)\]\s*(.*)"]
+    chat = []
+    for line in lines:
+        line = line.strip()
+        for pattern in patterns:
+            m = re.match(pattern, line)
+            if m:
+                msg_txt = m.group(3).strip()
+                if not any(k in msg_txt for k in kakao_parser.NOISE_KEYWORDS):
+                    chat.append(msg_txt)
+                break
+    return chat
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    per_day = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    print(f"\n{'형식':>8} | {'줄 수':>9} | {'메시지':>9} | {'통합 파서':>14} | {'예전 방식':>14}")
+    for fmt in FORMATS:
+        lines = make_kakao_export(fmt, days, per_day).splitlines()
+        messages, elapsed = timed(lambda: [m for m in kakao_parser.parse_messages(lines) if not m.is_noise])
+        legacy = ""
+        if fmt in ("pc", "mobile"):
+            _, legacy_elapsed = timed(legacy_extract, lines, fmt)
+            legacy = f"{len(lines) / legacy_elapsed:,.0f} lines/s"
+        print(f"{fmt:>8} | {len(lines):9,} | {len(messages):9,} | {len(lines) / elapsed:,.0f} lines/s | {legacy}")
+
+
+if __name__ == "__main__":
+    main()
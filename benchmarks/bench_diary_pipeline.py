@@ -0,0 +1,68 @@
+"""
+두 번 호출(요약 → 일기)과 한 번 호출(structured output) 파이프라인 비교
+
+    python -m benchmarks.bench_diary_pipeline [요청 수] [동시 요청 수]
+
+로컬 모의 서버(benchmarks.mock_openai)를 띄우고 /generate-diary를 pipeline별로
+호출해서 지연 시간 p50/p95와 요청당 토큰 사용량을 출력한다.
+"""
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+
+from benchmarks import mock_openai
+from benchmarks.load_test import percentile
+from benchmarks.synthetic import make_chat
+
+
+async def run(app, pipeline, requests, concurrency, offset):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                 timeout=120) as c:
+        async def one(i):
+            async with semaphore:
+                started = time.perf_counter()
+                r = await c.post("/generate-diary", json={"kakao_text": make_chat(offset + i), "pipeline": pipeline})
+                assert r.status_code == 200, r.text
+                latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(one(i) for i in range(requests)))
+    return latencies
+
+
+async def compare(app, base_url, requests, concurrency):
+    # main의 AsyncOpenAI 클라이언트는 이벤트 루프 하나에서만 쓸 수 있으므로 두 파이프라인을 같은 루프에서 실행
+    async with httpx.AsyncClient(base_url=base_url) as mock:
+        for n, pipeline in enumerate(["two_step", "single"]):
+            await mock.post("/reset")
+            latencies = await run(app, pipeline, requests, concurrency, n * requests)
+            stats = (await mock.get("/stats")).json()
+            print(f"{pipeline:>9} | {percentile(latencies, 50):6.3f}s | {percentile(latencies, 95):6.3f}s"
+                  f" | {stats['requests'] / requests:9.1f} | {stats['prompt_tokens'] / requests:14,.0f}"
+                  f" | {stats['completion_tokens'] / requests:14,.0f}")
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    server, base_url = mock_openai.start_in_thread(mock_openai.create_app())
+    os.environ["OPENAI_BASE_URL"] = f"{base_url}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "mock")
+    import main as diary_service
+
+    print(f"요청 {requests}개, 동시 {concurrency}개")
+    print(f"{'pipeline':>9} | {'p50':>7} | {'p95':>7} | {'호출/요청':>6} | {'입력 토큰/요청':>10} | {'출력 토큰/요청':>10}")
+    try:
+        asyncio.run(compare(diary_service.app, base_url, requests, concurrency))
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+JSON 백엔드별 변환 속도 비교
+
+    python -m benchmarks.bench_json_backends [레코드 수]
+
+AI-Hub 감성 대화 형식의 합성 데이터를 만들고, 설치된 백엔드마다
+convert_to_finetune_formats로 네 가지 형식을 변환하는 데 걸린 시간을 출력한다.
+"""
+import os
+import sys
+import tempfile
+import time
+
+import jsoncodec
+import Functionmodule
+from benchmarks.synthetic import make_aihub_jsonl
+
+
+def main():
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "input.jsonl")
+        make_aihub_jsonl(input_file, records)
+        outputs = {fmt: os.path.join(tmp, f"{fmt}.jsonl") for fmt in Functionmodule.FORMAT_TYPES}
+        
+        results = {}
+        for backend in reversed(jsoncodec.available_backends()):
+            jsoncodec.use_backend(backend)
+            started = time.perf_counter()
+            Functionmodule.convert_to_finetune_formats(input_file, outputs, progress_interval=0)
+            results[backend] = time.perf_counter() - started
+        jsoncodec.use_backend()
+    
+    print(f"\n{records:,}개 레코드, 형식 {len(outputs)}개 변환")
+    for backend, elapsed in results.items():
+        print(f"{backend:>7}: {elapsed:6.2f}s  {records / elapsed:10,.0f} records/s  x{results['json'] / elapsed:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+대화 추출기와 Functionmodule 변환기 마이크로벤치마크 (성능 회귀 확인용)
+
+    python -m benchmarks.bench_regression --save baseline.json
+    python -m benchmarks.bench_regression --compare baseline.json --threshold 0.15
+
+합성 카카오톡 내보내기와 AI-Hub 형식 JSON/JSONL을 만들어 항목마다 --repeat번 실행하고
+가장 빠른 시간을 처리량과 함께 출력한다. --compare로 저장해 둔 결과와 비교해서
+threshold보다 느려진 항목이 있으면 종료 코드 1로 끝난다 (CI에서 회귀 감지).
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+import chat_index
+import Functionmodule
+import kakao_parser
+import token_budget
+from benchmarks.synthetic import make_aihub_json, make_aihub_jsonl, make_kakao_export
+
+
+def best_time(func, repeat):
+    """repeat번 실행해서 가장 짧은 시간(초). 변환기가 출력하는 진행 메시지는 숨김"""
+    best = float("inf")
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - started)
+    return best
+
+
+def extractor_cases(days, per_day):
+    """(이름, 함수, 처리 단위 수, 단위) 목록 - 대화 추출기"""
+    export = make_kakao_export("pc", days, per_day)
+    data = export.encode("utf-8")
+    lines = export.splitlines()
+    texts = kakao_parser.recent_texts(lines, None, 500)
+    indexed = chat_index.ChatIndex()
+    key = indexed.add(data)
+    tokenizer = token_budget.get_tokenizer()
+
+    return [
+        ("parse_messages", lambda: sum(1 for _ in kakao_parser.parse_messages(lines)), len(lines), "lines"),
+        ("extract_forward", lambda: kakao_parser.recent_texts(lines, None, 500), len(lines), "lines"),
+        ("extract_tail", lambda: kakao_parser.extract_recent_messages(data, None, 500), len(lines), "lines"),
+        ("chat_index_add", lambda: chat_index.ChatIndex().add(data), len(lines), "lines"),
+        ("chat_index_lookup", lambda: indexed.recent_texts(key, None, 500), 1, "lookups"),
+        ("pack_messages", lambda: token_budget.pack_messages(texts, 800, tokenizer), len(texts), "messages"),
+    ]
+
+
+def converter_cases(tmp, records):
+    """(이름, 함수, 처리 단위 수, 단위) 목록 - Functionmodule 변환기"""
+    jsonl = os.path.join(tmp, "input.jsonl")
+    array = os.path.join(tmp, "input.json")
+    make_aihub_jsonl(jsonl, records)
+    make_aihub_json(array, records)
+    out = os.path.join(tmp, "out.jsonl")
+    outputs = {fmt: os.path.join(tmp, f"{fmt}.jsonl") for fmt in Functionmodule.FORMAT_TYPES}
+
+    return [
+        ("json_to_jsonl", lambda: Functionmodule.json_to_jsonl(array, out), records, "records"),
+        ("convert_openai", lambda: Functionmodule.convert_to_finetune_format(
+            jsonl, out, "openai", progress_interval=0), records, "records"),
+        ("convert_all_formats", lambda: Functionmodule.convert_to_finetune_formats(
+            jsonl, outputs, progress_interval=0), records, "records"),
+        ("convert_dedup_near", lambda: Functionmodule.convert_to_finetune_format(
+            jsonl, out, "openai", progress_interval=0, dedup_mode="near"), records, "records"),
+        ("convert_packed", lambda: Functionmodule.convert_to_finetune_format_packed(
+            jsonl, out, "openai", progress_interval=0), records, "records"),
+        ("convert_sharded_gzip", lambda: Functionmodule.convert_to_finetune_format(
+            jsonl, os.path.join(tmp, "shard.jsonl"), "openai", progress_interval=0,
+            shard_samples=max(1, records // 4), compression="gzip"), records, "records"),
+    ]
+
+
+def compare(results, baseline, threshold):
+    """
+    Returns:
+        list: threshold보다 느려진 항목 이름
+    """
+    regressions = []
+    print(f"\n{'항목':>22} | {'기준':>9} | {'현재':>9} | {'변화':>7}")
+    for name, seconds in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        change = seconds / before - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  <- 느려짐"
+        print(f"{name:>22} | {before * 1000:7.1f}ms | {seconds * 1000:7.1f}ms | {change:+6.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="추출기/변환기 마이크로벤치마크")
+    parser.add_argument("--days", type=int, default=30, help="합성 대화 날짜 수")
+    parser.add_argument("--per-day", type=int, default=300, help="하루 메시지 수")
+    parser.add_argument("--records", type=int, default=5000, help="합성 AI-Hub 레코드 수")
+    parser.add_argument("--repeat", type=int, default=5, help="항목마다 반복 횟수 (가장 빠른 값 사용)")
+    parser.add_argument("--only", help="이 문자열이 들어간 항목만 실행")
+    parser.add_argument("--save", help="결과(항목별 초)를 저장할 JSON 경로")
+    parser.add_argument("--compare", help="비교할 이전 결과 JSON 경로")
+    parser.add_argument("--threshold", type=float, default=0.15, help="이 비율보다 느려지면 회귀로 판단")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        cases = extractor_cases(args.days, args.per_day) + converter_cases(tmp, args.records)
+        print(f"{'항목':>22} | {'시간':>9} | {'처리량':>22}")
+        for name, func, units, unit in cases:
+            if args.only and args.only not in name:
+                continue
+            seconds = best_time(func, args.repeat)
+            results[name] = seconds
+            print(f"{name:>22} | {seconds * 1000:7.1f}ms | {units / seconds:14,.0f} {unit}/s")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n결과 저장: {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{args.threshold:.0%}보다 느려진 항목: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
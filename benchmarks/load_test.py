@@ -0,0 +1,163 @@
+"""
+감성일기 API 부하 테스트 (실제 API 비용 없이 모의 서버로)
+
+    python -m benchmarks.load_test --requests 200 --concurrency 20
+    python -m benchmarks.load_test --endpoints auto-diary --pipeline single --rate-limit-rate 0.05
+    python -m benchmarks.load_test --fence-rate 0.2 --broken-rate 0.05
+    python -m benchmarks.load_test --base-url http://127.0.0.1:8000
+
+로컬 모의 chat completions 서버(benchmarks.mock_openai)를 띄우고 main.app을 프로세스 안에서
+(ASGI) 호출해서 /upload-kakao, /generate-diary, /auto-diary의 처리량(RPS)과 지연 시간
+p50/p95/p99, 실패 수를 출력한다. 끝나면 서버의 /metrics에서 단계별 평균 시간도 읽어 보여준다.
+
+--base-url을 주면 이미 떠 있는 서버(uvicorn main:app)를 대상으로 한다. 그 서버의
+OPENAI_BASE_URL은 직접 모의 서버(python -m benchmarks.mock_openai)로 맞춰 둬야 한다.
+요청마다 내용이 달라서 응답 캐시에 걸리지 않는다 (--distinct로 서로 다른 요청 수를 줄이면 캐시 적중).
+"""
+import argparse
+import asyncio
+import os
+import re
+import time
+from collections import Counter
+
+import httpx
+
+from benchmarks import mock_openai
+from benchmarks.synthetic import make_chat, make_kakao_export
+
+
+ENDPOINTS = ["upload-kakao", "generate-diary", "auto-diary"]
+STAGE_METRIC = re.compile(r'^diary_stage_duration_seconds_(sum|count)\{stage="([^"]+)"\} (\S+)$', re.M)
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def make_payloads(endpoint, count, pipeline, messages_per_day, seed=0):
+    """엔드포인트별 요청 인자 count개 (시간 재기 전에 미리 만들어 둠)"""
+    seeds = range(seed, seed + count)
+    if endpoint == "generate-diary":
+        return [{"json": {"kakao_text": make_chat(i), "pipeline": pipeline}} for i in seeds]
+    params = {"pipeline": pipeline} if endpoint == "auto-diary" else {}
+    return [
+        {"files": {"file": (f"chat{i}.txt", make_kakao_export("pc", 2, messages_per_day, seed=i).encode())},
+         "params": params}
+        for i in seeds
+    ]
+
+
+async def run_endpoint(client, endpoint, payloads, requests, concurrency):
+    """
+    Returns:
+        dict: 성공 요청 지연 목록, 상태 코드별 개수, 전체 걸린 시간
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    statuses = Counter()
+
+    async def one(i):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                r = await client.post(f"/{endpoint}", **payloads[i % len(payloads)])
+                status = r.status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            statuses[status] += 1
+            if status == 200:
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return {"latencies": latencies, "statuses": statuses, "elapsed": time.perf_counter() - started}
+
+
+def print_result(endpoint, result, requests):
+    latencies = result["latencies"]
+    failed = requests - result["statuses"][200]
+    if latencies:
+        quantiles = " | ".join(f"{percentile(latencies, pct):7.3f}s" for pct in (50, 95, 99))
+    else:
+        quantiles = " | ".join(f"{'-':>8}" for _ in range(3))
+    print(f"{endpoint:>15} | {requests:6,} | {failed:6,} | {len(latencies) / result['elapsed']:8.1f} | {quantiles}")
+    if failed:
+        codes = ", ".join(f"{status}: {count}" for status, count in sorted(result["statuses"].items(), key=str)
+                          if status != 200)
+        print(f"{'':>15}   실패 상태: {codes}")
+
+
+def print_stages(metrics_text):
+    """/metrics의 단계별 히스토그램 합계/개수로 평균 시간 출력"""
+    totals = {}
+    for kind, stage, value in STAGE_METRIC.findall(metrics_text):
+        totals.setdefault(stage, {})[kind] = float(value)
+    if not totals:
+        return
+    print(f"\n{'단계':>22} | {'횟수':>7} | {'평균':>9} | {'합계':>8}")
+    for stage, total in sorted(totals.items(), key=lambda item: -item[1].get("sum", 0)):
+        count = int(total.get("count", 0))
+        mean = total.get("sum", 0) / count if count else 0
+        print(f"{stage:>22} | {count:7,} | {mean * 1000:7.1f}ms | {total.get('sum', 0):7.2f}s")
+
+
+async def run(args, app=None, mock_url=None):
+    endpoints = [e.strip().lstrip("/") for e in args.endpoints.split(",")]
+    transport = httpx.ASGITransport(app=app) if app is not None else None
+    base_url = args.base_url or "http://loadtest"
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=args.timeout,
+                                 limits=httpx.Limits(max_connections=args.concurrency)) as client:
+        print(f"요청 {args.requests}개씩, 동시 {args.concurrency}개, pipeline={args.pipeline}")
+        print(f"{'endpoint':>15} | {'요청':>6} | {'실패':>6} | {'RPS':>8} | {'p50':>8} | {'p95':>8} | {'p99':>8}")
+        for n, endpoint in enumerate(endpoints):
+            if endpoint not in ENDPOINTS:
+                raise SystemExit(f"지원하지 않는 엔드포인트입니다: {endpoint} ({', '.join(ENDPOINTS)})")
+            # 엔드포인트마다 다른 seed 구간을 써서 앞 엔드포인트의 캐시/색인에 걸리지 않게 함
+            distinct = args.distinct or args.requests
+            payloads = make_payloads(endpoint, distinct, args.pipeline, args.messages_per_day, seed=n * distinct)
+            result = await run_endpoint(client, endpoint, payloads, args.requests, args.concurrency)
+            print_result(endpoint, result, args.requests)
+
+        print_stages((await client.get("/metrics")).text)
+
+    if mock_url:
+        async with httpx.AsyncClient(base_url=mock_url) as mock:
+            stats = (await mock.get("/stats")).json()
+        print(f"\n모의 API: 성공 {stats['requests']:,}회, 429 {stats['rate_limited']:,}회, 500 {stats['errors']:,}회,"
+              f" 입력 토큰 {stats['prompt_tokens']:,}, 출력 토큰 {stats['completion_tokens']:,}")
+        print(f"모의 API 깨진 응답: 코드블록 {stats['fenced']:,}회, 잘림 {stats['broken']:,}회")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="감성일기 API 부하 테스트")
+    parser.add_argument("--requests", type=int, default=100, help="엔드포인트마다 보낼 요청 수")
+    parser.add_argument("--concurrency", type=int, default=10, help="동시에 보낼 요청 수")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="쉼표로 구분한 엔드포인트")
+    parser.add_argument("--pipeline", choices=["two_step", "single"], default="two_step")
+    parser.add_argument("--distinct", type=int, default=0, help="서로 다른 요청 내용 수 (0이면 요청 수만큼)")
+    parser.add_argument("--messages-per-day", type=int, default=200, help="업로드 파일의 하루 메시지 수")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--base-url", help="이미 떠 있는 API 서버 주소 (없으면 main.app을 프로세스 안에서 실행)")
+    mock_openai.add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.base_url:
+        asyncio.run(run(args))
+        return
+
+    server, mock_url = mock_openai.start_in_thread(mock_openai.app_from_args(args))
+    os.environ["OPENAI_BASE_URL"] = f"{mock_url}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "mock")
+    import main as diary_service  # 환경변수를 정한 뒤에 불러와야 모의 서버로 연결됨
+
+    try:
+        # main의 AsyncOpenAI 클라이언트는 이벤트 루프 하나에서만 쓸 수 있으므로 한 번의 asyncio.run 안에서 실행
+        asyncio.run(run(args, diary_service.app, mock_url))
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+로컬 chat completions 모의 서버 (실제 API 비용 없이 벤치마크용)
+
+    python -m benchmarks.mock_openai [포트]
+
+응답 지연은 (기본 지연 + 입력 토큰 × 입력 지연 + 출력 토큰 × 출력 지연)으로 흉내 낸다.
+응답 본문은 response_format의 JSON 스키마, 없으면 프롬프트 안의 '"키": "..."'
+템플릿에서 키를 뽑아 한국어 문장으로 채운다. stream=True면 SSE 청크로 나눠 보낸다
+(stream_options.include_usage면 마지막에 토큰 사용량 청크도 보냄).
+error_rate/rate_limit_rate 비율만큼 500/429 응답을 섞어서 재시도 경로도 시험할 수 있다.
+fence_rate는 JSON을 코드블록과 설명 문장으로 감싸고(로컬 복구 대상), broken_rate는 JSON을
+중간에서 잘라 보낸다(그 단계만 다시 호출하는 경로).
+GET /stats로 누적 호출/토큰/오류 수를 본다.
+
+    python -m benchmarks.mock_openai 8001 --latency 0.3 --rate-limit-rate 0.05
+"""
+import argparse
+import asyncio
+import random
+import re
+import socket
+import threading
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import Response, StreamingResponse
+
+import jsoncodec
+
+
+TEMPLATE_KEY = re.compile(r'"([^"\n]+)"\s*:\s*"\.\.\."')
+STREAM_CHUNK_CHARS = 6  # 스트리밍 청크 하나에 담을 글자 수
+FILLER = "오늘은 여러 가지 일이 있었고 마음이 조금 복잡했던 하루였어요. "
+
+
+def estimate_tokens(text):
+    """한국어 기준 대략 1.5글자당 1토큰으로 추정"""
+    return max(1, round(len(text) / 1.5))
+
+
+def _response_keys(body):
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        return list(response_format["json_schema"]["schema"]["properties"])
+    prompt = body["messages"][-1]["content"]
+    return TEMPLATE_KEY.findall(prompt)
+
+
+def _sse_chunk(chunk_id, model, delta, finish_reason):
+    return "data: " + jsoncodec.dumps({
+        "id": chunk_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }) + "\n\n"
+
+
+def _empty_stats():
+    return {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "errors": 0, "rate_limited": 0,
+            "fenced": 0, "broken": 0}
+
+
+def _error_response(status, error_type, message, headers=None):
+    # OpenAI API와 같은 오류 본문 (SDK가 RateLimitError/InternalServerError로 바꿈)
+    return Response(jsoncodec.dumps_bytes({
+        "error": {"message": message, "type": error_type, "param": None, "code": error_type},
+    }), status_code=status, media_type="application/json", headers=headers)
+
+
+def create_app(base_latency=0.3, prompt_token_latency=0.00005, completion_token_latency=0.002,
+               field_chars=120, error_rate=0.0, rate_limit_rate=0.0, retry_after=0.05, seed=None,
+               fence_rate=0.0, broken_rate=0.0):
+    """
+    Args:
+        base_latency (float): 호출마다 기본으로 걸리는 시간(초)
+        prompt_token_latency (float): 입력 토큰 하나당 시간(초)
+        completion_token_latency (float): 출력 토큰 하나당 시간(초)
+        field_chars (int): JSON 필드 하나에 채울 글자 수
+        error_rate (float): 500 오류로 응답할 비율
+        rate_limit_rate (float): 429로 응답할 비율
+        retry_after (float): 429 응답의 retry-after(초)
+        seed (int): 오류를 섞는 난수 시드 (같은 시드면 같은 순서로 오류 발생)
+        fence_rate (float): JSON 응답을 ```json 코드블록과 설명 문장으로 감쌀 비율
+        broken_rate (float): JSON 응답을 중간에서 잘라 보낼 비율
+    """
+    app = FastAPI()
+    app.state.stats = _empty_stats()
+    filler = (FILLER * (field_chars // len(FILLER) + 1))[:field_chars]
+    rng = random.Random(seed)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = jsoncodec.loads(await request.body())
+        stats = app.state.stats
+        roll = rng.random()
+        if roll < rate_limit_rate:
+            stats["rate_limited"] += 1
+            return _error_response(429, "rate_limit_exceeded", "모의 서버: 분당 요청 한도 초과", {
+                "retry-after": f"{retry_after:g}",
+                "retry-after-ms": str(int(retry_after * 1000)),
+            })
+        if roll < rate_limit_rate + error_rate:
+            stats["errors"] += 1
+            await asyncio.sleep(base_latency)
+            return _error_response(500, "server_error", "모의 서버: 내부 오류")
+
+        prompt_tokens = sum(estimate_tokens(m["content"]) for m in body["messages"])
+
+        keys = _response_keys(body)
+        if keys:
+            content = jsoncodec.dumps({key: filler for key in keys})
+            roll = rng.random()
+            if roll < fence_rate:
+                stats["fenced"] += 1
+                content = f"요청하신 결과입니다.\n```json\n{content}\n```"
+            elif roll < fence_rate + broken_rate:
+                stats["broken"] += 1
+                content = content[:len(content) // 2]
+        else:
+            content = filler
+        completion_tokens = estimate_tokens(content)
+
+        stats["requests"] += 1
+        stats["prompt_tokens"] += prompt_tokens
+        stats["completion_tokens"] += completion_tokens
+
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        if body.get("stream"):
+            include_usage = (body.get("stream_options") or {}).get("include_usage")
+            return StreamingResponse(
+                _stream(body["model"], content, base_latency + prompt_tokens * prompt_token_latency,
+                        usage if include_usage else None),
+                media_type="text/event-stream",
+            )
+
+        await asyncio.sleep(
+            base_latency
+            + prompt_tokens * prompt_token_latency
+            + completion_tokens * completion_token_latency
+        )
+        return Response(jsoncodec.dumps_bytes({
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body["model"],
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        }), media_type="application/json")
+
+    async def _stream(model, content, first_token_latency, usage=None):
+        # 첫 토큰까지 기다린 뒤 몇 글자씩 출력 토큰 지연에 맞춰 흘려보냄
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex}"
+        await asyncio.sleep(first_token_latency)
+        for i in range(0, len(content), STREAM_CHUNK_CHARS):
+            piece = content[i:i + STREAM_CHUNK_CHARS]
+            await asyncio.sleep(estimate_tokens(piece) * completion_token_latency)
+            yield _sse_chunk(chunk_id, model, {"content": piece}, None)
+        yield _sse_chunk(chunk_id, model, {}, "stop")
+        if usage is not None:
+            yield "data: " + jsoncodec.dumps({
+                "id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": model, "choices": [], "usage": usage,
+            }) + "\n\n"
+        yield "data: [DONE]\n\n"
+
+    @app.get("/stats")
+    async def get_stats():
+        return app.state.stats
+
+    @app.post("/reset")
+    async def reset():
+        app.state.stats = _empty_stats()
+        return app.state.stats
+
+    return app
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_in_thread(app, port=None):
+    """
+    백그라운드 스레드에서 서버 실행
+
+    Returns:
+        tuple: (uvicorn.Server, base_url) - 끝낼 때 server.should_exit = True
+    """
+    port = port or free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, f"http://127.0.0.1:{port}"
+
+
+def add_arguments(parser):
+    """모의 서버 설정 옵션 (load_test와 같이 씀)"""
+    parser.add_argument("--latency", type=float, default=0.3, help="호출마다 기본 지연(초)")
+    parser.add_argument("--token-latency", type=float, default=0.002, help="출력 토큰 하나당 지연(초)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="500 오류 비율")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="429 비율")
+    parser.add_argument("--retry-after", type=float, default=0.05, help="429 응답의 retry-after(초)")
+    parser.add_argument("--seed", type=int, default=None, help="오류를 섞는 난수 시드")
+    parser.add_argument("--fence-rate", type=float, default=0.0, help="코드블록으로 감싼 JSON 응답 비율")
+    parser.add_argument("--broken-rate", type=float, default=0.0, help="잘린 JSON 응답 비율")
+
+
+def app_from_args(args):
+    return create_app(base_latency=args.latency, completion_token_latency=args.token_latency,
+                      error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+                      retry_after=args.retry_after, seed=args.seed,
+                      fence_rate=args.fence_rate, broken_rate=args.broken_rate)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="로컬 chat completions 모의 서버")
+    parser.add_argument("port", type=int, nargs="?", default=8001)
+    add_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(app_from_args(args), host="127.0.0.1", port=args.port)
@@ -0,0 +1,109 @@
+"""
+벤치마크용 합성 데이터 생성기
+"""
+import datetime
+import json
+import random
+
+
+SPEAKERS = ["김민수", "이지은", "박서준", "최유나"]
+PHRASES = ["오늘 발표 준비 때문에 너무 정신없었어", "점심 뭐 먹을까", "팀장님이 또 일정 당기셨대",
+           "퇴근하고 운동 갈 거야?", "요즘 잠을 잘 못 자", "주말에 바다 보러 가자", "아 진짜 짜증나네",
+           "사진", "이모티콘"]
+WEEKDAYS = "월화수목금토일"
+
+
+def _clock(minutes):
+    hour, minute = divmod(minutes, 60)
+    return f"{'오전' if hour < 12 else '오후'} {hour % 12 or 12}:{minute:02d}"
+
+
+def kakao_message_line(fmt, day, minutes, speaker, text):
+    """내보내기 형식 fmt의 메시지 첫 줄"""
+    clock = _clock(minutes)
+    if fmt == "pc":
+        return f"[{speaker}] [{clock}] {text}"
+    if fmt == "mobile":
+        return f"[{speaker}] {clock} {text}"
+    if fmt == "android":
+        return f"{day.year}년 {day.month}월 {day.day}일 {clock}, {speaker} : {text}"
+    if fmt == "ios":
+        return f"{day.year}. {day.month}. {day.day}. {clock}, {speaker} : {text}"
+    raise ValueError(f"알 수 없는 형식: {fmt}")
+
+
+def kakao_date_header(fmt, day):
+    header = f"{day.year}년 {day.month}월 {day.day}일 {WEEKDAYS[day.weekday()]}요일"
+    return f"--------------- {header} ---------------" if fmt == "pc" else header
+
+
+def make_kakao_export(fmt, days=30, messages_per_day=200, end=None, seed=0, multiline_ratio=0.05):
+    """
+    카카오톡 대화 내보내기와 같은 구조의 합성 텍스트 생성
+
+    Args:
+        fmt (str): pc, mobile, android, ios
+        days (int): 날짜 수 (마지막 날짜가 end)
+        messages_per_day (int): 하루 메시지 수
+        end (datetime.date): 마지막 날짜 (기본: 오늘)
+        multiline_ratio (float): 여러 줄 메시지 비율
+
+    Returns:
+        str: 대화 원문
+    """
+    rng = random.Random(seed)
+    end = end or datetime.date.today()
+    lines = ["카카오톡 대화 내보내기", f"저장한 날짜 : {end.year}-{end.month:02d}-{end.day:02d}", ""]
+    for offset in range(days - 1, -1, -1):
+        day = end - datetime.timedelta(days=offset)
+        lines.append(kakao_date_header(fmt, day))
+        for i in range(messages_per_day):
+            minutes = 9 * 60 + i * (14 * 60) // messages_per_day
+            text = f"{rng.choice(PHRASES)} ({offset}-{i})"
+            lines.append(kakao_message_line(fmt, day, minutes, rng.choice(SPEAKERS), text))
+            if rng.random() < multiline_ratio:
+                lines.append("그리고 하나 더 말하자면")
+                lines.append("이건 다음 줄에 이어지는 내용이야")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def make_chat(seed, lines=30):
+    """오늘 대화처럼 보이는 합성 메시지 (seed마다 달라서 응답 캐시에 걸리지 않음)"""
+    rng = random.Random(seed)
+    phrases = ["오늘 발표 준비 때문에 너무 정신없었어", "점심 뭐 먹을까", "팀장님이 또 일정 당기셨대",
+               "퇴근하고 운동 갈 거야?", "요즘 잠을 잘 못 자", "주말에 바다 보러 가자", "아 진짜 짜증나네"]
+    return "\n".join(f"{rng.choice(phrases)} ({seed}-{i})" for i in range(lines))
+
+
+EMOTIONS = ["분노", "슬픔", "불안", "상처", "당황", "기쁨"]
+
+
+def iter_aihub_records(records, seed=0, max_turns=3):
+    """AI-Hub 감성 대화 말뭉치와 같은 구조의 합성 레코드 (제너레이터)"""
+    rng = random.Random(seed)
+    for i in range(records):
+        content = {}
+        for turn in range(1, rng.randint(1, max_turns) + 1):
+            content[f"HS{turn:02d}"] = f"요즘 회사 일 때문에 너무 힘들어. {i}번째 고민이야. " * rng.randint(1, 4)
+            content[f"SS{turn:02d}"] = f"많이 지치셨겠어요. 어떤 점이 가장 힘드신가요? ({i})" * rng.randint(1, 3)
+        yield {
+            "profile": {"emotion": {"type": rng.choice(EMOTIONS), "situation": ["S06", f"D0{i % 4}"]}},
+            "talk": {"content": content},
+        }
+
+
+def make_aihub_jsonl(path, records, seed=0):
+    """합성 AI-Hub 레코드를 한 줄에 하나씩 JSONL로 기록"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in iter_aihub_records(records, seed):
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def make_aihub_json(path, records, seed=0):
+    """합성 AI-Hub 레코드를 최상위 배열 하나로 기록 (json_to_jsonl 입력용)"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("[\n")
+        for i, record in enumerate(iter_aihub_records(records, seed)):
+            f.write((",\n" if i else "") + json.dumps(record, ensure_ascii=False))
+        f.write("\n]\n")
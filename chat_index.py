@@ -0,0 +1,260 @@
+import contextlib
+import datetime
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import kakao_parser
+
+
+# 다른 연결이 색인을 쓰는 동안 기다릴 시간(초). 큰 파일은 색인하는 데 수 초가 걸림
+WRITE_TIMEOUT = 60
+
+
+def content_hash(buf):
+    """파일 내용(bytes 또는 mmap)의 SHA-256. 같은 파일을 다시 올리면 같은 키가 나옴"""
+    return hashlib.sha256(buf).hexdigest()
+
+
+def is_disk_path(path):
+    """SQLite 경로가 메모리 DB가 아니라 디스크 파일이면 True"""
+    return bool(path) and path != ":memory:" and not path.startswith("file::memory:") and "mode=memory" not in path
+
+
+class ChatIndex:
+    """
+    파싱한 카카오톡 메시지를 파일 내용 해시별로 저장하는 SQLite 색인
+
+    같은 파일이 다시 들어오면 (Streamlit 재실행, /upload-kakao 다음 /auto-diary 등)
+    정규식으로 다시 훑지 않고 날짜/이름 색인으로 바로 조회한다. 다른 날짜를 물어도 같은 색인을 쓴다.
+
+        key = chat_index.add(buf)
+        text = "\n".join(chat_index.recent_texts(key, "2025년 6월 7일"))
+
+    새 파일은 전체를 한 번 파싱하므로 (수십 MB 내보내기는 수 초) 매번 내용이 바뀌는 업로드에는
+    kakao_parser.extract_recent_messages가 훨씬 빠르다. 메시지는 파싱하면서 바로 DB에 넣고
+    메모리에 모아 두지 않지만, ":memory:" DB는 색인한 메시지가 모두 프로세스 메모리에 남으므로
+    서비스에서는 디스크 경로(CHAT_INDEX_PATH)로만 쓴다.
+
+    Args:
+        path (str): SQLite 파일 경로. 기본값 ":memory:"는 프로세스 안에서만 유지되고 (테스트/벤치마크용),
+            파일 경로를 주면 여러 프로세스(API 서버, Streamlit)가 같이 씀
+        max_files (int): 보관할 최대 파일 수 (오래 안 쓴 파일부터 삭제)
+    """
+
+    def __init__(self, path=":memory:", max_files=1000):
+        self.path = path
+        self.max_files = max_files
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " id INTEGER PRIMARY KEY, hash TEXT NOT NULL UNIQUE, format TEXT,"
+            " lines INTEGER NOT NULL, messages INTEGER NOT NULL, accessed REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS messages ("
+            " file_id INTEGER NOT NULL, seq INTEGER NOT NULL, day TEXT, time TEXT NOT NULL,"
+            " speaker TEXT NOT NULL, text TEXT NOT NULL, noise INTEGER NOT NULL,"
+            " PRIMARY KEY (file_id, seq)) WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS messages_day ON messages(file_id, day, seq);"
+            "CREATE INDEX IF NOT EXISTS messages_speaker ON messages(file_id, speaker, seq);"
+        )
+        self._db.commit()
+        if self.on_disk:
+            # 조회 연결은 쓰기 잠금을 오래 기다리지 않음 (다른 연결이 색인하는 동안 _touch는 건너뜀)
+            self._db.execute("PRAGMA busy_timeout = 200")
+
+    @property
+    def on_disk(self):
+        return is_disk_path(self.path)
+
+    @classmethod
+    def from_env(cls):
+        """CHAT_INDEX_PATH, CHAT_INDEX_MAX_FILES 환경변수로 생성"""
+        return cls(
+            path=os.getenv("CHAT_INDEX_PATH") or ":memory:",
+            max_files=int(os.getenv("CHAT_INDEX_MAX_FILES", "1000")),
+        )
+
+    def add(self, buf):
+        """
+        파일을 색인하고 키(내용 해시)를 반환. 이미 색인된 파일이면 파싱하지 않음
+
+        Args:
+            buf: bytes 또는 mmap (kakao_parser.open_buffer 결과)
+        """
+        key = content_hash(buf)
+        with self._lock:
+            if self._touch(key):
+                self.hits += 1
+                return key
+            self.misses += 1
+
+        parser = kakao_parser.ChatParser()
+        lines = messages = 0
+
+        def rows(file_id):
+            # 파싱한 메시지를 목록에 모으지 않고 executemany로 바로 넘김
+            nonlocal lines, messages
+            for line in kakao_parser.iter_buffer_lines(buf):
+                lines += 1
+                if (message := parser.feed(line)) is not None:
+                    yield self._row(file_id, messages, message)
+                    messages += 1
+            if (message := parser.flush()) is not None:
+                yield self._row(file_id, messages, message)
+                messages += 1
+
+        with self._writer() as db:
+            # 트랜잭션이 끝나야 다른 연결에 보이므로 조회하는 쪽은 다 넣은 파일만 봄
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                if db.execute("SELECT 1 FROM files WHERE hash = ?", (key,)).fetchone():
+                    db.rollback()  # 같은 파일을 동시에 색인한 요청이 먼저 끝남
+                    return key
+                file_id = db.execute(
+                    "INSERT INTO files (hash, format, lines, messages, accessed) VALUES (?, NULL, 0, 0, ?)",
+                    (key, time.time()),
+                ).lastrowid
+                db.executemany(
+                    "INSERT INTO messages (file_id, seq, day, time, speaker, text, noise)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows(file_id),
+                )
+                db.execute(
+                    "UPDATE files SET format = ?, lines = ?, messages = ? WHERE id = ?",
+                    (parser.format, lines, messages, file_id),
+                )
+                self._prune(db)
+                db.commit()
+            except BaseException:
+                db.rollback()
+                raise
+        return key
+
+    @staticmethod
+    def _row(file_id, seq, message):
+        return (
+            file_id,
+            seq,
+            message.date.isoformat() if message.date else None,
+            message.time.strftime("%H:%M"),
+            message.speaker,
+            message.text,
+            message.is_noise,
+        )
+
+    @contextlib.contextmanager
+    def _writer(self):
+        """
+        색인을 쓸 연결
+
+        디스크 DB는 쓰기 전용 연결을 따로 열어서 파싱하는 동안 다른 파일 조회가 막히지 않게 하고 (WAL),
+        메모리 DB는 연결이 하나뿐이라 잠금을 잡고 같은 연결을 쓴다.
+        """
+        if not self.on_disk:
+            with self._lock:
+                yield self._db
+            return
+        db = sqlite3.connect(self.path, timeout=WRITE_TIMEOUT, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def _touch(self, key):
+        try:
+            cur = self._db.execute("UPDATE files SET accessed = ? WHERE hash = ?", (time.time(), key))
+        except sqlite3.OperationalError:
+            # 다른 연결이 색인을 쓰는 중: 접근 시각 갱신은 건너뛰고 있는지만 확인
+            self._db.rollback()
+            return self._db.execute("SELECT 1 FROM files WHERE hash = ?", (key,)).fetchone() is not None
+        self._db.commit()  # 일치하는 행이 없어도 트랜잭션을 끝내야 쓰기 잠금이 남지 않음
+        return cur.rowcount > 0
+
+    def _prune(self, db):
+        stale = "SELECT id FROM files ORDER BY accessed DESC LIMIT -1 OFFSET ?"
+        db.execute(f"DELETE FROM messages WHERE file_id IN ({stale})", (self.max_files,))
+        db.execute(f"DELETE FROM files WHERE id IN ({stale})", (self.max_files,))
+
+    def info(self, key):
+        """색인된 파일 정보 (없으면 None)"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT format, lines, messages FROM files WHERE hash = ?", (key,)
+            ).fetchone()
+        return dict(zip(("format", "lines", "messages"), row)) if row else None
+
+    def recent_texts(self, key, date_str=None, limit=kakao_parser.RECENT_LIMIT):
+        """
+        잡음을 뺀 최근 메시지 본문 limit개 (kakao_parser.extract_messages와 같은 결과)
+
+        Args:
+            date_str (str): 예) "2025년 6월 7일". None이면 파일 전체에서
+        """
+        where, params = "f.hash = ? AND m.noise = 0", [key]
+        if date_str:
+            day = kakao_parser.parse_date(date_str)
+            where += " AND m.day = ?"
+            params.append(day.isoformat() if day else "")
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT m.text FROM messages m JOIN files f ON f.id = m.file_id"
+                f" WHERE {where} ORDER BY m.seq DESC LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+        return [text for text, in reversed(rows)]
+
+    def messages(self, key, date_str=None, speaker=None, include_noise=False):
+        """조건에 맞는 메시지를 ChatMessage 목록으로 반환 (오래된 순)"""
+        where, params = "f.hash = ?", [key]
+        if date_str:
+            day = kakao_parser.parse_date(date_str)
+            where += " AND m.day = ?"
+            params.append(day.isoformat() if day else "")
+        if speaker is not None:
+            where += " AND m.speaker = ?"
+            params.append(speaker)
+        if not include_noise:
+            where += " AND m.noise = 0"
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT m.day, m.time, m.speaker, m.text FROM messages m JOIN files f ON f.id = m.file_id"
+                f" WHERE {where} ORDER BY m.seq",
+                params,
+            ).fetchall()
+        return [
+            kakao_parser.ChatMessage(
+                datetime.date.fromisoformat(day) if day else None,
+                datetime.time.fromisoformat(clock),
+                speaker,
+                text,
+            )
+            for day, clock, speaker, text in rows
+        ]
+
+    def dates(self, key):
+        """파일에 있는 날짜 목록 ('2025-06-07' 형식, 오래된 순)"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT DISTINCT m.day FROM messages m JOIN files f ON f.id = m.file_id"
+                " WHERE f.hash = ? AND m.day IS NOT NULL ORDER BY m.day",
+                (key,),
+            ).fetchall()
+        return [day for day, in rows]
+
+    def stats(self):
+        """색인 적중/미스 카운터"""
+        lookups = self.hits + self.misses
+        with self._lock:
+            files, = self._db.execute("SELECT COUNT(*) FROM files").fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "files": files,
+        }
@@ -0,0 +1,284 @@
+import contextlib
+import glob
+import gzip
+import io
+import os
+import re
+
+import jsoncodec
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+
+
+def detect_compression(path):
+    """확장자로 압축 형식 판단 (.gz -> gzip, .zst -> zstd, 그 외 None)"""
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if path.endswith(suffix):
+            return compression
+    return None
+
+
+def with_suffix(path, compression):
+    """압축 형식에 맞는 확장자를 붙인 경로 (이미 붙어 있으면 그대로)"""
+    suffix = COMPRESSION_SUFFIXES.get(compression, "")
+    return path if path.endswith(suffix) else path + suffix
+
+
+def open_binary(path, mode="rb", compression=None, level=None):
+    """
+    압축 여부와 상관없이 바이너리 파일처럼 읽고 쓸 수 있는 파일 객체
+
+    Args:
+        compression (str): "gzip", "zstd" 또는 None. 읽을 때 None이면 확장자로 판단
+            ("zstd"는 선택 패키지 zstandard가 있어야 함: pip install zstandard)
+        level (int): 압축 레벨 (기본: gzip 6, zstd 3)
+    """
+    if compression is None and "r" in mode:
+        compression = detect_compression(path)
+    if compression == "gzip":
+        return gzip.open(path, mode, compresslevel=level or 6)
+    if compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd 압축을 쓰려면 zstandard 패키지를 설치하세요 (pip install zstandard)")
+        if "r" in mode:
+            return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True))
+        return zstandard.ZstdCompressor(level=level or 3).stream_writer(open(path, mode), closefd=True)
+    if compression is not None:
+        raise ValueError(f"지원하지 않는 압축 형식입니다: {compression}")
+    return open(path, mode)
+
+
+def skip_to(f, offset):
+    """(압축이 풀린 기준) offset 위치로 이동. seek가 안 되는 스트림은 읽어서 버림"""
+    try:
+        f.seek(offset)
+        return
+    except (OSError, io.UnsupportedOperation):
+        pass
+    remaining = offset
+    while remaining > 0:
+        chunk = f.read(min(remaining, 1024 * 1024))
+        if not chunk:
+            break
+        remaining -= len(chunk)
+
+
+def _write_atomic(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class Checkpoint:
+    """
+    변환 진행 상황 매니페스트 (출력 경로 + ".manifest.json")
+
+    샤드 하나가 완성될 때마다 그 샤드까지 읽은 입력 위치(압축이 풀린 기준 바이트 offset과
+    레코드 수)와 완성된 샤드 목록을 원자적으로 저장한다. 중간에 멈추면 마지막 저장 시점부터
+    이어서 변환한다.
+
+    Args:
+        output_file (str): 기준 출력 경로
+        input_file (str): 입력 경로 (크기/수정 시각이 바뀌면 이어서 하지 않음)
+        params (dict): 결과에 영향을 주는 설정 (바뀌면 이어서 하지 않음)
+    """
+
+    def __init__(self, output_file, input_file, params):
+        self.path = output_file + ".manifest.json"
+        stat = os.stat(input_file)
+        self.input = {"path": os.path.abspath(input_file), "size": stat.st_size, "mtime": stat.st_mtime}
+        self.params = params
+        self.offset = 0
+        self.records = 0
+        self.samples = 0
+        self.shards = []
+        self.done = False
+
+    def load(self):
+        """
+        저장된 매니페스트가 같은 입력/설정이면 그 상태를 불러옴
+
+        Returns:
+            bool: 이어서 할 수 있으면 True
+        """
+        try:
+            with open(self.path, "rb") as f:
+                state = jsoncodec.loads(f.read())
+        except (FileNotFoundError, jsoncodec.JSONDecodeError):
+            return False
+        if state.get("input") != self.input or state.get("params") != self.params:
+            return False
+        self.offset = state["offset"]
+        self.records = state["records"]
+        self.samples = state["samples"]
+        self.shards = state["shards"]
+        self.done = state["done"]
+        return True
+
+    def save(self):
+        _write_atomic(self.path, jsoncodec.dumps_bytes({
+            "input": self.input,
+            "params": self.params,
+            "offset": self.offset,
+            "records": self.records,
+            "samples": self.samples,
+            "shards": self.shards,
+            "done": self.done,
+        }))
+
+
+class ShardedWriter:
+    """
+    샘플을 개수/크기 기준으로 여러 샤드 파일에 나눠 기록 (압축 선택)
+
+    샤드는 "경로.tmp"에 쓰고 다 쓴 뒤에 최종 이름으로 바꾸므로, 중간에 멈춰도 최종 이름의
+    샤드는 항상 완전한 파일이다. 샤드는 입력 레코드 경계(end_record)에서만 넘어가서
+    체크포인트의 입력 위치와 샤드 내용이 어긋나지 않는다.
+    max_samples와 max_bytes가 모두 None이면 output_file 하나에 기록한다.
+
+        out = ShardedWriter("out.jsonl", JsonlWriter, max_samples=100000, compression="zstd")
+        for offset, record in records:
+            for sample in convert(record):
+                out.write(sample)
+            out.end_record(offset)
+        out.close(offset)
+
+    Args:
+        output_file (str): 기준 출력 경로. 샤드는 out-00000.jsonl.zst 형식
+        writer_factory: 열린 파일로 출력기를 만드는 함수 (write, flush, buffer, count, bytes 필요)
+        max_samples (int): 샤드 하나의 최대 샘플 수
+        max_bytes (int): 샤드 하나의 최대 크기 (압축 전 바이트)
+        compression (str): "gzip", "zstd" 또는 None
+        checkpoint (Checkpoint): 샤드가 완성될 때마다 저장할 매니페스트
+    """
+
+    def __init__(self, output_file, writer_factory, max_samples=None, max_bytes=None, compression=None,
+                 checkpoint=None):
+        self.output_file = output_file
+        self.writer_factory = writer_factory
+        self.max_samples = max_samples
+        self.max_bytes = max_bytes
+        self.compression = compression
+        self.sharded = bool(max_samples or max_bytes)
+        self.checkpoint = checkpoint
+        self.shards = list(checkpoint.shards) if checkpoint else []
+        self.count = sum(shard["samples"] for shard in self.shards)
+        self._file = None
+        self._writer = None
+        self._path = None
+        self._remove_partial_shards()
+        if not self.shards:
+            self._remove_stale_outputs()
+
+    def shard_path(self, index):
+        if not self.sharded:
+            return with_suffix(self.output_file, self.compression)
+        root, ext = os.path.splitext(self.output_file)
+        return with_suffix(f"{root}-{index:05d}{ext}", self.compression)
+
+    def _remove_partial_shards(self):
+        # 이전 실행이 쓰다 만 임시 파일
+        root, ext = os.path.splitext(self.output_file)
+        pattern = f"{glob.escape(root)}-*{ext}*.tmp" if self.sharded else glob.escape(self.shard_path(0)) + ".tmp"
+        for path in glob.glob(pattern):
+            os.remove(path)
+
+    def _remove_stale_outputs(self):
+        # 처음부터 다시 쓰는 경우, 이전 실행이 남긴 샤드와 매니페스트
+        # (샤드 설정이 달랐으면 이번 실행이 덮어쓰지 않는 샤드가 남아서 결과에 섞임)
+        directory = os.path.dirname(self.output_file)
+        manifest = self.output_file + ".manifest.json"
+        stale = set()
+        try:
+            with open(manifest, "rb") as f:
+                state = jsoncodec.loads(f.read())
+            stale.update(os.path.join(directory, shard["path"]) for shard in state.get("shards", []))
+        except (OSError, jsoncodec.JSONDecodeError, AttributeError, KeyError, TypeError):
+            pass
+        root, ext = os.path.splitext(self.output_file)
+        shard_name = re.compile(re.escape(os.path.basename(root)) + r"-\d{5,}" + re.escape(ext) + r"(\.gz|\.zst)?")
+        stale.update(path for path in glob.glob(f"{glob.escape(root)}-*{ext}*")
+                     if shard_name.fullmatch(os.path.basename(path)))
+        if self.checkpoint is None:
+            stale.add(manifest)  # 매니페스트 없이 쓰면 남은 매니페스트가 새 출력과 맞지 않음
+        for path in stale:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+
+    def _open_shard(self):
+        self._path = self.shard_path(len(self.shards))
+        self._file = open_binary(self._path + ".tmp", "wb", self.compression)
+        self._writer = self.writer_factory(self._file)
+
+    def write(self, item):
+        if self._writer is None:
+            self._open_shard()
+        self._writer.write(item)
+
+    def end_record(self, offset, records=1):
+        """
+        입력 레코드 하나를 다 처리했음을 알림. 현재 샤드가 가득 찼으면 완성하고 체크포인트 저장
+
+        Args:
+            offset (int): 이 레코드까지 읽은 입력 위치 (압축이 풀린 기준 바이트, 없으면 0)
+            records (int): 이 레코드까지 읽은 입력 레코드 수
+        """
+        writer = self._writer
+        if writer is None or not self.sharded:
+            return
+        if ((self.max_samples and writer.count + len(writer.buffer) >= self.max_samples)
+                or (self.max_bytes and writer.bytes >= self.max_bytes)):
+            self._finish_shard(offset, records)
+
+    def _finish_shard(self, offset, records):
+        self._writer.flush()
+        self._file.close()
+        os.replace(self._path + ".tmp", self._path)
+        self.shards.append({"path": os.path.basename(self._path), "samples": self._writer.count,
+                            "bytes": self._writer.bytes})
+        self.count += self._writer.count
+        self._file = self._writer = None
+        if self.checkpoint is not None:
+            self.checkpoint.offset = offset
+            self.checkpoint.records = records
+            self.checkpoint.samples = self.count
+            self.checkpoint.shards = list(self.shards)
+            self.checkpoint.save()
+
+    def close(self, offset=0, records=0):
+        """마지막 샤드를 완성하고 체크포인트에 완료 표시"""
+        if self._writer is None and not self.shards:
+            self._open_shard()  # 샘플이 하나도 없어도 빈 출력 파일은 만듦
+        if self._writer is not None:
+            self._finish_shard(offset, records)
+        if self.checkpoint is not None:
+            self.checkpoint.done = True
+            self.checkpoint.offset = offset
+            self.checkpoint.records = records
+            self.checkpoint.save()
+
+    def abort(self):
+        """
+        오류로 끝날 때 쓰던 파일을 닫고 임시 파일을 지움
+
+        완성된 샤드와 매니페스트는 남겨서 resume으로 이어서 할 수 있다. 쓰다 만 샤드는
+        이어서 할 때도 다시 쓰므로 남길 필요가 없다 (강제 종료로 남은 것은 다음 실행에서 정리).
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = self._writer = None
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self._path + ".tmp")
+
+    def paths(self):
+        directory = os.path.dirname(self.output_file)
+        return [os.path.join(directory, shard["path"]) for shard in self.shards]
@@ -0,0 +1,244 @@
+import bisect
+import contextlib
+import functools
+import os
+from collections import OrderedDict
+
+import token_budget
+
+
+# OpenAI chat 형식의 토큰 계산 방식: 메시지마다 3토큰, 응답 시작에 3토큰
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_SAMPLE = 3
+
+# 파인튜닝 학습 비용 기본값 (gpt-4o-mini 기준 100만 토큰당 달러, 에폭 수)
+DEFAULT_PRICE_PER_MILLION = 3.0
+DEFAULT_EPOCHS = 3
+
+
+class TokenStats:
+    """변환된 샘플의 토큰 길이 통계 (2의 거듭제곱 구간 히스토그램, 총 토큰, 예상 비용)"""
+
+    def __init__(self):
+        self.input_samples = 0
+        self.samples = 0
+        self.tokens = 0
+        self.min_tokens = None
+        self.max_tokens = 0
+        self.dropped = 0       # 최대 길이를 넘어 버린 샘플 수
+        self.split = 0         # 최대 길이를 넘어 여러 개로 나눈 샘플 수
+        self.histogram = {}    # 구간 상한 -> 샘플 수
+
+    def add(self, tokens):
+        self.samples += 1
+        self.tokens += tokens
+        self.max_tokens = max(self.max_tokens, tokens)
+        self.min_tokens = tokens if self.min_tokens is None else min(self.min_tokens, tokens)
+        upper = 1 << max(0, tokens - 1).bit_length()
+        self.histogram[upper] = self.histogram.get(upper, 0) + 1
+
+    def estimated_cost(self, epochs=DEFAULT_EPOCHS, price_per_million=DEFAULT_PRICE_PER_MILLION):
+        """학습 비용 추정 (달러) = 총 토큰 x 에폭 x 100만 토큰당 가격"""
+        return self.tokens * epochs / 1_000_000 * price_per_million
+
+    def report(self, epochs=DEFAULT_EPOCHS, price_per_million=DEFAULT_PRICE_PER_MILLION):
+        return {
+            "input_samples": self.input_samples,
+            "samples": self.samples,
+            "dropped": self.dropped,
+            "split": self.split,
+            "tokens": self.tokens,
+            "min_tokens": self.min_tokens or 0,
+            "max_tokens": self.max_tokens,
+            "mean_tokens": self.tokens / self.samples if self.samples else 0.0,
+            "histogram": dict(sorted(self.histogram.items())),
+            "epochs": epochs,
+            "estimated_cost": self.estimated_cost(epochs, price_per_million),
+        }
+
+    def print_report(self, epochs=DEFAULT_EPOCHS, price_per_million=DEFAULT_PRICE_PER_MILLION):
+        report = self.report(epochs, price_per_million)
+        print(f"샘플: 입력 {report['input_samples']:,}개 -> 출력 {report['samples']:,}개"
+              f" (버림 {report['dropped']:,}, 나눔 {report['split']:,})")
+        print(f"토큰: 총 {report['tokens']:,}, 평균 {report['mean_tokens']:,.1f},"
+              f" 최소 {report['min_tokens']:,}, 최대 {report['max_tokens']:,}")
+        largest = max(report["histogram"].values(), default=0)
+        lower = 0
+        for upper, count in report["histogram"].items():
+            bar = "#" * max(1, round(40 * count / largest))
+            print(f"  {lower + 1:>6}~{upper:<6} {count:>9,} {bar}")
+            lower = upper
+        print(f"예상 학습 비용: ${report['estimated_cost']:,.2f}"
+              f" ({epochs}에폭, 100만 토큰당 ${price_per_million})")
+
+
+class SamplePacker:
+    """
+    파인튜닝 샘플의 토큰 길이를 재서 최대 길이에 맞추고, 짧은 대화는 하나로 묶음
+
+    chat 형식(openai, multi_turn)에서
+    - 최대 길이를 넘는 샘플은 overflow="split"이면 user/assistant 턴 경계에서 나누고, "drop"이면 버린다.
+    - pack=True면 system 문맥이 같은 샘플들의 턴을 max_tokens까지 이어 붙여 한 샘플로 만든다.
+      (같은 페르소나 문맥을 샘플마다 반복하지 않음)
+    alpaca/conversation 형식은 나누거나 묶을 수 없어서 길이를 넘으면 버리기만 한다.
+
+        packer = SamplePacker(max_tokens=4096)
+        for sample in samples:
+            for packed, tokens in packer.add(sample):
+                ...
+        for packed, tokens in packer.flush():
+            ...
+
+    Args:
+        max_tokens (int): 샘플 하나의 최대 토큰 수
+        pack (bool): 짧은 샘플을 묶을지
+        overflow (str): 최대 길이를 넘는 샘플 처리 ("drop" 또는 "split")
+        tokenizer (token_budget.Tokenizer): 기본값은 token_budget.get_tokenizer()
+        max_open (int): 동시에 채우고 있는 묶음 수 상한 (넘으면 가장 오래된 묶음부터 내보냄)
+    """
+
+    def __init__(self, max_tokens=4096, pack=True, overflow="drop", tokenizer=None, max_open=1000):
+        if overflow not in ("drop", "split"):
+            raise ValueError(f"overflow는 'drop' 또는 'split'이어야 합니다: {overflow}")
+        self.max_tokens = max_tokens
+        self.pack = pack
+        self.overflow = overflow
+        self.max_open = max_open
+        self.stats = TokenStats()
+        # 페르소나 문맥처럼 같은 문자열이 계속 반복되므로 토큰 수를 캐시
+        self.count = functools.lru_cache(maxsize=65536)((tokenizer or token_budget.get_tokenizer()).count)
+        self._open = OrderedDict()  # system 문맥 -> [system 메시지, 턴 목록, 토큰 수]
+
+    def sample_tokens(self, sample):
+        """샘플 하나의 토큰 수"""
+        if "messages" in sample:
+            return TOKENS_PER_SAMPLE + sum(
+                TOKENS_PER_MESSAGE + self.count(m["content"]) for m in sample["messages"]
+            )
+        return sum(self.count(value) for value in sample.values() if isinstance(value, str))
+
+    def add(self, sample):
+        """
+        Returns:
+            list: 이번 샘플로 완성된 (샘플, 토큰 수) 목록
+        """
+        self.stats.input_samples += 1
+        if "messages" not in sample:
+            tokens = self.sample_tokens(sample)
+            if tokens > self.max_tokens:
+                self.stats.dropped += 1
+                return []
+            self.stats.add(tokens)
+            return [(sample, tokens)]
+
+        messages = sample["messages"]
+        system = messages[0] if messages and messages[0]["role"] == "system" else None
+        turns = messages[1:] if system else messages
+        base = TOKENS_PER_SAMPLE + (TOKENS_PER_MESSAGE + self.count(system["content"]) if system else 0)
+        turn_tokens = [TOKENS_PER_MESSAGE + self.count(m["content"]) for m in turns]
+
+        if base + sum(turn_tokens) <= self.max_tokens:
+            chunks = [(turns, sum(turn_tokens))]
+        elif self.overflow == "split":
+            chunks = self._split(turns, turn_tokens, self.max_tokens - base)
+            self.stats.split += len(chunks) > 0
+        else:
+            chunks = []
+        if not chunks:
+            self.stats.dropped += 1
+            return []
+
+        done = []
+        for chunk, tokens in chunks:
+            if not self.pack:
+                done.append(self._emit(system, chunk, base + tokens))
+                continue
+            key = system["content"] if system else None
+            current = self._open.pop(key, None)
+            if current is not None and current[2] + tokens > self.max_tokens:
+                done.append(self._emit(*current))
+                current = None
+            if current is None:
+                current = [system, [], base]
+            current[1].extend(chunk)
+            current[2] += tokens
+            self._open[key] = current  # 다시 넣어서 가장 최근에 쓴 묶음으로
+            if len(self._open) > self.max_open:
+                done.append(self._emit(*self._open.popitem(last=False)[1]))
+        return done
+
+    def _split(self, turns, turn_tokens, limit):
+        """user/assistant 쌍 단위로 limit 토큰 이하 조각으로 나눔 (한 쌍이 limit보다 길면 그 쌍은 버림)"""
+        chunks = []
+        current, current_tokens = [], 0
+        for i in range(0, len(turns), 2):
+            pair, pair_tokens = turns[i:i + 2], sum(turn_tokens[i:i + 2])
+            if pair_tokens > limit:
+                continue
+            if current and current_tokens + pair_tokens > limit:
+                chunks.append((current, current_tokens))
+                current, current_tokens = [], 0
+            current.extend(pair)
+            current_tokens += pair_tokens
+        if current:
+            chunks.append((current, current_tokens))
+        return chunks
+
+    def _emit(self, system, turns, tokens):
+        self.stats.add(tokens)
+        return {"messages": ([system] if system else []) + list(turns)}, tokens
+
+    def flush(self):
+        """채우고 있던 묶음을 모두 내보냄"""
+        done = [self._emit(*current) for current in self._open.values()]
+        self._open.clear()
+        return done
+
+
+def bucket_path(output_file, upper):
+    """출력 경로에 길이 구간을 붙인 샤드 경로, 예) finetune_openai.le1024.jsonl"""
+    root, ext = os.path.splitext(output_file)
+    return f"{root}.le{upper}{ext}" if upper is not None else f"{root}.gt{ext}"
+
+
+class BucketedWriter:
+    """
+    샘플을 토큰 길이 구간별 샤드 파일에 나눠 기록 (필요한 샤드만 만듦)
+
+    비슷한 길이끼리 모아 두면 학습할 때 배치 안 패딩이 줄어든다.
+
+    Args:
+        output_file (str): 기준 출력 경로
+        buckets (list): 구간 상한 목록, 예) [512, 1024, 2048, 4096]
+        writer_factory: 열린 파일로 JsonlWriter 같은 출력기를 만드는 함수
+    """
+
+    def __init__(self, output_file, buckets, writer_factory):
+        self.output_file = output_file
+        self.buckets = sorted(buckets)
+        self.writer_factory = writer_factory
+        self.writers = {}
+        self._stack = contextlib.ExitStack()
+
+    def write(self, sample, tokens):
+        i = bisect.bisect_left(self.buckets, tokens)
+        path = bucket_path(self.output_file, self.buckets[i] if i < len(self.buckets) else None)
+        writer = self.writers.get(path)
+        if writer is None:
+            writer = self.writers[path] = self.writer_factory(self._stack.enter_context(open(path, 'wb')))
+        writer.write(sample)
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.flush()
+        self._stack.close()
+
+    def counts(self):
+        """{샤드 경로: 샘플 수}"""
+        return {path: writer.count for path, writer in sorted(self.writers.items())}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,210 @@
+import bisect
+import hashlib
+import re
+import zlib
+from array import array
+from collections import deque
+
+import token_budget
+
+
+_SPACE = re.compile(r"\s+")
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def sample_text(sample):
+    """
+    중복 비교에 쓸 샘플 본문 (사용자/상담사 발화만)
+
+    페르소나 문맥(system, instruction, context)은 같은 감정/상황이면 똑같이 반복되므로 뺀다.
+    """
+    if "messages" in sample:
+        return "\n".join(m["content"] for m in sample["messages"] if m["role"] != "system")
+    return "\n".join(
+        value for key, value in sample.items()
+        if key not in ("instruction", "context") and isinstance(value, str)
+    )
+
+
+def char_ngrams(text, n=3):
+    """
+    공백/문장부호를 지운 글자 n-gram 집합
+
+    한국어는 띄어쓰기가 들쭉날쭉하고 음절 하나에 뜻이 많이 담겨서 단어보다 음절 n-gram이 잘 맞는다.
+    """
+    text = _NON_WORD.sub("", text.lower())
+    if len(text) <= n:
+        return {text} if text else set()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class MinHasher:
+    """
+    글자 n-gram 집합의 MinHash 서명 (one permutation hashing)
+
+    순열마다 모든 n-gram을 다시 해시하지 않고, n-gram마다 해시를 한 번만 계산해서
+    상위 비트로 num_perm개 구간에 나누고 구간마다 최솟값을 서명으로 쓴다.
+    비어 있는 구간은 다음 구간 값으로 채운다 (짧은 문장용).
+
+    Args:
+        num_perm (int): 서명 길이 (2의 거듭제곱)
+        ngram (int): n-gram 글자 수
+    """
+
+    GOLDEN = 0x9E3779B1  # crc32 값을 골고루 섞는 곱셈 해시 상수
+
+    def __init__(self, num_perm=64, ngram=3):
+        if num_perm & (num_perm - 1):
+            raise ValueError(f"num_perm은 2의 거듭제곱이어야 합니다: {num_perm}")
+        self.num_perm = num_perm
+        self.shift = 32 - (num_perm.bit_length() - 1)
+        self.ngram = ngram
+
+    def signature(self, text):
+        hashes = sorted(
+            {(zlib.crc32(gram.encode("utf-8")) * self.GOLDEN) & 0xFFFFFFFF
+             for gram in char_ngrams(text, self.ngram)},
+            reverse=True,
+        )
+        if not hashes:
+            return None
+        # 큰 값부터 넣으므로 구간마다 가장 작은 해시가 남음
+        shift = self.shift
+        bins = {h >> shift: h for h in hashes}
+        if len(bins) < self.num_perm:
+            filled = sorted(bins)
+            for i in range(self.num_perm):
+                if i not in bins:
+                    j = bisect.bisect_left(filled, i)
+                    bins[i] = bins[filled[j % len(filled)]]
+        return array("I", [bins[i] for i in range(self.num_perm)])
+
+
+def estimated_jaccard(a, b):
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+class Deduplicator:
+    """
+    파인튜닝 샘플의 완전 중복과 거의 같은 샘플을 걸러내는 스트리밍 필터
+
+    - 완전 중복: 공백을 정리한 본문의 8바이트 해시 집합
+    - 거의 중복: 글자 n-gram MinHash + LSH(bands x rows)로 후보를 찾고,
+      서명으로 추정한 자카드 유사도가 threshold 이상이면 중복으로 본다.
+    처음 나온 샘플을 남기고 뒤에 나온 것을 버린다. 기억하는 샘플 수는 max_entries로
+    제한하고, 넘으면 가장 오래된 것부터 잊는다 (입력 크기와 상관없이 메모리가 일정).
+    기억한 샘플 하나에 near=True면 약 2KB(서명 + 밴드마다 색인 항목 하나), 완전 중복만이면
+    약 0.1KB를 쓰므로 기본값 100,000개면 약 200MB다. 메모리가 부족하면 max_entries를 줄인다
+    (그만큼 멀리 떨어진 중복은 못 잡음).
+
+        dedup = Deduplicator()
+        samples = dedup.filter(samples)
+        ...
+        dedup.print_report()
+
+    Args:
+        near (bool): 거의 같은 샘플도 거를지 (False면 완전 중복만)
+        threshold (float): 거의 중복으로 볼 자카드 유사도
+        ngram (int): 글자 n-gram 크기
+        num_perm (int): MinHash 서명 길이 (bands로 나누어떨어져야 함)
+        bands (int): LSH 밴드 수 (많을수록 낮은 유사도도 후보로 잡힘)
+        max_entries (int): 기억할 최대 샘플 수 (메모리 상한)
+        tokenizer (token_budget.Tokenizer): 제거한 토큰 수 계산용
+    """
+
+    def __init__(self, near=True, threshold=0.8, ngram=3, num_perm=64, bands=16,
+                 max_entries=100_000, tokenizer=None):
+        if num_perm % bands:
+            raise ValueError(f"num_perm({num_perm})은 bands({bands})로 나누어떨어져야 합니다")
+        self.near = near
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_entries = max_entries
+        self.hasher = MinHasher(num_perm, ngram)
+        self.tokenizer = tokenizer or token_budget.get_tokenizer()
+        self.seen = 0
+        self.exact_removed = 0
+        self.near_removed = 0
+        self.tokens_removed = 0
+        self._exact = set()             # 본문 해시(8바이트 정수)
+        self._exact_order = deque()     # 본문 해시 (오래된 순, 넘치면 앞에서부터 잊음)
+        self._signatures = {}           # 샘플 번호 -> MinHash 서명 (uint32를 이어 붙인 bytes)
+        self._order = deque()           # 샘플 번호 (오래된 순)
+        self._buckets = [{} for _ in range(bands)]  # 밴드마다 밴드 키(정수) -> 샘플 번호
+
+    def is_duplicate(self, sample):
+        """샘플이 앞에서 본 샘플과 중복이면 True. 아니면 기억하고 False"""
+        self.seen += 1
+        text = sample_text(sample)
+        digest = int.from_bytes(
+            hashlib.blake2b(_SPACE.sub(" ", text.strip()).encode("utf-8"), digest_size=8).digest())
+        if digest in self._exact:
+            self.exact_removed += 1
+            self.tokens_removed += self.tokenizer.count(text)
+            return True
+        self._exact.add(digest)
+        self._exact_order.append(digest)
+        if len(self._exact_order) > self.max_entries:
+            self._exact.discard(self._exact_order.popleft())
+
+        if self.near:
+            signature = self.hasher.signature(text)
+            if signature is not None and self._near_duplicate(signature):
+                self.near_removed += 1
+                self.tokens_removed += self.tokenizer.count(text)
+                return True
+        return False
+
+    def _band_keys(self, packed):
+        # 밴드마다 따로 색인하므로 밴드 번호는 키에 넣지 않음
+        step = self.rows * 4
+        return [hash(packed[i:i + step]) for i in range(0, len(packed), step)]
+
+    def _near_duplicate(self, signature):
+        packed = signature.tobytes()
+        keys = self._band_keys(packed)
+        checked = set()
+        for buckets, key in zip(self._buckets, keys):
+            other = buckets.get(key)
+            if other is None or other in checked:
+                continue
+            checked.add(other)
+            if estimated_jaccard(signature, memoryview(self._signatures[other]).cast("I")) >= self.threshold:
+                return True
+
+        sample_id = self.seen
+        self._signatures[sample_id] = packed
+        self._order.append(sample_id)
+        for buckets, key in zip(self._buckets, keys):
+            buckets.setdefault(key, sample_id)
+        if len(self._order) > self.max_entries:
+            # 밴드 키는 샘플마다 들고 있지 않고 잊을 때 서명에서 다시 계산
+            old_id = self._order.popleft()
+            for buckets, key in zip(self._buckets, self._band_keys(self._signatures.pop(old_id))):
+                if buckets.get(key) == old_id:
+                    del buckets[key]
+        return False
+
+    def filter(self, samples):
+        """중복이 아닌 샘플만 반환 (제너레이터)"""
+        for sample in samples:
+            if not self.is_duplicate(sample):
+                yield sample
+
+    def report(self):
+        removed = self.exact_removed + self.near_removed
+        return {
+            "seen": self.seen,
+            "kept": self.seen - removed,
+            "exact_removed": self.exact_removed,
+            "near_removed": self.near_removed,
+            "tokens_removed": self.tokens_removed,
+        }
+
+    def print_report(self):
+        report = self.report()
+        removed = report["exact_removed"] + report["near_removed"]
+        print(f"중복 제거: {report['seen']:,}개 중 {removed:,}개 제거"
+              f" (완전 중복 {report['exact_removed']:,}, 거의 중복 {report['near_removed']:,}),"
+              f" 제거한 토큰 {report['tokens_removed']:,}")
@@ -0,0 +1,75 @@
+import os
+
+import kakao_parser
+import structured_output
+import token_budget
+
+# OpenAI 클라이언트 없이 대화 추출과 요청 본문만 만드는 부분
+# (API 서버와, API 키 없이 Batch API 입력 파일만 만드는 batch_diary가 같이 씀)
+
+# ✅ 감성일기 필드
+DIARY_FIELDS = structured_output.DIARY_FIELDS
+
+# ✅ 단계별 structured output 스키마 (strict 모드라 모델이 필드 누락/추가 없이 응답)
+SUMMARY_SCHEMA = structured_output.json_schema_format(structured_output.SummaryResult, "summary")
+DIARY_SCHEMA = structured_output.json_schema_format(structured_output.DiaryResult, "diary")
+# 한 번의 호출로 요약과 일기를 같이 받기 위한 스키마
+SUMMARY_DIARY_SCHEMA = structured_output.json_schema_format(structured_output.SummaryDiaryResult, "summary_diary")
+
+
+# ✅ 프롬프트에 넣을 대화는 메시지 개수가 아니라 토큰 예산으로 자름
+#    (최근 메시지부터 CONTEXT_TOKEN_BUDGET까지, 중복/거의 같은 메시지는 하나로.
+#     CONTEXT_COMPRESS=1이면 'ㅋㅋ' 같은 메시지를 빼고 아주 긴 메시지는 앞부분만)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "800"))
+CONTEXT_COMPRESS = os.getenv("CONTEXT_COMPRESS", "0") == "1"
+CONTEXT_MAX_MESSAGES = int(os.getenv("CONTEXT_MAX_MESSAGES", "500"))  # 예산을 채울 후보 메시지 수
+
+
+def pack_context(texts: list[str]) -> token_budget.PackedContext:
+    return token_budget.pack_messages(texts, CONTEXT_TOKEN_BUDGET, compress=CONTEXT_COMPRESS)
+
+
+# ✅ 내보내기 형식(PC/모바일/안드로이드/iOS)은 kakao_parser가 자동 감지
+def extract_today_chat(text: str, date_str: str = "") -> str:
+    """대화 원문에서 토큰 예산만큼 최근 메시지 추출 (date_str을 주면 그 날짜 구간만)"""
+    texts = kakao_parser.recent_texts(text.splitlines(), date_str or None, CONTEXT_MAX_MESSAGES)
+    return pack_context(texts).text
+
+
+def extract_file_chat(path, date_str: str = "") -> str:
+    """
+    대화 파일을 통째로 디코딩하지 않고 끝에서부터 토큰 예산만큼 최근 메시지 추출
+
+    큰 파일은 mmap으로 열어 필요한 끝부분만 읽는다 (이벤트 루프에서는 asyncio.to_thread로 호출).
+    """
+    with open(path, "rb") as f, kakao_parser.open_buffer(f) as buf:
+        texts, _ = kakao_parser.extract_recent_messages(buf, date_str or None, CONTEXT_MAX_MESSAGES)
+    return pack_context(texts).text
+
+
+# ✅ 요약 + 감성일기 한 번 호출용 요청 (일반/스트리밍 호출, Batch API 입력이 같은 캐시 키를 쓰도록 공유)
+def summary_diary_request(kakao_text: str, search_log: str | None) -> dict:
+    prompt = f"""
+    ### 입력 정보
+    - 검색기록: {search_log}
+    - 카카오톡 대화:
+    ---
+    {kakao_text}
+    ---
+
+    ### 지시사항
+    1) summary: 감정 표현 없이 무슨 일이 있었는지 2~3문장으로 요약하세요.
+    2) 사용자 대화에는 감정이 숨겨져 있을 수 있으므로, 상황의 흐름과 말투에서 감정을 섬세하게 추론하세요.
+    3) 상황설명, 감정표현, 공감과인정, 따뜻한위로, 실용적제안은 요약을 바탕으로
+       따뜻하고 진심 어린 한국어로 각각 2~3문장 이상 작성하세요.
+    4) 외국어, 욕설이 있어도 무시하지 말고 감정을 정확히 해석하세요.
+    """
+
+    return dict(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": "당신은 감성적인 작가이자 상담가입니다. 주어진 정보로 대화 요약과 감정 분석, 위로의 말을 작성해주세요."},
+            {"role": "user", "content": prompt}
+        ],
+        response_format=SUMMARY_DIARY_SCHEMA,
+    )
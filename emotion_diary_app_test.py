@@ -1,14 +1,65 @@
 import os
 import streamlit as st
 import datetime
-import re
 import platform
 from openai import OpenAI
-import json
+import chat_index
+import diary_requests
+import kakao_parser
+import llm_cache
+import structured_output
+import token_budget
 
 # 🔑 OpenAI API 설정
 # os.environ["OPENAI_API_KEY"] = "in_your_API"   여기에 실제 키 입력 # 커밋할때 오류뜨니 바꿈
 client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
+
+# 🗄️ 응답 캐시: 위젯을 바꿀 때마다 스크립트가 다시 실행돼도 같은 요청은 API를 다시 부르지 않음
+#    (LLM_CACHE_PATH를 주면 FastAPI 서버와 같은 디스크 캐시를 공유)
+@st.cache_resource
+def get_response_cache():
+    return llm_cache.ResponseCache.from_env()
+
+response_cache = get_response_cache()
+
+# 🗂️ 대화 색인: KAKAO_EXTRACT_MODE=index이고 CHAT_INDEX_PATH(디스크 파일)가 있을 때만 사용
+#    (같은 파일은 재실행마다 다시 파싱하지 않음, FastAPI 서버와 같은 색인을 공유).
+#    새 파일은 전체를 파싱해야 하므로 기본은 파일 끝에서 오늘 구간만 읽는 방식
+@st.cache_resource
+def get_chat_index():
+    if os.getenv("KAKAO_EXTRACT_MODE") == "index" and chat_index.is_disk_path(os.getenv("CHAT_INDEX_PATH")):
+        return chat_index.ChatIndex.from_env()
+    return None
+
+message_index = get_chat_index()
+
+DIARY_SECTIONS = [("상황설명","📝 상황 설명"),("감정표현","💭 감정 표현"),
+                  ("공감과인정","🤝 공감과 인정"),("따뜻한위로","🌷 따뜻한 위로"),
+                  ("실용적제안","💡 실용적 제안")]
+
+def stream_fields(parser, **kwargs):
+    """stream=True로 호출해서 JSON 필드가 완성될 때마다 (키, 값)을 반환. 전체 원문은 parser.buf"""
+    key = llm_cache.cache_key(**kwargs)
+    content = response_cache.get(key)
+    if content is not None:
+        yield from parser.feed(content)
+        return
+    for chunk in client.chat.completions.create(**kwargs, stream=True):
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            yield from parser.feed(delta)
+    if llm_cache.is_json(parser.buf):
+        response_cache.set(key, parser.buf)
+
+def chat_completion(**kwargs) -> str:
+    key = llm_cache.cache_key(**kwargs)
+    content = response_cache.get(key)
+    if content is None:
+        content = client.chat.completions.create(**kwargs).choices[0].message.content
+        if llm_cache.is_json(content):   # 깨진 응답은 캐시하지 않음
+            response_cache.set(key, content)
+    return content
+
 # ------------- 1) 기본 설정 -------------
 st.set_page_config(page_title="감성 일기 생성기", page_icon="📝")
 st.title("🧠 하루 감정 분석 & 감성 일기 생성")
@@ -16,49 +67,37 @@ st.title("🧠 하루 감정 분석 & 감성 일기 생성")
 # ------------- 2) 파일 업로드 -------------
 uploaded = st.file_uploader("📁 카카오톡 대화 파일 (.txt)", type="txt")
 
-raw_text = ""
 if uploaded:
-    raw_text = uploaded.read().decode("utf-8", errors="ignore")
     st.success("✅ 파일 업로드 완료")
-    if st.checkbox("전체 파일 미리 보기"):
-        st.text_area("📜 원본 데이터", raw_text, height=250)
+    if st.checkbox("전체 파일 미리 보기"):   # 전체 디코딩은 미리 보기를 켰을 때만
+        st.text_area("📜 원본 데이터", uploaded.getvalue().decode("utf-8", errors="ignore"), height=250)
 
 # ------------- 3) 오늘 날짜 계산 -------------
 today = datetime.datetime.now()
 today_str = f"{today.year}년 {today.month}월 {today.day}일"   # 예: 2025년 6월 12일
 
 # ------------- 4) 카톡 → 오늘 대화만 추출 -------------
-def extract_today(text: str, date_str: str) -> str:
-    lines = text.splitlines()
-    chat = []
-    collect = False
-
-    # 헤더: '---- 2025년 6월 7일 토요일 ----'  또는  '2025년 6월 7일 토요일'
-    date_hdr = re.compile(rf"^[-\s]*{re.escape(date_str)}.*$")
-
-    # 메시지: ① [이름] 오후 1:23 내용   ② 오후 1:23 [이름] 내용
-    msg1 = re.compile(r"^\[(.*?)\]\s*(오전|오후)\s*\d{1,2}:\d{2}\s*(.*)")
-    msg2 = re.compile(r"^(오전|오후)\s*\d{1,2}:\d{2}\s*\[(.*?)\]\s*(.*)")
-
-    for ln in lines:
-        ln = ln.strip()
-        if date_hdr.match(ln):
-            collect = True
-            continue
-        if collect:
-            if date_hdr.match(ln):      # 다음 날짜 만나면 종료
-                break
-            # 실 메시지 추출
-            m = msg1.match(ln) or msg2.match(ln)
-            if m:
-                msg_txt = m.group(3).strip()
-                # 불필요 라인 제거
-                if not any(k in msg_txt for k in ("[사진]", "이모티콘", "님이 입장", "님이 나갔")):
-                    chat.append(msg_txt)
-    return "\n".join(chat[-30:])   # 최근 30줄만
+# 메시지 형식(① [이름] 오후 1:23 내용  ② 오후 1:23 [이름] 내용, PC/안드로이드/iOS 내보내기)은 자동 감지
+# 프롬프트에 넣을 대화는 최근 메시지부터 토큰 예산만큼 (FastAPI 서버와 같은 설정:
+# CONTEXT_TOKEN_BUDGET, CONTEXT_COMPRESS, CONTEXT_MAX_MESSAGES)
+
+def extract_today(f, date_str: str) -> token_budget.PackedContext:
+    # 오늘 대화는 파일 끝에 있으므로 끝에서부터 오늘 날짜 구분선을 찾아 그 구간만 파싱
+    # (색인을 쓰면 처음 올린 파일만 전체를 파싱하고, 재실행이나 다른 날짜 조회는 색인에서 바로 꺼냄)
+    with kakao_parser.open_buffer(f) as buf:
+        if message_index is None:
+            texts, _ = kakao_parser.extract_recent_messages(buf, date_str, diary_requests.CONTEXT_MAX_MESSAGES)
+        else:
+            texts = message_index.recent_texts(message_index.add(buf), date_str, diary_requests.CONTEXT_MAX_MESSAGES)
+    return diary_requests.pack_context(texts)
 
 # -------- 자동 요약 생성 (chat_log 기반) --------
-chat_log = extract_today(raw_text, today_str) if uploaded else ""
+chat_log = ""
+if uploaded:
+    context = extract_today(uploaded, today_str)
+    chat_log = context.text
+    st.caption(f"💬 오늘 대화 {context.messages}개 · {context.tokens}/{context.budget} 토큰"
+               f" (중복 {context.duplicates + context.near_duplicates}개 제외)")
 auto_summary = ""
 if chat_log:
     try:
@@ -78,11 +117,13 @@ if chat_log:
               "summary": "..."
             }}
             """
-            resp_sum = client.chat.completions.create(
+            resp_sum = chat_completion(
                 model="ft:gpt-4o-mini-2024-07-18:juyoung:emotioncheck:BfrP3T8T",  # 또는 gpt-4o
-                messages=[{"role": "user", "content": summary_prompt}]
+                messages=[{"role": "user", "content": summary_prompt}],
+                response_format=structured_output.json_schema_format(structured_output.SummaryResult, "summary"),
             )
-            auto_summary = json.loads(resp_sum.choices[0].message.content)["summary"]
+            # 코드블록/설명 문장이 붙은 응답도 다시 호출하지 않고 고쳐서 사용
+            auto_summary = structured_output.parse_model(resp_sum, structured_output.SummaryResult).summary
             st.text_area("📝 자동 생성된 하루 요약", auto_summary, height=80)
     except Exception as e:
         st.warning("하루 요약 생성 실패. 수동으로 입력해주세요.")
@@ -126,30 +167,42 @@ if st.button("✨ 감성 일기 생성"):
     사용자가 주지 않은 사실은 절대 넣지 마세요.
     """
 
+    # ------------- 7) 결과 표시 (필드가 완성되는 대로 바로 표시) -------------
+    status = st.empty()
+    slots = {key: st.empty() for key, _ in DIARY_SECTIONS}
+    labels = dict(DIARY_SECTIONS)
+    parser = structured_output.IncrementalFieldParser()
+    result = {}
+
     with st.spinner("AI가 글을 작성 중입니다..."):
         try:
-            resp = client.chat.completions.create(
+            for key, value in stream_fields(
+                parser,
                 model="gpt-4o-mini",
                 messages=[{"role":"system","content":"당신은 사용자의 일상 대화를 바탕으로, 그 안에 숨어 있는 감정과 스트레스를 추론하여 따뜻하게 공감해주는 작가이자 상담가입니다. \
                             욕설, 무기력한 말투, 조급한 표현 속에서 진짜 감정을 파악하고, 그것에 맞춰 다정한 위로와 실질적인 제안을 주는 역할입니다. \
                             모든 출력은 반드시 JSON으로 주어야 하며, 사용자가 주지 않은 배경은 추측하지 마세요. \
                            ⛔ 절대 출력 앞뒤에 설명을 붙이지 마세요."},
-                          {"role":"user","content":prompt}]
-            )
-            result = json.loads(resp.choices[0].message.content)
-        except json.JSONDecodeError as e:
-            st.error("⚠️ JSON 파싱 실패. 프롬프트·출력 구조를 다시 확인하세요.")
-            st.code(resp.choices[0].message.content)
-            st.stop()
+                          {"role":"user","content":prompt}],
+                response_format=structured_output.json_schema_format(structured_output.DiaryResult, "diary"),
+            ):
+                result[key] = value
+                if key in slots:
+                    with slots[key].container():
+                        st.markdown(f"#### {labels[key]}")
+                        st.write(value)
         except Exception as e:
             st.error(f"⚠️ OpenAI 호출 오류: {e}")
             st.stop()
 
-    # ------------- 7) 결과 표시 -------------
-    st.success("✅ 완성")
-    for key,label in [("상황설명","📝 상황 설명"),("감정표현","💭 감정 표현"),
-                      ("공감과인정","🤝 공감과 인정"),("따뜻한위로","🌷 따뜻한 위로"),
-                      ("실용적제안","💡 실용적 제안")]:
-        if key in result:
-            st.markdown(f"#### {label}")
-            st.write(result[key])
\ No newline at end of file
+    if not result:
+        st.error("⚠️ JSON 파싱 실패. 프롬프트·출력 구조를 다시 확인하세요.")
+        st.code(parser.buf)
+        st.stop()
+    status.success("✅ 완성")
+
+stats = response_cache.stats()
+st.sidebar.caption(f"🗄️ 응답 캐시: 적중 {stats['hits']} / 미스 {stats['misses']}")
+if message_index is not None:
+    index_stats = message_index.stats()
+    st.sidebar.caption(f"🗂️ 대화 색인: 적중 {index_stats['hits']} / 미스 {index_stats['misses']}")
@@ -0,0 +1,106 @@
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+# 어떤 백엔드를 쓰든 파싱 오류는 이 예외(또는 하위 클래스)로 올라온다
+JSONDecodeError = json.JSONDecodeError
+
+
+def _stdlib_loads(s):
+    return json.loads(s)
+
+
+def _stdlib_dumps(obj):
+    # orjson과 같은 결과가 나오도록 공백 없는 구분자 사용, 한글은 그대로 유지
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _orjson_loads(s):
+    return orjson.loads(s)
+
+
+def _orjson_dumps(obj):
+    try:
+        return orjson.dumps(obj)
+    except TypeError:
+        # 64비트를 넘는 정수 등 orjson이 못 다루는 값은 표준 라이브러리로 처리
+        return _stdlib_dumps(obj)
+
+
+def _ujson_loads(s):
+    try:
+        return ujson.loads(s)
+    except ValueError as e:
+        if isinstance(s, bytes):
+            s = s.decode('utf-8', errors='replace')
+        raise JSONDecodeError(str(e), s, 0) from e
+
+
+def _ujson_dumps(obj):
+    return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False).encode('utf-8')
+
+
+_BACKENDS = {
+    "json": (_stdlib_loads, _stdlib_dumps),
+}
+if orjson is not None:
+    _BACKENDS["orjson"] = (_orjson_loads, _orjson_dumps)
+if ujson is not None:
+    _BACKENDS["ujson"] = (_ujson_loads, _ujson_dumps)
+
+BACKEND = None
+_loads = None
+_dumps = None
+
+
+def available_backends():
+    """설치되어 있는 JSON 백엔드 이름 목록 (빠른 순서)"""
+    return [name for name in ("orjson", "ujson", "json") if name in _BACKENDS]
+
+
+def use_backend(name=None):
+    """
+    사용할 JSON 백엔드 선택
+
+    Args:
+        name (str): "orjson", "ujson", "json" 중 하나. None이면 환경변수
+            JSON_BACKEND, 없으면 설치된 것 중 가장 빠른 백엔드
+    """
+    global BACKEND, _loads, _dumps
+    name = name or os.getenv("JSON_BACKEND") or available_backends()[0]
+    if name not in _BACKENDS:
+        raise ValueError(f"사용할 수 없는 JSON 백엔드입니다: {name}")
+    BACKEND = name
+    _loads, _dumps = _BACKENDS[name]
+
+
+def loads(s):
+    """str 또는 bytes를 파싱. 실패하면 JSONDecodeError"""
+    return _loads(s)
+
+
+def dumps_bytes(obj):
+    """UTF-8 bytes로 직렬화 (ensure_ascii=False와 같이 한글을 그대로 유지)"""
+    return _dumps(obj)
+
+
+def dumps(obj, indent=None):
+    """str로 직렬화. indent를 주면 보기 좋게 들여쓰기"""
+    if indent is not None:
+        if BACKEND == "orjson" and indent == 2:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode('utf-8')
+        return json.dumps(obj, ensure_ascii=False, indent=indent)
+    return _dumps(obj).decode('utf-8')
+
+
+use_backend()
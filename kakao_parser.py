@@ -0,0 +1,434 @@
+import codecs
+import contextlib
+import datetime
+import functools
+import io
+import mmap
+import os
+import re
+from collections import deque
+from dataclasses import dataclass
+
+
+CHUNK_SIZE = 64 * 1024
+MMAP_THRESHOLD = 1024 * 1024  # 이보다 큰 파일은 통째로 읽지 않고 mmap
+RECENT_LIMIT = 30  # 프롬프트에 넣을 최근 메시지 수
+
+# 사진/이모티콘/입퇴장 같은 시스템 메시지는 제외 (키워드를 정규식 하나로 묶어 한 번에 검사)
+NOISE_KEYWORDS = ("[사진]", "이모티콘", "님이 입장", "님이 나갔")
+NOISE = re.compile("|".join(map(re.escape, NOISE_KEYWORDS)))
+
+# 메시지 형식이 아닌 입퇴장/초대 알림 줄 (앞 메시지의 이어지는 줄로 붙지 않도록 메시지를 끊음)
+SYSTEM_LINE = re.compile(r"님이 (?:들어왔습니다|나갔습니다|입장했습니다|퇴장했습니다)|님을 (?:초대|내보냈)")
+
+# 날짜 구분선: '---- 2025년 6월 7일 토요일 ----'  또는  '2025년 6월 7일 토요일'
+# (안드로이드 메시지 줄도 날짜로 시작하므로 줄 전체가 날짜일 때만 구분선으로 봄)
+DATE_HEADER = re.compile(r"^[-\s]*(\d{4})년\s*(\d{1,2})월\s*(\d{1,2})일(?:\s*\S요일)?[-\s]*$")
+# 공백을 뗀 날짜 구분선 줄의 첫 글자 (대부분의 줄은 정규식을 돌리기 전에 걸러짐)
+_HEADER_START = frozenset("-0123456789")
+
+_TIME = r"(?P<clock>(?:오전|오후)\s*\d{1,2}:\d{2})"
+_INLINE_DATE_TIME = r"\s*" + _TIME + r",\s*(?P<speaker>[^:]+?)\s:\s(?P<text>.*)"
+
+# 내보내기 형식별 메시지 패턴 (모듈 로드 때 한 번만 컴파일)
+FORMATS = {
+    # [이름] [오후 3:36] 메시지
+    "pc": re.compile(r"^\[(?P<speaker>[^\]]*)\]\s*\[" + _TIME + r"\]\s*(?P<text>.*)"),
+    # [이름] 오후 1:23 메시지  /  오후 1:23 [이름] 메시지
+    # (시간 앞에 이름이 없을 때만 시간 뒤 [이름]을 읽도록 조건 그룹 사용)
+    "mobile": re.compile(
+        r"^(?:\[(?P<speaker>[^\]]*)\]\s*)?" + _TIME + r"\s*(?(speaker)|\[(?P<speaker2>[^\]]*)\]\s*)(?P<text>.*)"
+    ),
+    # 2025년 6월 7일 오후 3:36, 이름 : 메시지
+    "android": re.compile(r"^(?P<date>\d{4}년\s*\d{1,2}월\s*\d{1,2}일)" + _INLINE_DATE_TIME),
+    # 2025. 6. 7. 오후 3:36, 이름 : 메시지
+    "ios": re.compile(r"^(?P<date>\d{4}\.\s*\d{1,2}\.\s*\d{1,2}\.)" + _INLINE_DATE_TIME),
+}
+
+
+def parse_date(date_str):
+    """'2025년 6월 7일' 형식 문자열을 date로 변환 (형식이 다르면 None)"""
+    m = re.search(r"(\d{4})년\s*(\d{1,2})월\s*(\d{1,2})일", date_str)
+    return datetime.date(int(m[1]), int(m[2]), int(m[3])) if m else None
+
+
+@dataclass(slots=True)
+class ChatMessage:
+    """대화 메시지 하나 (여러 줄 메시지는 text 안에 줄바꿈으로 이어짐)"""
+    date: datetime.date | None  # 날짜 구분선이 나오기 전 메시지는 None
+    time: datetime.time
+    speaker: str
+    text: str
+
+    @property
+    def timestamp(self):
+        return datetime.datetime.combine(self.date, self.time) if self.date else None
+
+    @property
+    def is_noise(self):
+        return NOISE.search(self.text) is not None
+
+
+def detect_format(line):
+    """메시지 줄 하나로 내보내기 형식 이름을 반환 (메시지 줄이 아니면 None)"""
+    for name, pattern in FORMATS.items():
+        if pattern.match(line):
+            return name
+    return None
+
+
+def header_date(line):
+    """날짜 구분선 줄이면 그 날짜를, 아니면 None을 반환"""
+    m = DATE_HEADER.match(line)
+    return _day(*m.groups()) if m else None
+
+
+# 날짜/시각 객체는 같은 값이 계속 반복되므로 재사용
+# (메시지 줄에서는 "오후 3:36", "2025. 6. 7." 같은 원문 하나를 키로 써서 그룹을 덜 꺼냄)
+@functools.lru_cache(maxsize=None)
+def _clock(text):
+    ampm, hour, minute = re.match(r"(오전|오후)\s*(\d{1,2}):(\d{2})", text).groups()
+    return datetime.time(int(hour) % 12 + (12 if ampm == "오후" else 0), int(minute))
+
+
+@functools.lru_cache(maxsize=4096)
+def _inline_day(text):
+    return _day(*re.findall(r"\d+", text))
+
+
+@functools.lru_cache(maxsize=4096)
+def _day(year, month, day):
+    return datetime.date(int(year), int(month), int(day))
+
+
+_INLINE_DATE_FORMATS = {FORMATS["android"], FORMATS["ios"]}
+
+
+def _message(m, current_date, inline_date=None):
+    clock, speaker, text = m.group("clock", "speaker", "text")
+    if speaker is None:
+        speaker = m["speaker2"]
+    if inline_date is None:
+        inline_date = m.re in _INLINE_DATE_FORMATS
+    if inline_date:
+        current_date = _inline_day(m["date"])
+    return ChatMessage(current_date, _clock(clock), speaker.strip(), text)
+
+
+class ChatParser:
+    """
+    줄을 하나씩 받아 ChatMessage를 만드는 파서
+
+    형식을 주지 않으면 처음 나오는 메시지 줄로 형식을 정하고, 그 뒤로는 그 형식의 패턴 하나만
+    검사한다. 메시지 패턴에 맞지 않는 줄은 앞 메시지의 이어지는 줄로 붙이므로 메시지는 다음
+    메시지/날짜 구분선이 나와야 완성된다. 끝나면 flush()로 마지막 메시지를 꺼낸다.
+
+        parser = ChatParser()
+        for line in lines:
+            if (message := parser.feed(line)) is not None:
+                ...
+        if (message := parser.flush()) is not None:
+            ...
+
+    Args:
+        fmt (str): FORMATS의 형식 이름. None이면 자동 감지
+    """
+
+    def __init__(self, fmt=None):
+        self.format = None
+        self.pattern = None
+        self.inline_date = False  # 메시지 줄에 날짜가 들어 있는 형식 (안드로이드/iOS)
+        self.date = None      # 마지막으로 본 날짜
+        self.pending = None   # 아직 이어지는 줄이 붙을 수 있는 메시지
+        if fmt:
+            self._use_format(fmt)
+
+    def _use_format(self, fmt):
+        self.format, self.pattern = fmt, FORMATS[fmt]
+        self.inline_date = self.pattern in _INLINE_DATE_FORMATS
+
+    def feed(self, line):
+        """
+        Returns:
+            ChatMessage: 이 줄 때문에 완성된 이전 메시지 (없으면 None)
+        """
+        line = line.strip()
+        if not line:
+            return None
+        # 메시지 패턴과 날짜 구분선은 같은 줄에 같이 맞지 않으므로 대부분인 메시지 줄을 먼저 봄
+        if self.pattern is None and (fmt := detect_format(line)) is not None:
+            self._use_format(fmt)
+        if self.pattern is not None and (m := self.pattern.match(line)) is not None:
+            done = self.pending
+            self.pending = _message(m, self.date, self.inline_date)
+            if self.inline_date:
+                self.date = self.pending.date
+            return done
+
+        if line[0] in _HEADER_START and (m := DATE_HEADER.match(line)):
+            self.date = _day(*m.groups())
+            return self.flush()
+        return self._continue(line)
+
+    def _continue(self, line):
+        if SYSTEM_LINE.search(line):
+            return self.flush()
+        if self.pending is not None:
+            self.pending.text += "\n" + line
+        return None
+
+    def flush(self):
+        done, self.pending = self.pending, None
+        return done
+
+
+def parse_messages(lines, fmt=None):
+    """줄 반복자를 ChatMessage 반복자로 변환 (제너레이터)"""
+    parser = ChatParser(fmt)
+    for line in lines:
+        if (message := parser.feed(line)) is not None:
+            yield message
+    if (message := parser.flush()) is not None:
+        yield message
+
+
+class LineDecoder:
+    """바이트 조각을 받아 완성된 줄만 돌려주는 점진적 디코더 (멀티바이트 글자가 잘려도 안전)"""
+
+    def __init__(self, encoding="utf-8", errors="ignore"):
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors=errors)
+        self._pending = ""
+
+    def feed(self, data):
+        text = self._pending + self._decoder.decode(data)
+        lines = text.split("\n")
+        self._pending = lines.pop()
+        return lines
+
+    def flush(self):
+        text = self._pending + self._decoder.decode(b"", final=True)
+        self._pending = ""
+        return [text] if text else []
+
+
+def iter_text_lines(f, chunk_size=CHUNK_SIZE, encoding="utf-8"):
+    """바이너리 파일 객체를 chunk_size씩 읽어 줄 단위로 반환 (제너레이터)"""
+    decoder = LineDecoder(encoding)
+    while chunk := f.read(chunk_size):
+        yield from decoder.feed(chunk)
+    yield from decoder.flush()
+
+
+async def aiter_text_lines(file, chunk_size=CHUNK_SIZE, encoding="utf-8"):
+    """FastAPI UploadFile처럼 await read(n)을 지원하는 객체를 줄 단위로 반환 (비동기 제너레이터)"""
+    decoder = LineDecoder(encoding)
+    while chunk := await file.read(chunk_size):
+        for line in decoder.feed(chunk):
+            yield line
+    for line in decoder.flush():
+        yield line
+
+
+class MessageCollector:
+    """
+    줄을 하나씩 받아서 잡음이 아닌 메시지를 최근 limit개만 유지
+
+    date_str을 주면 그 날짜 메시지만 모으고, 그 날짜가 지나가면 feed()가 False를 반환해서
+    더 읽지 않아도 됨을 알린다.
+
+    Args:
+        date_str (str): 예) "2025년 6월 7일". None이면 파일 전체에서 모음
+        limit (int): 유지할 최근 메시지 수
+        fmt (str): 내보내기 형식 (None이면 자동 감지)
+    """
+
+    def __init__(self, date_str=None, limit=RECENT_LIMIT, fmt=None):
+        self.parser = ChatParser(fmt)
+        self.target = parse_date(date_str) if date_str else None
+        self.seen_target = False
+        self.messages = deque(maxlen=limit)
+        self.lines = 0
+
+    def feed(self, line):
+        self.lines += 1
+        self._add(self.parser.feed(line))
+        if self.target is not None:
+            if self.parser.date == self.target:
+                self.seen_target = True
+            elif self.seen_target:
+                return False  # 다음 날짜를 만나면 종료
+        return True
+
+    def _add(self, message):
+        if message is None or message.is_noise:
+            return
+        if self.target is not None and message.date != self.target:
+            return
+        self.messages.append(message)
+
+    def texts(self):
+        self._add(self.parser.flush())
+        return [m.text for m in self.messages]
+
+    def text(self):
+        return "\n".join(self.texts())
+
+
+def recent_texts(lines, date_str=None, limit=RECENT_LIMIT, fmt=None):
+    """줄 반복자에서 최근 메시지 본문 limit개를 목록으로 반환 (오래된 순)"""
+    collector = MessageCollector(date_str, limit, fmt)
+    for line in lines:
+        if not collector.feed(line):
+            break
+    return collector.texts()
+
+
+def extract_messages(lines, date_str=None, limit=RECENT_LIMIT, fmt=None):
+    """줄 반복자에서 최근 메시지 limit개를 뽑아 줄바꿈으로 이어 반환"""
+    return "\n".join(recent_texts(lines, date_str, limit, fmt))
+
+
+async def aextract_messages(lines, date_str=None, limit=RECENT_LIMIT, fmt=None):
+    """
+    비동기 줄 반복자용 recent_texts
+
+    Returns:
+        tuple: (최근 메시지 본문 목록, 읽은 줄 수)
+    """
+    collector = MessageCollector(date_str, limit, fmt)
+    async for line in lines:
+        if not collector.feed(line):
+            break
+    return collector.texts(), collector.lines
+
+
+@contextlib.contextmanager
+def open_buffer(f, mmap_threshold=MMAP_THRESHOLD):
+    """
+    파일 객체를 rfind/슬라이싱이 되는 버퍼로 열기
+
+    디스크에 있는 큰 파일(디스크로 넘어간 SpooledTemporaryFile 포함)은 mmap으로 열어
+    필요한 부분만 메모리에 올라오게 하고, 작거나 메모리에만 있는 파일은 bytes로 읽는다.
+    """
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    f.seek(0)
+    if size >= mmap_threshold:
+        try:
+            fileno = f.fileno()
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            fileno = None
+        if fileno is not None:
+            f.flush()
+            with mmap.mmap(fileno, 0, access=mmap.ACCESS_READ) as mm:
+                yield mm
+            return
+    yield f.read()
+
+
+def iter_buffer_lines(buf, offset=0, chunk_size=CHUNK_SIZE, encoding="utf-8"):
+    """버퍼의 offset부터 chunk_size씩 잘라 줄 단위로 반환 (필요한 만큼만 읽음)"""
+    decoder = LineDecoder(encoding)
+    for pos in range(offset, len(buf), chunk_size):
+        yield from decoder.feed(buf[pos:pos + chunk_size])
+    yield from decoder.flush()
+
+
+def iter_lines_reversed(buf, encoding="utf-8"):
+    """버퍼의 줄을 마지막 줄부터 거꾸로 반환 (제너레이터)"""
+    end = len(buf)
+    while end > 0:
+        start = buf.rfind(b"\n", 0, end) + 1
+        yield buf[start:end].decode(encoding, errors="ignore")
+        end = start - 1
+
+
+def iter_messages_reversed(lines, fmt=None):
+    """
+    거꾸로 된 줄 반복자(iter_lines_reversed)에서 메시지를 마지막 것부터 반환 (제너레이터)
+
+    이어지는 줄은 메시지 첫 줄을 만날 때까지 모아 두었다가 붙인다. 날짜 구분선은
+    메시지보다 앞에 있어서 PC/모바일 형식 메시지의 date는 None이다.
+    """
+    pattern = FORMATS[fmt] if fmt else None
+    continued = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if (line[0] in _HEADER_START and DATE_HEADER.match(line)) or SYSTEM_LINE.search(line):
+            continued.clear()  # 구분선/알림 바로 뒤 줄들은 어느 메시지에도 속하지 않음
+            continue
+        if pattern is None and (fmt := detect_format(line)) is not None:
+            pattern = FORMATS[fmt]
+        m = pattern.match(line) if pattern is not None else None
+        if m is None:
+            continued.append(line)
+            continue
+        message = _message(m, None)
+        if continued:
+            message.text = "\n".join([message.text, *reversed(continued)])
+            continued.clear()
+        yield message
+
+
+def find_date_section(buf, date_str):
+    """
+    파일 끝에서부터 거꾸로 date_str 날짜 구분선을 찾아 그 줄의 시작 오프셋을 반환
+
+    Returns:
+        int: 구분선 줄의 시작 위치. 없으면 None
+    """
+    needle = date_str.encode("utf-8")
+    target = parse_date(date_str)
+    end = len(buf)
+    while (idx := buf.rfind(needle, 0, end)) != -1:
+        start = buf.rfind(b"\n", 0, idx) + 1
+        line_end = buf.find(b"\n", idx)
+        line = buf[start:line_end if line_end != -1 else len(buf)]
+        if header_date(line.decode("utf-8", errors="ignore").strip()) == target:
+            return start
+        end = idx + len(needle) - 1
+    return None
+
+
+def extract_recent_messages(buf, date_str=None, limit=RECENT_LIMIT, fmt=None):
+    """
+    파일 끝에서부터 필요한 부분만 파싱해서 최근 메시지 limit개를 반환
+
+    오늘 대화는 파일 끝에 있으므로 전체 기록 크기가 아니라 하루치 대화 크기만큼만 읽는다.
+    date_str이 있으면 그 날짜 구분선을 거꾸로 찾아 그 구간만, 없으면 끝에서부터
+    메시지가 limit개 모일 때까지 거꾸로 읽는다.
+
+    Args:
+        buf: bytes 또는 mmap (open_buffer 결과)
+
+    Returns:
+        tuple: (최근 메시지 본문 목록, 읽은 줄 수)
+    """
+    if date_str:
+        offset = find_date_section(buf, date_str)
+        if offset is None:
+            return [], 0
+        collector = MessageCollector(date_str, limit, fmt)
+        for line in iter_buffer_lines(buf, offset):
+            if not collector.feed(line):
+                break
+        return collector.texts(), collector.lines
+
+    read = 0
+
+    def lines():
+        nonlocal read
+        for line in iter_lines_reversed(buf):
+            read += 1
+            yield line
+
+    messages = []
+    for message in iter_messages_reversed(lines(), fmt):
+        if not message.is_noise:
+            messages.append(message.text)
+            if len(messages) == limit:
+                break
+    messages.reverse()
+    return messages, read
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import jsoncodec
+
+
+def cache_key(model, messages, **params):
+    """(model, messages, 기타 파라미터)의 내용으로 만든 SHA-256 키"""
+    # jsoncodec 대신 표준 라이브러리: 디스크 캐시를 같이 쓰는 프로세스마다 설치된 백엔드가 달라도 같은 키가 되도록
+    payload = json.dumps(
+        {"model": model, "messages": messages, **params},
+        ensure_ascii=False, sort_keys=True, separators=(',', ':'),
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def is_json(content):
+    """JSON으로 파싱되는 응답인지 확인 (깨진 응답은 캐시하지 않기 위해 사용)"""
+    try:
+        jsoncodec.loads(content)
+        return True
+    except (jsoncodec.JSONDecodeError, TypeError):
+        return False
+
+
+class ResponseCache:
+    """
+    LLM 응답 캐시. 메모리(LRU + TTL)를 먼저 보고, path를 주면 SQLite 디스크 캐시도 사용
+
+    Args:
+        maxsize (int): 메모리에 보관할 최대 응답 수
+        ttl (float): 응답 유효 시간(초), None이면 만료 없음
+        path (str): SQLite 파일 경로. 여러 프로세스(API 서버, Streamlit)가 같이 쓸 수 있음
+        disk_maxsize (int): 디스크에 보관할 최대 응답 수
+    """
+
+    PRUNE_EVERY = 100  # set 몇 번마다 디스크의 만료/초과 항목을 정리할지
+
+    def __init__(self, maxsize=1024, ttl=24 * 3600, path=None, disk_maxsize=100000):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.disk_maxsize = disk_maxsize
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()  # key -> (저장 시각, 응답)
+        self._lock = threading.Lock()
+        self._sets = 0
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+            self._db.commit()
+
+    @classmethod
+    def from_env(cls):
+        """LLM_CACHE_SIZE, LLM_CACHE_TTL, LLM_CACHE_PATH 환경변수로 생성"""
+        ttl = float(os.getenv("LLM_CACHE_TTL", str(24 * 3600)))
+        return cls(
+            maxsize=int(os.getenv("LLM_CACHE_SIZE", "1024")),
+            ttl=ttl if ttl > 0 else None,
+            path=os.getenv("LLM_CACHE_PATH") or None,
+        )
+
+    def _expired(self, created, now):
+        return self.ttl is not None and now - created > self.ttl
+
+    def get(self, key):
+        """캐시된 응답을 반환. 없거나 만료됐으면 None"""
+        now = time.time()
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                if not self._expired(item[0], now):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return item[1]
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and not self._expired(row[1], now):
+                    self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    self._remember(key, row[1], row[0])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                    (key, value, now, now),
+                )
+                self._sets += 1
+                if self._sets % self.PRUNE_EVERY == 0:
+                    self._prune(now)
+                self._db.commit()
+
+    def _remember(self, key, created, value):
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def _prune(self, now):
+        if self.ttl is not None:
+            self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        self._db.execute(
+            "DELETE FROM responses WHERE key IN ("
+            " SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.disk_maxsize,),
+        )
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self):
+        """적중/미스 카운터"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_size": len(self._memory),
+        }
@@ -1,22 +1,233 @@
 import os
-import re
-import json
+import asyncio
+import logging
+import time
+import chat_index
+import jsoncodec
+import kakao_parser
+import llm_cache
+import metrics
+import rate_limit
+import structured_output
+import token_budget
+from batch_diary import iter_batch_results
+from diary_requests import (DIARY_FIELDS, DIARY_SCHEMA, SUMMARY_SCHEMA, CONTEXT_MAX_MESSAGES,
+                            pack_context, summary_diary_request)
+from contextlib import ExitStack, asynccontextmanager
 from datetime import datetime
-from fastapi import FastAPI, UploadFile, File, HTTPException
+import httpx
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from typing import Literal
 from pydantic import BaseModel
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI, RateLimitError
 
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-app = FastAPI()
+# ✅ 로그 레벨 (LOG_LEVEL=DEBUG면 대화 미리보기와 LLM 응답 원문까지 출력)
+logger = logging.getLogger("emotion_diary")
+logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logger.addHandler(_handler)
+    logger.propagate = False
+
+# ✅ GET /metrics로 내보내는 지표 (Prometheus 텍스트 형식)
+registry = metrics.Registry()
+request_latency = registry.histogram(
+    "diary_http_request_duration_seconds", "엔드포인트별 응답 시간 (스트리밍은 헤더까지)", ("method", "path", "status"))
+stage_latency = registry.histogram(
+    "diary_stage_duration_seconds", "요청 처리 단계별 소요 시간 (캐시 적중 포함)", ("stage",))
+llm_latency = registry.histogram(
+    "diary_llm_request_duration_seconds", "캐시에 없어서 실제로 보낸 LLM 호출 시간", ("model",))
+llm_tokens = registry.counter(
+    "diary_llm_tokens_total", "response.usage 기준 LLM 토큰 사용량", ("model", "kind"))
+llm_retries = registry.counter(
+    "diary_llm_retries_total", "SDK 재시도 이후 추가로 다시 보낸 LLM 호출 수", ("reason",))
+llm_http_responses = registry.counter(
+    "diary_llm_http_responses_total", "OpenAI API HTTP 응답 수 (SDK 자동 재시도 포함)", ("status",))
+
+
+async def _count_llm_response(response):
+    llm_http_responses.inc(status=response.status_code)
+
+# ✅ OpenAI 호출 설정 (환경변수로 조정)
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))                # 요청 하나의 전체 제한 시간(초)
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))  # 연결 제한 시간(초)
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))  # 커넥션 풀 크기
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "50"))   # 워커당 동시에 진행할 LLM 호출 수
+
+# 모든 요청이 같은 커넥션 풀을 재사용하도록 HTTP 클라이언트를 하나만 만든다
+http_client = httpx.AsyncClient(
+    limits=httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_CONNECTIONS,
+    ),
+    timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+    event_hooks={"response": [_count_llm_response]},
+)
+client = AsyncOpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    http_client=http_client,
+    timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+    max_retries=OPENAI_MAX_RETRIES,
+)
+llm_semaphore = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+llm_in_flight = 0  # 진행 중인 LLM 호출 수 (/metrics)
+
+
+@asynccontextmanager
+async def llm_slot():
+    """동시 호출 한도 안에서 LLM 호출 하나를 진행 (진행 중인 호출 수를 같이 셈)"""
+    global llm_in_flight
+    async with llm_semaphore:
+        llm_in_flight += 1
+        try:
+            yield
+        finally:
+            llm_in_flight -= 1
+
+
+# ✅ 분당 요청/토큰 한도 (OPENAI_RPM, OPENAI_TPM, 0이면 제한 없음)
+OPENAI_RATE_LIMIT_RETRIES = int(os.getenv("OPENAI_RATE_LIMIT_RETRIES", "3"))  # 429 이후 추가 재시도 횟수
+rate_limiter = rate_limit.RateLimiter.from_env()
+
+# ✅ 같은 (model, messages)에 대한 응답 캐시 (LLM_CACHE_PATH를 주면 Streamlit 앱과 공유)
+response_cache = llm_cache.ResponseCache.from_env()
+message_index = chat_index.ChatIndex.from_env()  # 업로드 파일별 파싱 결과 (같은 파일은 다시 파싱하지 않음)
+
+registry.callback("diary_llm_cache_hits_total", "LLM 응답 캐시 적중 수 (디스크 적중 포함)",
+                  lambda: response_cache.hits, kind="counter")
+registry.callback("diary_llm_cache_misses_total", "LLM 응답 캐시 미스 수",
+                  lambda: response_cache.misses, kind="counter")
+registry.callback("diary_chat_index_hits_total", "대화 색인 적중 수 (다시 파싱하지 않은 업로드)",
+                  lambda: message_index.hits, kind="counter")
+registry.callback("diary_chat_index_misses_total", "대화 색인 미스 수",
+                  lambda: message_index.misses, kind="counter")
+registry.callback("diary_rate_limit_throttled_total", "429로 모든 LLM 호출을 멈춘 횟수",
+                  lambda: rate_limiter.throttled, kind="counter")
+registry.callback("diary_llm_in_flight", "진행 중인 LLM 호출 수",
+                  lambda: llm_in_flight)
+
+
+def record_usage(model: str, usage) -> None:
+    if usage is not None:
+        llm_tokens.inc(usage.prompt_tokens, model=model, kind="prompt")
+        llm_tokens.inc(usage.completion_tokens, model=model, kind="completion")
+
+
+def _valid_output(content: str, output_model) -> str | None:
+    """output_model로 검증(필요하면 코드블록/앞뒤 설명 제거)한 정규 JSON, 안 되면 None"""
+    try:
+        return jsoncodec.dumps(structured_output.parse_model(content, output_model).model_dump())
+    except structured_output.RepairError:
+        return None
+
+
+async def chat_completion(output_model=None, **kwargs) -> str:
+    """
+    chat completion 응답 본문을 반환. 캐시에 있으면 API를 호출하지 않음
+    
+    동시 호출 수와 분당 요청/토큰 한도 안에서 호출하며(이벤트 루프를 막지 않음),
+    JSON으로 파싱되는 응답만 캐시한다. output_model(pydantic 모델)을 주면 그 모델로
+    검증되는 응답만 고쳐진 JSON으로 캐시하고 반환한다 (검증 안 되는 응답은 원문 그대로 반환).
+    """
+    key = llm_cache.cache_key(**kwargs)
+    content = response_cache.get(key)
+    if content is not None and (output_model is None or _valid_output(content, output_model) is not None):
+        return content
+    
+    estimated = rate_limit.estimate_request_tokens(kwargs["messages"])
+    for attempt in range(OPENAI_RATE_LIMIT_RETRIES + 1):
+        with stage_latency.time(stage="rate_limit_wait"):
+            await rate_limiter.acquire(estimated)
+        try:
+            async with llm_slot():
+                with llm_latency.time(model=kwargs["model"]):
+                    response = await client.chat.completions.create(**kwargs)
+            break
+        except RateLimitError as e:
+            # SDK 재시도까지 다 쓴 429: 모든 호출을 잠시 멈추고 다시 시도
+            if attempt == OPENAI_RATE_LIMIT_RETRIES:
+                raise
+            llm_retries.inc(reason="rate_limit")
+            retry_after = rate_limit.parse_retry_after(e.response.headers)
+            await asyncio.sleep(rate_limiter.backoff(attempt, retry_after))
+    record_usage(kwargs["model"], response.usage)
+    if response.usage is not None:
+        rate_limiter.settle(estimated, response.usage.total_tokens)
+    content = response.choices[0].message.content
+    if output_model is not None:
+        repaired = _valid_output(content, output_model)
+        if repaired is not None:
+            response_cache.set(key, repaired)
+            return repaired
+    elif llm_cache.is_json(content):
+        response_cache.set(key, content)
+    return content
+
+
+# ✅ 스키마를 지키지 않은 응답(로컬 복구도 실패)일 때 그 단계만 다시 호출할 횟수
+STRUCTURED_OUTPUT_RETRIES = int(os.getenv("STRUCTURED_OUTPUT_RETRIES", "1"))
+
+
+async def structured_completion(stage: str, output_model, **kwargs):
+    """
+    응답을 로컬에서 복구/검증해서 output_model 인스턴스로 반환
+
+    코드블록이나 앞뒤 설명이 붙은 응답은 다시 호출하지 않고 고쳐서 쓴다. 고쳐도 안 되면
+    (잘린 응답, 필드 누락) 이 단계만 STRUCTURED_OUTPUT_RETRIES번 다시 호출한다.
+
+    Raises:
+        HTTPException: 다시 호출해도 검증되지 않음 (500)
+    """
+    for attempt in range(STRUCTURED_OUTPUT_RETRIES + 1):
+        with stage_latency.time(stage=stage):
+            raw = await chat_completion(output_model=output_model, **kwargs)
+        logger.debug("📄 %s 응답 원문:\n%s", stage, raw)
+        try:
+            with stage_latency.time(stage="json_parse"):
+                return structured_output.parse_model(raw, output_model)
+        except structured_output.RepairError as e:
+            if attempt == STRUCTURED_OUTPUT_RETRIES:
+                raise HTTPException(status_code=500, detail=f"{stage} 응답 파싱 실패: {e}\n원문: {raw}")
+            llm_retries.inc(reason="invalid_output")
+            logger.warning("%s 응답을 고칠 수 없어 이 단계만 다시 호출합니다: %s", stage, e)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await client.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # 경로 변수 값이 아니라 라우트 템플릿으로 묶어서 라벨 수가 늘지 않게 함
+        route = request.scope.get("route")
+        request_latency.observe(time.perf_counter() - started, method=request.method,
+                                path=route.path if route else "unmatched", status=status)
 
 
 # ✅ 요청 모델
 class DiaryRequest(BaseModel):
     kakao_text: str
     search_log: str | None = "없음"
+    # "two_step": 요약 → 일기 순서로 두 번 호출, "single": 요약과 일기를 한 번에 생성
+    pipeline: Literal["two_step", "single"] = "two_step"
 
 
 # ✅ 오늘 날짜를 카카오톡 날짜 포맷에 맞게 반환
@@ -25,39 +236,159 @@ def get_today_str_kakao():
     return f"{today.year}년 {today.month}월 {today.day}일"
 
 
-def extract_today_chat(text: str, _: str = "") -> str:
-    lines = text.splitlines()
-    chat = []
+# ✅ 업로드 파일 추출 방식
+#    tail (기본): 파일 끝에서 거꾸로 오늘 구간만 파싱 (파일 크기와 거의 상관없이 빠름)
+#    stream: 앞에서부터 조각 단위로 파싱
+#    index: 파일 내용 해시별로 전체를 한 번 파싱해 색인해 두고 조회. 같은 파일을 여러 번 올리는
+#           경우에만 이득이고 새 파일은 전체를 파싱하므로, CHAT_INDEX_PATH(디스크 파일)가 있을 때만 사용
+KAKAO_EXTRACT_MODE = os.getenv("KAKAO_EXTRACT_MODE", "tail")
+if KAKAO_EXTRACT_MODE == "index" and not message_index.on_disk:
+    logger.warning("KAKAO_EXTRACT_MODE=index는 CHAT_INDEX_PATH(디스크 파일)가 필요합니다. tail 방식으로 추출합니다.")
+    KAKAO_EXTRACT_MODE = "tail"
+
+
+def _extract_indexed(f, date_str: str) -> tuple[list[str], int]:
+    with ExitStack() as stack:
+        with stage_latency.time(stage="upload_read"):
+            buf = stack.enter_context(kakao_parser.open_buffer(f))
+        with stage_latency.time(stage="extract"):
+            key = message_index.add(buf)
+            texts = message_index.recent_texts(key, date_str or None, CONTEXT_MAX_MESSAGES)
+            return texts, message_index.info(key)["lines"]
+
+
+def _extract_tail(f, date_str: str) -> tuple[list[str], int]:
+    # 큰 업로드는 디스크에 임시 저장돼 있으므로 mmap으로 열어 끝부분만 읽음
+    with ExitStack() as stack:
+        with stage_latency.time(stage="upload_read"):
+            buf = stack.enter_context(kakao_parser.open_buffer(f))
+        with stage_latency.time(stage="extract"):
+            return kakao_parser.extract_recent_messages(buf, date_str or None, CONTEXT_MAX_MESSAGES)
+
+
+def _extract_file(f, date_str: str) -> tuple[token_budget.PackedContext, int]:
+    """바이너리 파일 객체에서 index/tail 방식으로 추출하고 토큰 예산만큼 묶음 (스레드에서 실행)"""
+    if KAKAO_EXTRACT_MODE == "index":
+        texts, lines = _extract_indexed(f, date_str)
+    else:
+        texts, lines = _extract_tail(f, date_str)
+    with stage_latency.time(stage="pack"):
+        return pack_context(texts), lines
+
+
+async def extract_today_chat_upload(file: UploadFile, date_str: str = "") -> tuple[token_budget.PackedContext, int]:
+    """
+    업로드 파일을 통째로 디코딩하지 않고 최근 메시지를 토큰 예산만큼 추출
+
+    Returns:
+        tuple: (PackedContext - .text가 프롬프트에 넣을 대화,
+                읽은 줄 수 - index 모드는 색인한 파일의 전체 줄 수)
+    """
+    if KAKAO_EXTRACT_MODE == "stream":
+        # 읽기와 파싱이 조각 단위로 섞여 있어서 한 단계로 잼
+        with stage_latency.time(stage="extract"):
+            texts, lines = await kakao_parser.aextract_messages(
+                kakao_parser.aiter_text_lines(file), date_str or None, CONTEXT_MAX_MESSAGES
+            )
+        with stage_latency.time(stage="pack"):
+            return pack_context(texts), lines
+    return await asyncio.to_thread(_extract_file, file.file, date_str)
+
+
+# ✅ 요약 + 감성일기를 한 번의 호출로 생성 (대화 원문을 한 번만 보내므로 지연과 입력 토큰이 절반 수준)
+async def generate_summary_and_diary(kakao_text: str, search_log: str | None) -> dict:
+    result = await structured_completion(
+        "summary_diary", structured_output.SummaryDiaryResult, **summary_diary_request(kakao_text, search_log))
+    # 기존 두 단계 응답과 같은 키 순서로 반환
+    diary = {field: getattr(result, field) for field in DIARY_FIELDS}
+    diary["summary"] = result.summary
+    return diary
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {jsoncodec.dumps(data)}\n\n"
+
+
+async def stream_summary_and_diary(kakao_text: str, search_log: str | None):
+    """
+    요약과 감성일기 필드가 하나씩 완성될 때마다 SSE 이벤트를 보냄
+
+    이벤트: field {"key", "value"} → ... → done {} (실패하면 error {"detail"})
+    """
+    request = summary_diary_request(kakao_text, search_log)
+    key = llm_cache.cache_key(**request)
+    cached = response_cache.get(key)
+    if cached is not None:
+        for field, value in jsoncodec.loads(cached).items():
+            yield sse_event("field", {"key": field, "value": value})
+        yield sse_event("done", {})
+        return
+
+    parser = structured_output.IncrementalFieldParser()
+    chunks = []
+    estimated = rate_limit.estimate_request_tokens(request["messages"])
+    started = time.perf_counter()
+    try:
+        with stage_latency.time(stage="rate_limit_wait"):
+            await rate_limiter.acquire(estimated)
+        async with llm_slot():
+            # include_usage: 마지막 청크(choices 없음)에 토큰 사용량이 붙어 옴
+            stream = await client.chat.completions.create(
+                **request, stream=True, stream_options={"include_usage": True})
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    record_usage(request["model"], chunk.usage)
+                    rate_limiter.settle(estimated, chunk.usage.total_tokens)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                chunks.append(delta)
+                for field, value in parser.feed(delta):
+                    yield sse_event("field", {"key": field, "value": value})
+    except Exception as e:
+        yield sse_event("error", {"detail": str(e)})
+        return
+    finally:
+        stage_latency.observe(time.perf_counter() - started, stage="summary_diary_stream")
+
+    # 스트리밍은 이미 보낸 필드가 있어서 다시 호출하지 않고, 복구도 안 되면 오류로 끝냄
+    content = _valid_output("".join(chunks), structured_output.SummaryDiaryResult)
+    if content is None:
+        yield sse_event("error", {"detail": "요약+감성일기 응답이 스키마와 맞지 않습니다"})
+        return
+    response_cache.set(key, content)
+    yield sse_event("done", {})
+
 
-    # ✅ [이름] [오후 3:36] 메시지
-    msg = re.compile(r"^\[(.*?)\]\s*\[(오전|오후)\s*\d{1,2}:\d{2}\]\s*(.*)")
+# ✅ 응답 캐시 적중/미스 현황
+@app.get("/cache-stats")
+async def cache_stats():
+    return {**response_cache.stats(), "chat_index": message_index.stats()}
 
-    for ln in lines:
-        ln = ln.strip()
-        m = msg.match(ln)
-        if m:
-            msg_txt = m.group(3).strip()
-            if not any(k in msg_txt for k in ["[사진]", "이모티콘", "님이 입장", "님이 나갔"]):
-                chat.append(msg_txt)
 
-    return "\n".join(chat[-30:])
+# ✅ Prometheus 지표 (단계별 지연 히스토그램, 토큰 사용량, 캐시/재시도 카운터)
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(registry.render(), media_type=metrics.CONTENT_TYPE)
 
 
 # ✅ 1. 카카오톡 txt 업로드 및 오늘 대화 미리보기
 @app.post("/upload-kakao")
 async def upload_kakao(file: UploadFile = File(...)):
     try:
-        content = (await file.read()).decode("utf-8", errors="ignore")
+        context, total_lines = await extract_today_chat_upload(file)
+        today_chat = context.text
 
-        today_chat = extract_today_chat(content)
-
-        print("총 메시지 줄 수:", len(content.splitlines()))
-        print("추출된 대화 줄 수:", len(today_chat.splitlines()))
-        print("미리보기 내용:\n", today_chat)
+        logger.debug("읽은 줄 수: %d, 추출된 대화 줄 수: %d, 문맥 토큰 수: %d/%d",
+                     total_lines, context.messages, context.tokens, context.budget)
+        logger.debug("미리보기 내용:\n%s", today_chat)
 
         return {
             "today_chat": today_chat,
-            "length": len(today_chat)
+            "length": len(today_chat),
+            "context": context.report()
         }
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -65,8 +396,11 @@ async def upload_kakao(file: UploadFile = File(...)):
 
 # ✅ 2. 요약 + 감정 분석 포함된 감성 일기 생성
 @app.post("/generate-diary")
-def generate_diary(data: DiaryRequest):
+async def generate_diary(data: DiaryRequest):
     try:
+        if data.pipeline == "single":
+            return await generate_summary_and_diary(data.kakao_text, data.search_log)
+
         # 1단계: 요약 생성
         summary_prompt = f"""
         아래는 카카오톡 대화 내용입니다:
@@ -81,11 +415,12 @@ def generate_diary(data: DiaryRequest):
         }}
         """
 
-        summary_response = client.chat.completions.create(
+        summary = (await structured_completion(
+            "summary", structured_output.SummaryResult,
             model="gpt-4o-mini",
-            messages=[{"role": "user", "content": summary_prompt}]
-        )
-        summary = json.loads(summary_response.choices[0].message.content)["summary"]
+            messages=[{"role": "user", "content": summary_prompt}],
+            response_format=SUMMARY_SCHEMA,
+        )).summary
 
         # 2단계: 감성 일기 생성
         diary_prompt = f"""
@@ -110,115 +445,112 @@ def generate_diary(data: DiaryRequest):
         모든 응답은 한국어로 따뜻하고 진심어리게 작성하고, 각각 2~3문장 이상 작성하세요.
         """
 
-        diary_response = client.chat.completions.create(
+        diary = (await structured_completion(
+            "diary", structured_output.DiaryResult,
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": "당신은 감성적인 작가이자 상담가입니다. 주어진 정보로 감정 분석과 위로의 말을 작성해주세요. 반드시 JSON으로 응답하세요."},
                 {"role": "user", "content": diary_prompt}
-            ]
-        )
-
-        diary = json.loads(diary_response.choices[0].message.content)
+            ],
+            response_format=DIARY_SCHEMA,
+        )).model_dump()
         diary["summary"] = summary
 
         return diary
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
+# ✅ 추출된 대화로 요약 + 감성일기 생성 (/auto-diary와 배치 작업이 공유)
+async def diary_from_chat(kakao_text: str, search_log: str | None = "없음",
+                          pipeline: str = "two_step") -> dict:
+    if pipeline == "single":
+        return await generate_summary_and_diary(kakao_text, search_log)
+
+    # 1단계: 요약 생성
+    summary_prompt = f"""
+    아래는 카카오톡 대화 내용입니다:
+    ---
+    {kakao_text}
+    ---
+
+    위 대화를 요약해줘. 감정 표현 없이 무슨 일이 있었는지 2~3문장으로 설명해줘.
+    절대로 설명 없이 다음 JSON 형식만 출력하세요:
+
+    {{
+      "summary": "..."
+    }}
+    """
+
+    summary = (await structured_completion(
+        "summary", structured_output.SummaryResult,
+        model="gpt-4o-mini",
+        messages=[{"role": "user", "content": summary_prompt}],
+        response_format=SUMMARY_SCHEMA,
+    )).summary
+
+    # 2단계: 감성일기 생성
+    diary_prompt = f"""
+    ### 입력 정보
+    - 검색기록: {search_log}
+    - 카카오톡 대화: {kakao_text}
+    - 요약: {summary}
+
+    ### 지시사항
+    아래 형식으로만 출력하세요. 설명 문장 없이 JSON만 출력하세요:
+
+    {{
+      "상황설명": "...",
+      "감정표현": "...",
+      "공감과인정": "...",
+      "따뜻한위로": "...",
+      "실용적제안": "..."
+    }}
+
+    모든 항목은 진심 어린 한국어로 2~3문장 이상 작성하세요.
+    """
+
+    diary = (await structured_completion(
+        "diary", structured_output.DiaryResult,
+        model="gpt-4o-mini",
+        messages=[
+            {
+                "role": "system",
+                "content": "당신은 감성적인 작가이자 상담가입니다. 반드시 JSON 형식으로만 응답하세요. 설명이나 서론 없이."
+            },
+            {
+                "role": "user",
+                "content": diary_prompt
+            }
+        ],
+        response_format=DIARY_SCHEMA,
+    )).model_dump()
+
+    diary["summary"] = summary
+    return diary
+
+
 @app.post("/auto-diary")
-async def auto_diary(file: UploadFile = File(...), search_log: str = "없음"):
+async def auto_diary(file: UploadFile = File(...), search_log: str = "없음",
+                     pipeline: Literal["two_step", "single"] = "two_step"):
     try:
-        content = (await file.read()).decode("utf-8", errors="ignore")
-
         # 1단계: 카카오톡 대화 추출
-        kakao_text = extract_today_chat(content)
+        context, _ = await extract_today_chat_upload(file)
+        kakao_text = context.text
 
         if not kakao_text.strip():
             raise HTTPException(status_code=400, detail="카카오톡 대화가 감지되지 않았습니다.")
 
-        # 2단계: 요약 생성
-        summary_prompt = f"""
-        아래는 카카오톡 대화 내용입니다:
-        ---
-        {kakao_text}
-        ---
-
-        위 대화를 요약해줘. 감정 표현 없이 무슨 일이 있었는지 2~3문장으로 설명해줘.
-        절대로 설명 없이 다음 JSON 형식만 출력하세요:
-
-        {{
-          "summary": "..."
-        }}
-        """
-
-        summary_response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": summary_prompt}]
-        )
-
-        summary_raw = summary_response.choices[0].message.content
-        print("📄 요약 응답 원문:\n", summary_raw)
-
-        try:
-            summary = json.loads(summary_raw)["summary"]
-        except json.JSONDecodeError as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"요약 응답 파싱 실패: {e}\n원문: {summary_raw}"
-            )
-
-        # 3단계: 감성일기 생성
-        diary_prompt = f"""
-        ### 입력 정보
-        - 검색기록: {search_log}
-        - 카카오톡 대화: {kakao_text}
-        - 요약: {summary}
-
-        ### 지시사항
-        아래 형식으로만 출력하세요. 설명 문장 없이 JSON만 출력하세요:
-
-        {{
-          "상황설명": "...",
-          "감정표현": "...",
-          "공감과인정": "...",
-          "따뜻한위로": "...",
-          "실용적제안": "..."
-        }}
-
-        모든 항목은 진심 어린 한국어로 2~3문장 이상 작성하세요.
-        """
-
-        diary_response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "당신은 감성적인 작가이자 상담가입니다. 반드시 JSON 형식으로만 응답하세요. 설명이나 서론 없이."
-                },
-                {
-                    "role": "user",
-                    "content": diary_prompt
-                }
-            ]
-        )
-
-        diary_raw = diary_response.choices[0].message.content
-        print("📄 감성일기 응답 원문:\n", diary_raw)
-
-        try:
-            diary = json.loads(diary_raw)
-        except json.JSONDecodeError as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"일기 응답 파싱 실패: {e}\n원문: {diary_raw}"
-            )
-
-        diary["summary"] = summary
+        diary = await diary_from_chat(kakao_text, search_log, pipeline)
         diary["kakao_text"] = kakao_text
+        diary["context"] = context.report()
 
         return diary
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -235,4 +567,54 @@ async def auto_diary(file: UploadFile = File(...), search_log: str = "없음"):
         #   "공감과인정": "...",
         #   "따뜻한위로": "...",
         #   "실용적제안": "..."
-        # }}
\ No newline at end of file
+        # }}
+
+
+# ✅ 감성일기 스트리밍 (필드가 완성될 때마다 Server-Sent Events로 전송)
+@app.post("/auto-diary/stream")
+async def auto_diary_stream(file: UploadFile = File(...), search_log: str = "없음"):
+    context, _ = await extract_today_chat_upload(file)
+    kakao_text = context.text
+
+    if not kakao_text.strip():
+        raise HTTPException(status_code=400, detail="카카오톡 대화가 감지되지 않았습니다.")
+
+    async def events():
+        yield sse_event("kakao_text", {"value": kakao_text, "context": context.report()})
+        async for event in stream_summary_and_diary(kakao_text, search_log):
+            yield event
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+# ✅ 여러 대화 파일로 감성일기 일괄 생성 (끝나는 순서대로 JSONL 한 줄씩 전송)
+@app.post("/batch-diary")
+async def batch_diary(files: list[UploadFile] = File(...), search_log: str = "없음",
+                      pipeline: Literal["two_step", "single"] = "single", concurrency: int = 8):
+    # 응답을 스트리밍하는 동안 업로드 파일이 닫힐 수 있으므로, 업로드 원문은 들고 있지 않고
+    # 파일마다 스레드에서 index/tail 추출해서 프롬프트에 넣을 대화만 남겨 둠
+    # 모바일 내보내기는 파일 이름이 모두 같으므로(KakaoTalkChats.txt) 업로드 순서를 붙여 작업 ID로 씀
+    jobs = []
+    for i, file in enumerate(files):
+        try:
+            context, _ = await asyncio.to_thread(_extract_file, file.file, "")
+            jobs.append((f"{i}:{file.filename}", context.text))
+        except Exception as e:
+            jobs.append((f"{i}:{file.filename}", e))  # 그 작업만 실패로 기록
+
+    async def process(kakao_text: str | Exception) -> dict:
+        if isinstance(kakao_text, Exception):
+            raise kakao_text
+        if not kakao_text.strip():
+            raise ValueError("카카오톡 대화가 감지되지 않았습니다.")
+        return await diary_from_chat(kakao_text, search_log, pipeline)
+
+    # 동시 작업 수는 워커당 LLM 동시 호출 한도를 넘지 않게
+    concurrency = min(max(1, concurrency), OPENAI_MAX_CONCURRENCY)
+
+    async def lines():
+        async for result in iter_batch_results(jobs, process, concurrency):
+            yield jsoncodec.dumps_bytes(result) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -0,0 +1,135 @@
+import asyncio
+import email.utils
+import math
+import os
+import time
+
+
+def estimate_tokens(text):
+    """토크나이저 없이 대략적인 토큰 수 추정 (한국어는 글자당 토큰이 많아서 보수적으로 계산)"""
+    return len(text) // 2 + 1
+
+
+def estimate_request_tokens(messages, completion_tokens=800):
+    """chat completion 요청 하나가 쓸 토큰 수 추정 (입력 + 예상 출력)"""
+    return sum(estimate_tokens(m["content"]) for m in messages) + completion_tokens
+
+
+def parse_retry_after(headers):
+    """
+    429 응답 헤더에서 다시 시도할 때까지 기다릴 시간(초). 알 수 없으면 None
+
+    retry-after-ms(OpenAI)를 먼저 보고, retry-after는 초 또는 HTTP 날짜 형식을 모두 받는다.
+    """
+    try:
+        ms = float(headers.get("retry-after-ms", ""))
+        if math.isfinite(ms) and ms >= 0:
+            return ms / 1000
+    except ValueError:
+        pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            when = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if when.tzinfo is None:
+            return None
+        seconds = when.timestamp() - time.time()
+    if not math.isfinite(seconds):
+        return None
+    return max(0.0, seconds)
+
+
+class TokenBucket:
+    """분당 rate만큼 채워지는 토큰 버킷. rate가 0이면 제한 없음"""
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """amount만큼 꺼내려면 기다려야 하는 시간(초)"""
+        if not self.capacity:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.tokens) / self.rate)
+
+    def take(self, amount):
+        if self.capacity:
+            self.tokens -= min(amount, self.capacity)
+
+    def give_back(self, amount):
+        if self.capacity:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimiter:
+    """
+    분당 요청 수(RPM)와 분당 토큰 수(TPM)를 같이 지키는 비동기 제한기
+
+    429를 받으면 backoff()로 모든 호출을 잠시 멈추게 한다.
+
+    Args:
+        rpm (int): 분당 최대 요청 수 (0이면 제한 없음)
+        tpm (int): 분당 최대 토큰 수 (0이면 제한 없음)
+    """
+
+    def __init__(self, rpm=0, tpm=0):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.paused_until = 0.0
+        self.throttled = 0  # 429로 멈춘 횟수
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """OPENAI_RPM, OPENAI_TPM 환경변수로 생성"""
+        return cls(int(os.getenv("OPENAI_RPM", "0")), int(os.getenv("OPENAI_TPM", "0")))
+
+    async def acquire(self, tokens):
+        """요청 하나와 토큰 tokens개를 쓸 수 있을 때까지 대기 (먼저 온 순서대로)"""
+        async with self._lock:
+            while True:
+                wait = max(
+                    self.paused_until - time.monotonic(),
+                    self.requests.wait_time(1),
+                    self.tokens.wait_time(tokens),
+                )
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            self.requests.take(1)
+            self.tokens.take(tokens)
+
+    def settle(self, estimated, actual):
+        """응답의 실제 토큰 사용량으로 추정치와의 차이를 보정"""
+        if actual < estimated:
+            self.tokens.give_back(estimated - actual)
+        else:
+            self.tokens.take(actual - estimated)
+
+    def backoff(self, attempt, retry_after=None, base=1.0, cap=60.0):
+        """
+        429를 받았을 때 모든 호출을 멈출 시간을 정하고 반환 (지수 백오프)
+
+        Args:
+            attempt (int): 같은 요청의 재시도 횟수 (0부터)
+            retry_after (float): 서버가 알려준 Retry-After(초)
+        """
+        delay = retry_after if retry_after else min(cap, base * 2 ** attempt)
+        self.paused_until = max(self.paused_until, time.monotonic() + delay)
+        self.throttled += 1
+        return delay
@@ -0,0 +1,216 @@
+import re
+
+import pydantic
+
+import jsoncodec
+
+_WHITESPACE = ' \t\n\r'
+_CODE_FENCE = re.compile(r'```[\w-]*[ \t]*\n?(.*?)```', re.S)
+
+# ✅ 감성일기 필드
+DIARY_FIELDS = ["상황설명", "감정표현", "공감과인정", "따뜻한위로", "실용적제안"]
+
+# ✅ 단계별 응답 모델 (스키마 강제 + 로컬 복구 후 검증에 같이 씀)
+SummaryResult = pydantic.create_model("SummaryResult", summary=(str, ...))
+DiaryResult = pydantic.create_model("DiaryResult", **{field: (str, ...) for field in DIARY_FIELDS})
+SummaryDiaryResult = pydantic.create_model(
+    "SummaryDiaryResult", summary=(str, ...), **{field: (str, ...) for field in DIARY_FIELDS})
+
+
+class RepairError(ValueError):
+    """응답을 고쳐 봐도 JSON 객체가 아니거나 모델 필드와 맞지 않을 때"""
+
+
+def json_schema_format(model, name):
+    """
+    pydantic 모델로 strict structured output용 response_format 생성
+
+    strict 모드는 모든 필드가 required이고 additionalProperties가 false여야 한다.
+    """
+    schema = model.model_json_schema()
+    properties = {
+        field: {k: v for k, v in prop.items() if k != 'title'}
+        for field, prop in schema['properties'].items()
+    }
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": name,
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": properties,
+                "required": list(properties),
+                "additionalProperties": False,
+            },
+        },
+    }
+
+
+def extract_object(text):
+    """
+    코드블록 표시와 앞뒤 설명 문장을 떼고 가장 바깥 JSON 객체 문자열만 꺼냄
+
+    Raises:
+        RepairError: '{'가 없거나 객체가 닫히지 않음 (응답이 잘림)
+    """
+    fenced = _CODE_FENCE.search(text)
+    if fenced and '{' in fenced.group(1):
+        text = fenced.group(1)
+    start = text.find('{')
+    if start < 0:
+        raise RepairError("응답에 JSON 객체가 없습니다")
+    depth = 0
+    in_string = False
+    escape = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == '{':
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    raise RepairError("JSON 객체가 닫히지 않았습니다 (응답이 잘렸을 수 있음)")
+
+
+def parse_object(text):
+    """
+    모델 응답을 dict로 파싱. 바로 파싱되지 않으면 extract_object로 고쳐서 한 번 더 시도
+
+    Raises:
+        RepairError
+    """
+    if not text:
+        raise RepairError("응답이 비어 있습니다")
+    try:
+        value = jsoncodec.loads(text)
+    except jsoncodec.JSONDecodeError:
+        try:
+            value = jsoncodec.loads(extract_object(text))
+        except jsoncodec.JSONDecodeError as e:
+            raise RepairError(f"JSON 파싱 실패: {e}") from e
+    if not isinstance(value, dict):
+        raise RepairError(f"JSON 객체가 아닙니다: {type(value).__name__}")
+    return value
+
+
+def parse_model(text, model):
+    """
+    응답을 (필요하면 고쳐서) 파싱하고 pydantic 모델로 검증
+
+    Returns:
+        model 인스턴스
+
+    Raises:
+        RepairError: 고쳐도 파싱되지 않거나 필드가 빠짐/타입이 다름
+    """
+    try:
+        return model.model_validate(parse_object(text))
+    except pydantic.ValidationError as e:
+        fields = ", ".join(".".join(map(str, err["loc"])) for err in e.errors())
+        raise RepairError(f"{model.__name__} 필드 검증 실패: {fields}") from e
+
+
+class IncrementalFieldParser:
+    """
+    스트리밍으로 들어오는 JSON 객체 조각에서 완성된 최상위 필드를 바로 꺼내는 파서
+
+    feed()에 조각을 넣을 때마다 그 사이에 값이 끝난 (키, 값)들을 반환한다.
+    첫 '{' 앞에 붙은 코드블록 표시나 설명 문장은 건너뛴다.
+
+        parser = IncrementalFieldParser()
+        for delta in stream:
+            for key, value in parser.feed(delta):
+                ...
+    """
+
+    def __init__(self):
+        self.buf = ''
+        self.pos = 0          # 다음에 검사할 위치
+        self.depth = 0        # 현재 중괄호/대괄호 깊이 (최상위 객체 안이 1)
+        self.in_string = False
+        self.escape = False
+        self.phase = 'key'    # 최상위에서 기대하는 것: key, colon, value
+        self.key = None
+        self.key_start = None
+        self.value_start = None
+        self.done = False
+
+    def feed(self, chunk):
+        """
+        Returns:
+            list: 이번 조각으로 완성된 (키, 값) 목록
+        """
+        if not chunk or self.done:
+            return []
+        self.buf += chunk
+        fields = []
+        buf = self.buf
+        i = self.pos
+        while i < len(buf) and not self.done:
+            ch = buf[i]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == '\\':
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    if self.depth == 1:
+                        if self.phase == 'key':
+                            self.key = jsoncodec.loads(buf[self.key_start:i + 1])
+                            self.phase = 'colon'
+                        elif self.value_start is not None and buf[self.value_start] == '"':
+                            fields.append(self._take(buf, i + 1))
+            elif self.depth == 0:
+                if ch == '{':
+                    self.depth = 1
+            elif ch == '"':
+                self.in_string = True
+                if self.depth == 1:
+                    if self.phase == 'key':
+                        self.key_start = i
+                    elif self.phase == 'value' and self.value_start is None:
+                        self.value_start = i
+            elif ch in '{[':
+                if self.depth == 1 and self.phase == 'value' and self.value_start is None:
+                    self.value_start = i
+                self.depth += 1
+            elif ch in '}]':
+                self.depth -= 1
+                if self.depth == 1 and self.value_start is not None:
+                    fields.append(self._take(buf, i + 1))
+                elif self.depth == 0:
+                    # 숫자/true/null처럼 구분자로만 끝을 알 수 있는 마지막 값
+                    if self.value_start is not None and self.key is not None:
+                        fields.append(self._take(buf, i))
+                    self.done = True
+            elif self.depth == 1:
+                if ch == ':' and self.phase == 'colon':
+                    self.phase = 'value'
+                elif ch == ',':
+                    if self.value_start is not None and self.key is not None:
+                        fields.append(self._take(buf, i))
+                    self.phase = 'key'
+                elif ch not in _WHITESPACE and self.phase == 'value' and self.value_start is None:
+                    self.value_start = i
+            i += 1
+        self.pos = i
+        return fields
+
+    def _take(self, buf, end):
+        key, value = self.key, jsoncodec.loads(buf[self.value_start:end])
+        self.key = None
+        self.value_start = None
+        self.phase = 'after'
+        return key, value
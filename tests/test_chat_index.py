@@ -0,0 +1,49 @@
+import datetime
+
+import pytest
+
+import chat_index
+import kakao_parser
+from benchmarks.synthetic import make_kakao_export
+
+
+END = datetime.date(2025, 6, 7)
+
+
+@pytest.fixture(scope="module", params=["pc", "mobile", "android", "ios"])
+def export(request):
+    text = make_kakao_export(request.param, days=4, messages_per_day=60, end=END, seed=7, multiline_ratio=0.2)
+    index = chat_index.ChatIndex()
+    data = text.encode("utf-8")
+    return text, data, index, index.add(data)
+
+
+@pytest.mark.parametrize("limit", [10, 500])
+@pytest.mark.parametrize("date_str", ["2025년 6월 7일", "2025년 6월 5일", "2025년 5월 1일", None])
+def test_index_matches_forward_extraction(export, date_str, limit):
+    text, _, index, key = export
+    assert index.recent_texts(key, date_str, limit) == kakao_parser.recent_texts(text.splitlines(), date_str, limit)
+
+
+def test_index_reuses_parsed_file(export):
+    _, data, index, key = export
+    hits = index.hits
+    assert index.add(data) == key
+    assert index.hits == hits + 1
+    assert index.dates(key) == ["2025-06-04", "2025-06-05", "2025-06-06", "2025-06-07"]
+
+
+def test_disk_index_is_shared_and_pruned(tmp_path):
+    path = str(tmp_path / "chat_index.sqlite")
+    exports = [make_kakao_export("pc", days=1, messages_per_day=20, end=END, seed=seed).encode() for seed in range(3)]
+    writer = chat_index.ChatIndex(path, max_files=2)
+    keys = [writer.add(data) for data in exports]
+
+    # 다른 연결(다른 프로세스와 같음)도 이미 색인된 파일을 다시 파싱하지 않음
+    reader = chat_index.ChatIndex(path, max_files=2)
+    assert reader.add(exports[2]) == keys[2]
+    assert reader.hits == 1 and reader.misses == 0
+    # 가장 오래 안 쓴 파일부터 지워서 max_files개만 남음
+    assert reader.stats()["files"] == 2
+    assert reader.info(keys[0]) is None
+    assert reader.recent_texts(keys[1]) == kakao_parser.recent_texts(exports[1].decode().splitlines())
@@ -0,0 +1,112 @@
+import pytest
+
+import dataset_packing
+
+
+class CharTokenizer:
+    """글자 하나를 토큰 하나로 세는 토크나이저"""
+    name = "chars"
+
+    def count(self, text):
+        return len(text)
+
+
+def message(role, tag, tokens=10):
+    # 메시지 하나의 토큰 수 = TOKENS_PER_MESSAGE(3) + 본문 글자 수
+    return {"role": role, "content": tag.ljust(tokens - dataset_packing.TOKENS_PER_MESSAGE, ".")}
+
+
+def sample(system, *tags):
+    turns = [message("user" if i % 2 == 0 else "assistant", tag) for i, tag in enumerate(tags)]
+    return {"messages": ([message("system", system)] if system else []) + turns}
+
+
+def contents(packed):
+    return [m["content"].rstrip(".") for m in packed["messages"]]
+
+
+def packer(**options):
+    return dataset_packing.SamplePacker(tokenizer=CharTokenizer(), **options)
+
+
+def test_sample_tokens():
+    # 샘플 시작 3 + 메시지 3개 x 10
+    assert packer().sample_tokens(sample("S", "u1", "a1")) == 33
+
+
+def test_packs_samples_with_same_system_up_to_max_tokens():
+    p = packer(max_tokens=60)
+    assert p.add(sample("S", "u1", "a1")) == []
+    assert p.add(sample("S", "u2", "a2")) == []    # 33 + 20 = 53
+    [(done, tokens)] = p.add(sample("S", "u3", "a3"))  # 73이 되므로 앞 묶음을 내보냄
+    assert contents(done) == ["S", "u1", "a1", "u2", "a2"]
+    assert tokens == 53 == p.sample_tokens(done)
+    [(rest, tokens)] = p.flush()
+    assert contents(rest) == ["S", "u3", "a3"] and tokens == 33
+    assert p.flush() == []
+
+
+def test_different_systems_are_not_mixed():
+    p = packer(max_tokens=1000)
+    p.add(sample("A", "u1", "a1"))
+    p.add(sample("B", "u2", "a2"))
+    p.add(sample("A", "u3", "a3"))
+    assert sorted(contents(done) for done, _ in p.flush()) == [
+        ["A", "u1", "a1", "u3", "a3"],
+        ["B", "u2", "a2"],
+    ]
+
+
+def test_max_open_emits_least_recently_used_bundle():
+    p = packer(max_tokens=1000, max_open=2)
+    p.add(sample("A", "u1", "a1"))
+    p.add(sample("B", "u2", "a2"))
+    p.add(sample("A", "u3", "a3"))  # A를 최근에 씀
+    [(done, _)] = p.add(sample("C", "u4", "a4"))
+    assert contents(done) == ["B", "u2", "a2"]
+    assert len(p.flush()) == 2
+
+
+def test_without_packing_samples_pass_through():
+    p = packer(max_tokens=1000, pack=False)
+    [(done, tokens)] = p.add(sample("S", "u1", "a1"))
+    assert contents(done) == ["S", "u1", "a1"] and tokens == 33
+    assert p.flush() == []
+
+
+def test_split_at_turn_pairs():
+    # 한 조각의 턴 예산은 40 - 13(샘플 시작 + system) = 27이라 user/assistant 한 쌍(20)씩
+    p = packer(max_tokens=40, pack=False, overflow="split")
+    done = p.add(sample("S", "u1", "a1", "u2", "a2", "u3", "a3"))
+    assert [contents(d) for d, _ in done] == [["S", "u1", "a1"], ["S", "u2", "a2"], ["S", "u3", "a3"]]
+    assert all(tokens <= 40 for _, tokens in done)
+    assert (p.stats.split, p.stats.dropped) == (1, 0)
+
+
+def test_split_drops_pairs_longer_than_limit():
+    p = packer(max_tokens=40, pack=False, overflow="split")
+    long_pair = sample("S", "u1", "a1")
+    long_pair["messages"][1] = message("user", "long", 30)
+    long_pair["messages"] += sample(None, "u2", "a2")["messages"]
+    [(done, _)] = p.add(long_pair)
+    assert contents(done) == ["S", "u2", "a2"]
+
+
+def test_drop_overflow():
+    p = packer(max_tokens=40)
+    assert p.add(sample("S", "u1", "a1", "u2", "a2")) == []
+    assert p.stats.dropped == 1
+    assert p.flush() == []
+
+
+def test_non_chat_samples_are_only_length_checked():
+    p = packer(max_tokens=10)
+    alpaca = {"instruction": "abc", "input": "", "output": "defg"}
+    assert p.add(alpaca) == [(alpaca, 7)]
+    assert p.add({"instruction": "x" * 11, "output": ""}) == []
+    assert p.stats.dropped == 1
+
+
+def test_invalid_overflow():
+    with pytest.raises(ValueError):
+        packer(overflow="truncate")
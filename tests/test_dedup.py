@@ -0,0 +1,76 @@
+import dedup
+
+
+class CharTokenizer:
+    name = "chars"
+
+    def count(self, text):
+        return len(text)
+
+
+TEXT = ("오늘 회사에서 발표를 했는데 준비한 만큼 잘 되지 않아서 속상했어요. "
+        "팀장님이 괜찮다고 하셨지만 계속 마음에 걸리네요.")
+OTHER = "주말에 친구들이랑 바다에 다녀왔는데 날씨가 좋아서 기분 전환이 많이 됐어요."
+
+
+def chat(user, assistant="그랬군요. 많이 속상하셨겠어요.", system="페르소나"):
+    return {"messages": [
+        {"role": "system", "content": system},
+        {"role": "user", "content": user},
+        {"role": "assistant", "content": assistant},
+    ]}
+
+
+def deduplicator(**options):
+    return dedup.Deduplicator(tokenizer=CharTokenizer(), **options)
+
+
+def test_exact_duplicates_ignore_whitespace_and_system():
+    d = deduplicator(near=False)
+    assert not d.is_duplicate(chat(TEXT))
+    assert d.is_duplicate(chat("  " + TEXT.replace(" ", "   "), system="다른 페르소나"))
+    assert not d.is_duplicate(chat(OTHER))
+    report = d.report()
+    assert (report["seen"], report["kept"], report["exact_removed"]) == (3, 2, 1)
+    assert report["tokens_removed"] == len(dedup.sample_text(chat("  " + TEXT.replace(" ", "   "))))
+
+
+def test_near_duplicates():
+    edited = TEXT.replace("속상했어요", "속상했어요!!").replace("계속", "자꾸")
+    d = deduplicator()
+    assert not d.is_duplicate(chat(TEXT))
+    assert d.is_duplicate(chat(edited))
+    assert not d.is_duplicate(chat(OTHER))
+    assert (d.exact_removed, d.near_removed) == (0, 1)
+
+    # 완전 중복만 거르면 고친 문장은 남김
+    exact_only = deduplicator(near=False)
+    assert not exact_only.is_duplicate(chat(TEXT))
+    assert not exact_only.is_duplicate(chat(edited))
+
+
+def test_filter_keeps_first_occurrence():
+    samples = [chat(TEXT, "첫 응답"), chat(OTHER), chat(TEXT, "첫 응답")]
+    assert list(deduplicator().filter(samples)) == samples[:2]
+
+
+def test_eviction_bounds_memory():
+    d = deduplicator(max_entries=2)
+    texts = [TEXT, OTHER, "새로 산 노트북이 자꾸 꺼져서 과제를 두 번이나 날렸어요.",
+             "동생이 대학에 합격했다는 소식을 듣고 온 가족이 함께 저녁을 먹었어요.",
+             "요즘 잠이 잘 안 와서 새벽까지 휴대폰만 보다가 출근하게 돼요."]
+    for text in texts:
+        assert not d.is_duplicate(chat(text, assistant=""))
+    assert len(d._exact) == len(d._exact_order) == 2
+    assert len(d._signatures) == len(d._order) == 2
+    assert all(len(buckets) <= 2 for buckets in d._buckets)
+    # 잊은 샘플은 다시 나와도 중복으로 보지 않고, 최근 샘플은 여전히 거름
+    assert not d.is_duplicate(chat(texts[0], assistant=""))
+    assert d.is_duplicate(chat(texts[4], assistant=""))
+
+
+def test_minhash_identical_text_has_identical_signature():
+    hasher = dedup.MinHasher()
+    assert hasher.signature(TEXT) == hasher.signature(TEXT)
+    assert hasher.signature("") is None
+    assert dedup.estimated_jaccard(hasher.signature(TEXT), hasher.signature(OTHER)) < 0.3
@@ -0,0 +1,56 @@
+import io
+import json
+
+import pytest
+
+from Functionmodule import iter_json_array
+
+
+ELEMENTS = [
+    {"id": 1, "text": "괄호 ] } 와 \"따옴표\"가 든 문자열", "nested": {"a": [1, 2, {"b": None}]}},
+    [],
+    {},
+    "문자열 \\ 역슬래시",
+    -12.5e3,
+    True,
+    None,
+    {"talk": {"content": {"HS01": "안녕", "SS01": "반가워요\n줄바꿈"}}},
+]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3])
+def test_iter_json_array_small_chunks(chunk_size):
+    text = " [\n " + " ,\n\t".join(json.dumps(e, ensure_ascii=False) for e in ELEMENTS) + " ]\n"
+    assert list(iter_json_array(io.StringIO(text), chunk_size=chunk_size)) == ELEMENTS
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3])
+@pytest.mark.parametrize("text, expected", [
+    ("[]", []),
+    ("  [ ]  ", []),
+    ('{"a": [1, 2]}', [{"a": [1, 2]}]),  # 최상위가 배열이 아니면 그 값 하나
+])
+def test_iter_json_array_edge_cases(chunk_size, text, expected):
+    assert list(iter_json_array(io.StringIO(text), chunk_size=chunk_size)) == expected
+
+
+class CountingReader(io.StringIO):
+    def __init__(self, text):
+        super().__init__(text)
+        self.chars_read = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.chars_read += len(chunk)
+        return chunk
+
+
+@pytest.mark.parametrize("broken", ['{"id": 1,, "x": 2}', '{"id" 1}', "[1 2]", "tru e"])
+def test_iter_json_array_malformed_element_fails_early(broken):
+    # 앞쪽 요소의 형식 오류는 파일 끝까지 읽지 않고 바로 오류
+    text = "[" + broken + "," + ",".join(['{"text": "padding"}'] * 20000) + "]"
+    f = CountingReader(text)
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_array(f, chunk_size=64))
+    assert f.chars_read < 1024
+
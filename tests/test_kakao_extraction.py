@@ -0,0 +1,43 @@
+import datetime
+
+import pytest
+
+import kakao_parser
+from benchmarks.synthetic import make_kakao_export
+
+# 앞에서부터(recent_texts)와 끝에서부터(extract_recent_messages) 추출이
+# 같은 메시지를 돌려주는지 확인
+
+END = datetime.date(2025, 6, 7)
+FORMATS = ["pc", "mobile", "android", "ios"]
+DATES = [
+    "2025년 6월 7일",  # 마지막 날 (오늘 대화)
+    "2025년 6월 5일",  # 중간 날짜
+    "2025년 5월 1일",  # 파일에 없는 날짜
+    None,              # 날짜 없이 파일 끝에서부터
+]
+
+
+@pytest.fixture(scope="module", params=FORMATS)
+def export(request):
+    text = make_kakao_export(request.param, days=4, messages_per_day=60, end=END, seed=7, multiline_ratio=0.2)
+    return text, text.encode("utf-8")
+
+
+@pytest.mark.parametrize("limit", [10, 500])
+@pytest.mark.parametrize("date_str", DATES)
+def test_forward_and_tail_match(export, date_str, limit):
+    text, data = export
+    forward = kakao_parser.recent_texts(text.splitlines(), date_str, limit)
+    tail, _ = kakao_parser.extract_recent_messages(data, date_str, limit)
+
+    assert tail == forward
+    if date_str == "2025년 5월 1일":
+        assert forward == []
+    else:
+        assert forward
+    if limit == 500 and date_str is not None and forward:
+        # 여러 줄 메시지와 잡음 제외가 실제로 들어간 입력인지
+        assert any("\n" in t for t in forward)
+        assert not any("[사진]" in t or "이모티콘" in t for t in forward)
+
@@ -0,0 +1,82 @@
+import pytest
+
+import llm_cache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache.time, "time", clock)
+    return clock
+
+
+def test_cache_key_ignores_parameter_order():
+    messages = [{"role": "user", "content": "안녕"}]
+    a = llm_cache.cache_key("gpt-4o-mini", messages, temperature=0, response_format={"type": "json_object"})
+    b = llm_cache.cache_key(messages=messages, response_format={"type": "json_object"}, temperature=0,
+                            model="gpt-4o-mini")
+    assert a == b
+    assert a != llm_cache.cache_key("gpt-4o-mini", messages, temperature=1)
+
+
+def test_is_json():
+    assert llm_cache.is_json('{"summary": "요약"}')
+    assert not llm_cache.is_json('{"summary": "요')
+    assert not llm_cache.is_json(None)
+
+
+def test_memory_ttl(clock):
+    cache = llm_cache.ResponseCache(ttl=10)
+    cache.set("a", "1")
+    clock.now += 10
+    assert cache.get("a") == "1"
+    clock.now += 1
+    assert cache.get("a") is None
+    assert cache.stats()["memory_size"] == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_memory_lru_eviction(clock):
+    cache = llm_cache.ResponseCache(maxsize=2, ttl=None)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"  # a를 최근에 씀
+    cache.set("c", "3")           # 가장 오래 안 쓴 b가 빠짐
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+
+
+def test_disk_tier_shared_between_instances(tmp_path, clock):
+    path = str(tmp_path / "llm_cache.sqlite")
+    writer = llm_cache.ResponseCache(ttl=60, path=path)
+    writer.set("a", '{"x": 1}')
+
+    # 다른 프로세스와 같이 메모리는 비어 있고 디스크에서 찾음
+    reader = llm_cache.ResponseCache(ttl=60, path=path)
+    assert reader.get("a") == '{"x": 1}'
+    assert reader.disk_hits == 1
+    assert reader.get("a") == '{"x": 1}'  # 두 번째부터는 메모리에서
+    assert reader.disk_hits == 1
+
+    clock.now += 61
+    assert llm_cache.ResponseCache(ttl=60, path=path).get("a") is None
+
+
+def test_disk_prune_keeps_recent_entries(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(llm_cache.ResponseCache, "PRUNE_EVERY", 5)
+    path = str(tmp_path / "llm_cache.sqlite")
+    cache = llm_cache.ResponseCache(maxsize=1, ttl=None, path=path, disk_maxsize=3)
+    for i in range(5):
+        clock.now += 1
+        cache.set(str(i), str(i))
+    fresh = llm_cache.ResponseCache(ttl=None, path=path)
+    assert [fresh.get(str(i)) for i in range(5)] == [None, None, "2", "3", "4"]
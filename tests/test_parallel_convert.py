@@ -0,0 +1,41 @@
+import pytest
+
+import Functionmodule
+from benchmarks.synthetic import make_aihub_jsonl
+
+
+@pytest.fixture(scope="module")
+def source(tmp_path_factory):
+    path = tmp_path_factory.mktemp("parallel") / "input.jsonl"
+    make_aihub_jsonl(str(path), 300)
+    with open(path, "ab") as f:
+        f.write(b'{"broken": \n')  # 병렬 변환도 깨진 줄은 건너뛰고 계속
+    make_aihub_jsonl(str(path) + ".tail", 50, seed=1)
+    with open(path, "ab") as f, open(str(path) + ".tail", "rb") as tail:
+        f.write(tail.read())
+    return str(path)
+
+
+def convert(source, tmp_path, name, parallel, **options):
+    output = str(tmp_path / name)
+    if parallel:
+        # 구간을 작게 나눠서 여러 작업자가 줄 경계를 나눠 가지게 함
+        Functionmodule.convert_to_finetune_format_parallel(
+            source, output, workers=2, chunk_size=4096, progress_interval=0, **options)
+    else:
+        Functionmodule.convert_to_finetune_format(source, output, progress_interval=0, **options)
+    with open(output, "rb") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("format_type", Functionmodule.FORMAT_TYPES)
+def test_parallel_output_matches_serial(source, tmp_path, format_type):
+    serial = convert(source, tmp_path, "serial.jsonl", False, format_type=format_type)
+    assert serial
+    assert convert(source, tmp_path, "parallel.jsonl", True, format_type=format_type) == serial
+
+
+def test_unordered_parallel_output_has_same_samples(source, tmp_path):
+    serial = convert(source, tmp_path, "serial.jsonl", False)
+    unordered = convert(source, tmp_path, "unordered.jsonl", True, ordered=False)
+    assert sorted(unordered.splitlines()) == sorted(serial.splitlines())
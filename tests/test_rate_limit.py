@@ -0,0 +1,98 @@
+import asyncio
+import email.utils
+import time
+
+import pytest
+
+import rate_limit
+
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"retry-after-ms": "1500", "retry-after": "7"}, 1.5),  # ms를 먼저 봄
+    ({"retry-after-ms": "abc", "retry-after": "7"}, 7.0),
+    ({"retry-after": "2.5"}, 2.5),
+    ({"retry-after": "-3"}, 0.0),
+    ({"retry-after": "nan"}, None),
+    ({"retry-after": "soon"}, None),
+    ({"retry-after": ""}, None),
+    ({}, None),
+])
+def test_parse_retry_after(headers, expected):
+    assert rate_limit.parse_retry_after(headers) == expected
+
+
+def test_parse_retry_after_http_date():
+    value = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert 25 < rate_limit.parse_retry_after({"retry-after": value}) <= 30
+    past = email.utils.formatdate(time.time() - 30, usegmt=True)
+    assert rate_limit.parse_retry_after({"retry-after": past}) == 0.0
+
+
+class FakeTime:
+    """time.monotonic과 asyncio.sleep을 바꿔서 기다리지 않고 기다린 시간만 기록"""
+
+    def __init__(self):
+        self.now = 100.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def fake_time(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(rate_limit.time, "monotonic", fake.monotonic)
+    monkeypatch.setattr(rate_limit.asyncio, "sleep", fake.sleep)
+    return fake
+
+
+def test_unlimited_never_waits(fake_time):
+    limiter = rate_limit.RateLimiter()
+
+    async def run():
+        await asyncio.gather(*(limiter.acquire(10_000) for _ in range(100)))
+
+    asyncio.run(run())
+    assert fake_time.slept == []
+
+
+def test_requests_per_minute(fake_time):
+    limiter = rate_limit.RateLimiter(rpm=60)
+
+    async def run():
+        for _ in range(61):
+            await limiter.acquire(1)
+
+    asyncio.run(run())
+    # 60개는 바로, 61번째는 요청 하나가 다시 채워지는 1초 뒤
+    assert fake_time.slept == [pytest.approx(1.0)]
+
+
+def test_tokens_per_minute_and_settle(fake_time):
+    limiter = rate_limit.RateLimiter(tpm=6000)
+
+    async def run():
+        await limiter.acquire(5000)
+        limiter.settle(5000, 1000)   # 실제로는 1,000 토큰만 씀 -> 4,000 돌려받음
+        await limiter.acquire(5000)  # 남은 5,000으로 바로 가능
+        await limiter.acquire(100_000)  # 한도보다 큰 요청은 한도만큼만 기다림
+
+    asyncio.run(run())
+    assert fake_time.slept == [pytest.approx(60.0)]
+
+
+def test_backoff_pauses_all_callers(fake_time):
+    limiter = rate_limit.RateLimiter()
+    assert limiter.backoff(0) == 1.0
+    assert limiter.backoff(3) == 8.0
+    assert limiter.backoff(10) == 60.0        # 상한
+    assert limiter.backoff(0, retry_after=2.5) == 2.5
+    assert limiter.throttled == 4
+
+    asyncio.run(limiter.acquire(1))
+    assert fake_time.slept == [pytest.approx(60.0)]
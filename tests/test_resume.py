@@ -0,0 +1,93 @@
+import glob
+import json
+import os
+
+import pytest
+
+import dataset_io
+import Functionmodule
+from benchmarks.synthetic import make_aihub_jsonl
+
+
+def read_shards(pattern):
+    data = b""
+    for path in sorted(glob.glob(pattern)):
+        with dataset_io.open_binary(path) as f:
+            data += f.read()
+    return data
+
+
+@pytest.mark.parametrize("compression", [None, "gzip"])
+def test_resume_after_interrupted_sharded_conversion(tmp_path, monkeypatch, compression):
+    source = str(tmp_path / "input.jsonl")
+    make_aihub_jsonl(source, 600)
+    expected = str(tmp_path / "expected.jsonl")
+    Functionmodule.convert_to_finetune_format(source, expected, progress_interval=0)
+
+    output = str(tmp_path / "out.jsonl")
+    options = dict(progress_interval=0, shard_samples=100, compression=compression)
+    convert_record = Functionmodule.convert_record
+    calls = 0
+
+    def interrupted(data, format_type="openai"):
+        nonlocal calls
+        calls += 1
+        if calls == 350:
+            raise KeyboardInterrupt
+        return convert_record(data, format_type)
+
+    monkeypatch.setattr(Functionmodule, "convert_record", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        Functionmodule.convert_to_finetune_format(source, output, **options)
+    monkeypatch.setattr(Functionmodule, "convert_record", convert_record)
+
+    suffix = ".jsonl.gz" if compression else ".jsonl"
+    with open(output + ".manifest.json", encoding="utf-8") as f:
+        manifest = json.load(f)
+    assert not manifest["done"]
+    # 끝난 조각만 남고 쓰다 만 조각은 없음
+    written = sorted(os.path.basename(path) for path in glob.glob(str(tmp_path / f"out-*{suffix}")))
+    assert written == [shard["path"] for shard in manifest["shards"]]
+
+    Functionmodule.convert_to_finetune_format(source, output, resume=True, **options)
+    with open(expected, "rb") as f:
+        assert read_shards(str(tmp_path / f"out-*{suffix}")) == f.read()
+
+
+def test_fresh_run_removes_shards_from_previous_settings(tmp_path):
+    source = str(tmp_path / "input.jsonl")
+    make_aihub_jsonl(source, 200)
+    expected = str(tmp_path / "expected.jsonl")
+    Functionmodule.convert_to_finetune_format(source, expected, progress_interval=0)
+
+    output = str(tmp_path / "out.jsonl")
+    Functionmodule.convert_to_finetune_format(source, output, progress_interval=0, shard_samples=50)
+    assert len(glob.glob(str(tmp_path / "out-*.jsonl"))) > 2
+    # 샤드를 더 크게 나눠 다시 변환하면 이전 실행의 나머지 샤드가 남지 않음
+    Functionmodule.convert_to_finetune_format(source, output, progress_interval=0, shard_samples=10_000)
+    assert [os.path.basename(path) for path in glob.glob(str(tmp_path / "out-*"))] == ["out-00000.jsonl"]
+    with open(expected, "rb") as f:
+        assert read_shards(str(tmp_path / "out-*.jsonl")) == f.read()
+
+    # 나누지 않고 다시 변환하면 샤드와 매니페스트도 지움
+    Functionmodule.convert_to_finetune_format(source, output, progress_interval=0)
+    assert sorted(os.listdir(tmp_path)) == ["expected.jsonl", "input.jsonl", "out.jsonl"]
+
+
+def test_failed_unsharded_run_leaves_no_temp_file(tmp_path, monkeypatch):
+    source = str(tmp_path / "input.jsonl")
+    make_aihub_jsonl(source, 50)
+    convert_record = Functionmodule.convert_record
+    calls = 0
+
+    def failing(data, format_type="openai"):
+        nonlocal calls
+        calls += 1
+        if calls == 20:
+            raise KeyboardInterrupt
+        return convert_record(data, format_type)
+
+    monkeypatch.setattr(Functionmodule, "convert_record", failing)
+    with pytest.raises(KeyboardInterrupt):
+        Functionmodule.convert_to_finetune_format(source, str(tmp_path / "out.jsonl"), progress_interval=0)
+    assert sorted(os.listdir(tmp_path)) == ["input.jsonl"]
@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+import structured_output
+
+
+OBJECT = {
+    "summary": "중괄호 { } 와 \"따옴표\", 역슬래시 \\ 포함",
+    "상황설명": "첫 줄\n둘째 줄",
+    "nested": {"list": [1, {"x": "]"}], "empty": {}},
+    "array": ["a", ["b"], []],
+    "number": -3.25,
+    "flag": True,
+    "nothing": None,
+    "last": 42,
+}
+
+
+@pytest.mark.parametrize("prefix", ["", "다음은 결과입니다.\n```json\n"])
+def test_incremental_field_parser_one_char_at_a_time(prefix):
+    text = prefix + json.dumps(OBJECT, ensure_ascii=False, indent=2) + ("\n```" if prefix else "")
+    parser = structured_output.IncrementalFieldParser()
+    fields = []
+    for ch in text:
+        fields.extend(parser.feed(ch))
+    assert fields == list(OBJECT.items())
+    assert parser.done
+
+    whole = structured_output.IncrementalFieldParser()
+    assert whole.feed(text) == list(OBJECT.items())
+
+
+SUMMARY = {"summary": "친구와 {괄호}가 든 \"농담\"을 주고받았다."}
+
+
+@pytest.mark.parametrize("text", [
+    json.dumps(SUMMARY, ensure_ascii=False),
+    "```json\n" + json.dumps(SUMMARY, ensure_ascii=False) + "\n```",
+    "```\n" + json.dumps(SUMMARY, ensure_ascii=False, indent=2) + "\n```\n설명은 여기까지입니다.",
+    "요청하신 결과입니다: " + json.dumps(SUMMARY, ensure_ascii=False) + " 도움이 되었길 바랍니다 {끝}",
+])
+def test_parse_model_repairs_fences_and_preamble(text):
+    assert structured_output.parse_model(text, structured_output.SummaryResult).summary == SUMMARY["summary"]
+
+
+def test_extract_object_returns_outermost_object():
+    text = '앞 설명 {"a": {"b": "}"}, "c": [1]} 뒤 {"d": 2}'
+    assert structured_output.extract_object(text) == '{"a": {"b": "}"}, "c": [1]}'
+
+
+@pytest.mark.parametrize("text", [
+    '{"summary": "문장이 중간에서 잘',             # 잘린 응답
+    '```json\n{"summary": "잘린 코드블록"\n',
+    "JSON 없이 평범한 문장만 있는 응답",
+    "",
+])
+def test_parse_model_rejects_unrepairable(text):
+    with pytest.raises(structured_output.RepairError):
+        structured_output.parse_model(text, structured_output.SummaryResult)
+
+
+def test_parse_model_rejects_non_object_and_missing_fields():
+    with pytest.raises(structured_output.RepairError, match="객체가 아닙니다"):
+        structured_output.parse_object('["summary"]')
+    with pytest.raises(structured_output.RepairError, match="상황설명"):
+        structured_output.parse_model('{"summary": "요약"}', structured_output.SummaryDiaryResult)
+
+
+def test_json_schema_format_is_strict():
+    schema = structured_output.json_schema_format(structured_output.DiaryResult, "diary")["json_schema"]
+    assert schema["strict"] and schema["name"] == "diary"
+    assert schema["schema"]["required"] == structured_output.DIARY_FIELDS
+    assert schema["schema"]["additionalProperties"] is False
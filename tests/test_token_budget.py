@@ -0,0 +1,59 @@
+import token_budget
+
+
+class CharTokenizer:
+    """글자 하나를 토큰 하나로 세는 토크나이저 (tiktoken 없이 예산 계산을 확인)"""
+    name = "chars"
+
+    def count(self, text):
+        return len(text)
+
+    def truncate(self, text, max_tokens):
+        return text if len(text) <= max_tokens else text[:max_tokens - 1] + "…"
+
+
+def pack(texts, budget, **options):
+    return token_budget.pack_messages(texts, budget, tokenizer=CharTokenizer(), **options)
+
+
+def test_keeps_most_recent_messages_within_budget():
+    packed = pack(["aaaa", "bbbb", "cccc"], 10)  # 메시지마다 4 + 줄바꿈 1
+    assert packed.text == "bbbb\ncccc"
+    assert packed.kept == ["bbbb", "cccc"]
+    assert (packed.messages, packed.over_budget) == (2, 1)
+    assert packed.tokens == 9 <= packed.budget
+    assert (packed.input_messages, packed.input_tokens) == (3, 15)
+
+
+def test_older_messages_are_not_picked_after_budget_is_full():
+    # 예산이 찬 뒤에는 더 오래된 짧은 메시지도 넣지 않음 (대화 흐름이 끊기지 않게)
+    packed = pack(["a", "bbbbbbbb", "cccc"], 10)
+    assert packed.kept == ["cccc"]
+    assert packed.over_budget == 2
+
+
+def test_exact_and_near_duplicates_keep_latest():
+    texts = ["진짜?", "ㅋㅋㅋ", "진짜??", "ㅋㅋㅋㅋㅋ", "밥 먹었어", "밥 먹었어"]
+    packed = pack(texts, 1000)
+    assert packed.kept == ["진짜??", "ㅋㅋㅋㅋㅋ", "밥 먹었어"]
+    assert (packed.duplicates, packed.near_duplicates) == (1, 2)
+
+    assert pack(texts, 1000, dedup=False).kept == texts
+
+
+def test_compress_drops_filler_and_truncates_long_messages():
+    long = "가나다라마바사" * 10
+    packed = pack(["ㅇㅇ", long, "ㅋㅋ", "오늘 뭐 해?"], 1000, compress=True, max_message_tokens=10)
+    assert packed.kept == [long[:9] + "…", "오늘 뭐 해?"]
+    assert packed.compressed == 3
+
+
+def test_latest_message_longer_than_budget_is_truncated():
+    packed = pack(["old", "y" * 100], 20)
+    assert packed.kept == ["y" * 18 + "…"]
+    assert packed.tokens <= 20
+
+
+def test_empty_input():
+    packed = pack([], 100)
+    assert (packed.text, packed.tokens, packed.messages) == ("", 0, 0)
@@ -0,0 +1,174 @@
+import functools
+import re
+from dataclasses import dataclass, field
+
+import rate_limit
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+DEFAULT_MODEL = "gpt-4o-mini"
+FALLBACK_ENCODING = "o200k_base"
+
+
+class Tokenizer:
+    """
+    tiktoken으로 토큰 수를 세고, tiktoken이 없거나 인코딩 파일을 받을 수 없으면(오프라인)
+    rate_limit.estimate_tokens 추정치로 대신한다.
+
+    인코딩 파일을 미리 받아 두려면 TIKTOKEN_CACHE_DIR을 지정하고 한 번 온라인에서 실행한다.
+    """
+
+    def __init__(self, model=DEFAULT_MODEL):
+        self.model = model
+        self.encoding = self._load(model)
+        self.name = self.encoding.name if self.encoding else "estimate"
+
+    @staticmethod
+    def _load(model):
+        if tiktoken is None:
+            return None
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            pass
+        except Exception:
+            return None  # 인코딩 파일 다운로드 실패 (오프라인)
+        try:
+            return tiktoken.get_encoding(FALLBACK_ENCODING)
+        except Exception:
+            return None
+
+    def count(self, text):
+        if self.encoding is None:
+            return rate_limit.estimate_tokens(text)
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text, max_tokens):
+        """앞에서부터 max_tokens 토큰까지만 남김"""
+        if self.count(text) <= max_tokens:
+            return text
+        if self.encoding is None:
+            return text[:max(0, (max_tokens - 1) * 2)] + "…"
+        return self.encoding.decode(self.encoding.encode(text, disallowed_special=())[:max_tokens - 1]) + "…"
+
+
+@functools.lru_cache(maxsize=None)
+def get_tokenizer(model=DEFAULT_MODEL):
+    """모델별 Tokenizer (인코딩 로드는 프로세스당 한 번)"""
+    return Tokenizer(model)
+
+
+# 비교용 정규화: 공백/문장부호를 지우고 'ㅋㅋㅋㅋ', '!!!'처럼 반복되는 글자를 하나로
+_PUNCT = re.compile(r"[\s.,!?~…·'\"()\[\]<>:;^\-_=+*/\\]+")
+_REPEAT = re.compile(r"(.)\1+")
+
+
+def normalize(text):
+    return _REPEAT.sub(r"\1", _PUNCT.sub("", text.lower()))
+
+
+@dataclass
+class PackedContext:
+    """토큰 예산에 맞춰 고른 대화와 그 과정의 통계"""
+    text: str = ""
+    tokens: int = 0
+    budget: int = 0
+    messages: int = 0
+    input_messages: int = 0
+    input_tokens: int = 0
+    duplicates: int = 0
+    near_duplicates: int = 0
+    compressed: int = 0      # 정보가 거의 없어 빠지거나 잘린 메시지 수
+    over_budget: int = 0     # 예산이 모자라 빠진 (더 오래된) 메시지 수
+    tokenizer: str = ""
+    kept: list = field(default_factory=list, repr=False)
+
+    def report(self):
+        return {
+            "tokens": self.tokens,
+            "budget": self.budget,
+            "messages": self.messages,
+            "input_messages": self.input_messages,
+            "input_tokens": self.input_tokens,
+            "duplicates": self.duplicates,
+            "near_duplicates": self.near_duplicates,
+            "compressed": self.compressed,
+            "over_budget": self.over_budget,
+            "tokenizer": self.tokenizer,
+        }
+
+
+def pack_messages(texts, budget, tokenizer=None, dedup=True, compress=False, max_message_tokens=200):
+    """
+    메시지 본문 목록(오래된 순)에서 최근 것부터 토큰 예산이 찰 때까지 골라 하나의 문맥으로 묶음
+
+    같은 메시지는 최근 것 하나만 남기고, 정규화하면 같아지는 메시지('ㅋㅋㅋ'/'ㅋㅋㅋㅋㅋ',
+    '진짜?'/'진짜??')도 하나로 합친다. compress=True면 'ㅋㅋ'/'ㅇㅇ'처럼 정보가 거의 없는 메시지를
+    빼고, max_message_tokens보다 긴 메시지는 앞부분만 남긴다.
+
+    Args:
+        texts (list): 메시지 본문 (오래된 순)
+        budget (int): 문맥 전체 최대 토큰 수 (줄바꿈 포함)
+        tokenizer (Tokenizer): 기본값은 get_tokenizer()
+
+    Returns:
+        PackedContext: text는 고른 메시지를 원래 순서대로 줄바꿈으로 이은 문자열
+    """
+    tokenizer = tokenizer or get_tokenizer()
+    packed = PackedContext(budget=budget, input_messages=len(texts), tokenizer=tokenizer.name)
+    newline = tokenizer.count("\n")
+    seen_exact = set()
+    seen_near = set()
+    kept = []
+    used = 0
+    full = False
+    for text in reversed(texts):
+        text = text.strip()
+        cost = tokenizer.count(text) + newline
+        packed.input_tokens += cost
+        if full:
+            packed.over_budget += 1
+            continue
+
+        if dedup:
+            if text in seen_exact:
+                packed.duplicates += 1
+                continue
+            seen_exact.add(text)
+            key = normalize(text)
+            if key in seen_near:
+                packed.near_duplicates += 1
+                continue
+            seen_near.add(key)
+
+        if compress:
+            if len(normalize(text)) <= 1:
+                packed.compressed += 1
+                continue
+            if cost - newline > max_message_tokens:
+                text = tokenizer.truncate(text, max_message_tokens)
+                cost = tokenizer.count(text) + newline
+                packed.compressed += 1
+
+        if used + cost > budget:
+            if kept:
+                # 더 오래된 메시지는 모두 제외 (골라 넣으면 최근 대화 흐름이 끊김)
+                full = True
+                packed.over_budget += 1
+                continue
+            # 가장 최근 메시지 하나가 예산보다 길면 잘라서라도 넣음
+            text = tokenizer.truncate(text, budget - newline)
+            cost = tokenizer.count(text) + newline
+        kept.append(text)
+        used += cost
+
+    kept.reverse()
+    packed.kept = kept
+    packed.messages = len(kept)
+    packed.text = "\n".join(kept)
+    packed.tokens = tokenizer.count(packed.text) if kept else 0
+    return packed